@@ -0,0 +1,195 @@
+"""Generate many pairwise search strings from a job manifest, without the web UI.
+
+Usage: python batch.py manifest.json [--workers N] [--output-dir DIR] [--format txt|json|csv]
+                       [--no-normalize] [--sort]
+
+The manifest is a JSON list of jobs. Each job names two term list files (one
+term per line, as in the app's text areas), a mode and that mode's options:
+
+    [
+        {"topic1": "frailty.txt", "topic2": "measures.txt", "mode": "proximity",
+         "pf": "tiab", "pd": 4, "output": "frailty-proximity.txt"},
+        {"topic1": "headings.txt", "topic2": "subheadings.txt", "mode": "mesh",
+         "majr": true, "noexp": false}
+    ]
+
+MeSH and intersection jobs may name a third term list file as "topic3"; its
+terms are ANDed with every pair (for MeSH, as headings).
+
+Terms are cleaned up as in the app: trimmed, with blank lines and duplicates
+dropped (--sort also sorts them). --no-normalize pairs the lines exactly as
+they are in the files.
+
+Paths in the manifest are relative to the manifest's directory. Jobs without
+an "output" are written to <output-dir>/job-<n>-<mode>.<format>. Intersection
+jobs with "factored": true are written as (Topic 1 terms) AND (Topic 2 terms).
+
+Each job is written in --format (or its own "format"): the search string as
+plain text, JSON with the metrics and pair matrix, or CSV with one row per pair
+clause. All three are streamed to the file from the pair generator (see
+export.py), so 10k x 10k jobs do not need the search string in memory.
+"""
+
+import argparse
+import json
+import math
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import export
+import normalize
+import pairwise
+
+DEFAULT_OPTIONS = {
+    "mesh": {"majr": False, "noexp": False},
+    "proximity": {"pf": "tiab", "pd": 2},
+    "intersection": {"sf": "tw", "factored": False},
+}
+# option types, checked as service.py checks them, so "false" is not taken for true
+OPTION_TYPES = {"majr": bool, "noexp": bool, "pf": str, "pd": int, "sf": str, "factored": bool}
+TYPE_NAMES = {bool: "true or false", int: "an integer", str: "a string"}
+
+
+def read_terms(path):
+    return Path(path).read_text(encoding="utf-8").splitlines()
+
+
+# manifest option names are the app's widget keys
+def mode_options(job):
+    mode = job["mode"]
+    if mode not in DEFAULT_OPTIONS:
+        raise ValueError(f"Unknown search mode: {mode!r}")
+    options = {**DEFAULT_OPTIONS[mode], **{k: job[k] for k in DEFAULT_OPTIONS[mode] if k in job}}
+    for name, value in options.items():
+        kind = OPTION_TYPES[name]
+        # JSON true is an int to Python, but not a distance
+        if not isinstance(value, kind) or (kind is int and isinstance(value, bool)):
+            raise ValueError(f"{name} must be {TYPE_NAMES[kind]}, not {json.dumps(value)}")
+    if mode == "mesh":
+        return options
+    if mode == "proximity":
+        options = {"field": options["pf"], "distance": options["pd"]}
+        pairwise.check_options(mode, **options)
+        return options
+    pairwise.check_options(mode, field=options["sf"])
+    return {"field": options["sf"], "factored": options["factored"]}
+
+
+def load_manifest(manifest_path, output_dir, normalize_terms=True, sort_terms=False, export_format="txt"):
+    manifest_path = Path(manifest_path)
+    base = manifest_path.parent
+    jobs = json.loads(manifest_path.read_text(encoding="utf-8"))
+    if not isinstance(jobs, list):
+        raise ValueError("The manifest must be a JSON list of jobs.")
+    resolved = []
+    for number, job in enumerate(jobs, start=1):
+        try:
+            options = mode_options(job)
+        except ValueError as error:
+            raise ValueError(f"job {number}: {error}") from None
+        job_format = job.get("format", export_format)
+        if job_format not in export.FORMATS:
+            raise ValueError(f"Unknown export format: {job_format!r}")
+        if job.get("output"):
+            output = base / job["output"]
+        else:
+            output = Path(output_dir) / f"job-{number}-{job['mode']}.{job_format}"
+        if job.get("topic3") and job["mode"] == "proximity":
+            raise ValueError("Proximity jobs combine exactly two term lists")
+        resolved.append(
+            {
+                "number": number,
+                "mode": job["mode"],
+                "options": options,
+                "topic1": str(base / job["topic1"]),
+                "topic2": str(base / job["topic2"]),
+                "topic3": str(base / job["topic3"]) if job.get("topic3") else None,
+                "output": str(output),
+                "format": job_format,
+                "normalize": normalize_terms,
+                "sort": sort_terms,
+            }
+        )
+    return resolved
+
+
+# runs in a worker process; returns (job number, output path, pairs, bytes written)
+def run_job(job):
+    term_lists = [read_terms(job[name]) for name in ("topic1", "topic2", "topic3") if job.get(name)]
+    if job["normalize"]:
+        term_lists = [normalize.normalize_terms(terms, sort=job["sort"]).terms for terms in term_lists]
+        for name, terms in zip(("topic1", "topic2", "topic3"), term_lists):
+            if not terms:
+                raise ValueError(f"{name} has no terms")
+    options = dict(job["options"])
+    mode = export.FACTORED if options.pop("factored", False) else job["mode"]
+    parts = [export.Part(mode, term_lists[0], term_lists[1], options, tuple(term_lists[2:]))]
+    output = Path(job["output"])
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "wb") as fp:
+        written = export.write(export.chunks(parts, job["format"]), fp)
+    return job["number"], str(output), math.prod(len(terms) for terms in term_lists), written
+
+
+def run(jobs, workers=None):
+    results = []
+    failures = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(run_job, job): job for job in jobs}
+        for future in as_completed(futures):
+            job = futures[future]
+            try:
+                results.append(future.result())
+            except Exception as error:
+                failures.append((job["number"], error))
+    return sorted(results), sorted(failures, key=lambda failure: failure[0])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate pairwise PubMed search strings from a job manifest.")
+    parser.add_argument("manifest", help="JSON list of jobs")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: one per CPU)")
+    parser.add_argument("--output-dir", default="output", help="directory for jobs without an explicit output")
+    parser.add_argument(
+        "--format",
+        choices=export.FORMATS,
+        default="txt",
+        help="search string as text, JSON with the pair matrix and metrics, or CSV of pair clauses",
+    )
+    parser.add_argument(
+        "--normalize",
+        action=argparse.BooleanOptionalAction,
+        default=True,
+        help="trim spaces and drop blank lines and duplicate terms before pairing (default: on)",
+    )
+    parser.add_argument("--sort", action="store_true", help="sort normalized terms alphabetically")
+    args = parser.parse_args(argv)
+
+    try:
+        jobs = load_manifest(args.manifest, args.output_dir, args.normalize, args.sort, args.format)
+    except (OSError, ValueError, KeyError) as error:
+        parser.error(f"could not read manifest: {error}")
+
+    start = time.perf_counter()
+    results, failures = run(jobs, args.workers)
+    elapsed = time.perf_counter() - start
+
+    for number, output, pairs, written in results:
+        print(f"job {number}: {pairs} pairs, {written} bytes -> {output}")
+    for number, error in failures:
+        print(f"job {number} failed: {error}", file=sys.stderr)
+
+    total_pairs = sum(result[2] for result in results)
+    total_bytes = sum(result[3] for result in results)
+    rate = 1 / elapsed if elapsed else float("inf")
+    print(
+        f"{len(results)} jobs, {total_pairs} pairs, {total_bytes} bytes in {elapsed:.2f}s "
+        f"({len(results) * rate:.1f} jobs/s, {total_pairs * rate:.0f} pairs/s, {total_bytes * rate / 1e6:.1f} MB/s)"
+    )
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,55 @@
+"""Measure eutils.py throughput against the local mock ESearch server.
+
+Usage: python benchmarks/eutils_throughput.py [--searches 200] [--connections 8] [--latency 0.02]
+
+Each search is the example intersection search split into PubMed-safe
+sub-queries, run as one history session and combined on the server.
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import eutils  # noqa: E402
+import mock_eutils  # noqa: E402
+import pairwise  # noqa: E402
+import splitter  # noqa: E402
+
+
+async def run(searches, connections, latency, size):
+    topic1_terms = [f"concept{i}*" for i in range(size)]
+    topic2_terms = [f"measure{i}*" for i in range(size)]
+    async with mock_eutils.MockESearchServer(latency=latency) as server:
+        async with eutils.ESearchClient(server.url, rate=0, connections=connections) as client:
+            jobs = []
+            for number in range(searches):
+                clause_stream = pairwise.intersection_clauses(topic1_terms, topic2_terms, f"tw{number}")
+                jobs.append([sub_query.query for sub_query in splitter.split(clause_stream)])
+            start = time.perf_counter()
+            results = await asyncio.gather(*(client.search(queries) for queries in jobs))
+            elapsed = time.perf_counter() - start
+            return elapsed, client.requests, client.pool.opened, sum(len(queries) for queries in jobs), results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--searches", type=int, default=200)
+    parser.add_argument("--connections", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.02, help="mock server latency per request, seconds")
+    parser.add_argument("--size", type=int, default=20, help="terms per topic list")
+    args = parser.parse_args()
+    elapsed, requests, opened, sub_queries, _ = asyncio.run(
+        run(args.searches, args.connections, args.latency, args.size)
+    )
+    print(
+        f"{args.searches} searches ({sub_queries} sub-queries, {requests} requests) over {opened} connections "
+        f"in {elapsed:.2f}s: {args.searches / elapsed:.1f} searches/s, {requests / elapsed:.1f} requests/s"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+"""Measure search string generation time and peak memory for every mode.
+
+Usage: python benchmarks/generation.py [--sizes 10 100 1000] [--output results.json]
+                                        [--baseline baseline.json [--tolerance 0.25]] [--check]
+                                        [--topic3 10]
+
+Each mode (MeSH/subheading, proximity, intersection and the two hybrid unions)
+is run for square term lists of every size, timing each stage of the app's
+path separately:
+
+    pairs     build every clause (the pair construction alone)
+    join      the OR-joined search string and its metrics, as the page shows them
+    url       the PubMed launch URL, encoded from the terms the way the page builds it
+    preview   the search string as the page shows it: whole, or its first and last
+              preview pages when it is longer than one
+    estimate  the metrics computed arithmetically, without generating
+
+Above --stream-threshold pairs (e.g. 10k x 10k) the search string would not fit
+in memory, so "join", "url" and "preview" are replaced by "stream": the search string
+written to a byte-counting sink in chunks, the way batch.py writes it.
+
+Time is the best of --repeat runs; peak memory is measured in a separate run
+under tracemalloc. Results are written as JSON; with --baseline, every stage
+that is more than --tolerance slower (or uses that much more memory) than in
+the baseline is reported and the exit status is 1. Save a baseline with
+--output and compare later runs on the same machine against it.
+
+With --check, every search string is also streamed through parsing.py, and the
+term lists it reads back must be the ones it was generated from. --topic3 adds a
+third list of that many terms to the MeSH and intersection searches.
+"""
+
+import argparse
+import collections
+import json
+import math
+import platform
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import estimate  # noqa: E402
+import export  # noqa: E402
+import pairwise  # noqa: E402
+import parsing  # noqa: E402
+
+MODES = ("mesh", "proximity", "intersection", "mesh+proximity", "mesh+intersection")
+DEFAULT_SIZES = (10, 100, 1000)
+DEFAULT_STREAM_THRESHOLD = 10_000_000
+# preview_page_size in pairwise-pubmed.py
+PREVIEW_PAGE_SIZE = 10_000
+# stages faster than this are too noisy to flag as regressions
+MIN_COMPARED_SECONDS = 0.005
+
+
+# term lists shaped like the app's examples: phrases, and some truncation for intersection
+def terms(prefix, size, truncate=False):
+    return [
+        f"{prefix} term{number}*" if truncate and number % 3 == 0 else f"{prefix} term{number}"
+        for number in range(size)
+    ]
+
+
+class CountingSink:
+    def __init__(self):
+        self.written = 0
+
+    def write(self, text):
+        self.written += len(text)
+
+
+# (mode, term lists, options) of each search a mode ORs together; topic3 terms are
+# ANDed onto the MeSH and intersection searches
+def workload_parts(mode, size, topic3=0):
+    more = [terms("topic three", topic3)] if topic3 else []
+    parts = {
+        "mesh": ("mesh", [terms("heading", size), terms("subheading", size), *more], {}),
+        "proximity": ("proximity", [terms("topic one", size), terms("topic two", size)], {"field": "tiab", "distance": 2}),
+        "intersection": (
+            "intersection",
+            [terms("topic one", size, True), terms("topic two", size, True), *more],
+            {"field": "tw"},
+        ),
+    }
+    return [parts[name] for name in mode.split("+")]
+
+
+# the page's export.Part for each search a mode ORs together
+def workload_search_parts(mode, size, topic3=0):
+    return [
+        export.Part(part, term_lists[0], term_lists[1], options, tuple(term_lists[2:]))
+        for part, term_lists, options in workload_parts(mode, size, topic3)
+    ]
+
+
+# encoded with cold term caches, as for a new set of term lists
+def launch_url(search_parts):
+    pairwise.url_fragment.cache_clear()
+    return pairwise.url_from_encoded(export.encoded_search_string(search_parts))
+
+
+def preview(search_string):
+    if len(search_string) <= PREVIEW_PAGE_SIZE:
+        return str(search_string)
+    pages = pairwise.page_count(search_string, PREVIEW_PAGE_SIZE)
+    return [pairwise.page(search_string, number, PREVIEW_PAGE_SIZE) for number in (1, pages)]
+
+
+def workload_pairs(mode, size, topic3=0):
+    return sum(math.prod(map(len, term_lists)) for _, term_lists, _ in workload_parts(mode, size, topic3))
+
+
+# (clause stream factory, generate, estimate) for a mode at one size
+def workload(mode, size, topic3=0):
+    selected = workload_parts(mode, size, topic3)
+    return (
+        lambda: pairwise.union(*(pairwise.clauses(part, *term_lists, **options) for part, term_lists, options in selected)),
+        lambda: pairwise.generate_union(
+            *(pairwise.generate(part, *term_lists, **options) for part, term_lists, options in selected)
+        )
+        if len(selected) > 1
+        else pairwise.generate(selected[0][0], *selected[0][1], **selected[0][2]),
+        lambda: estimate.estimate_union(
+            *(estimate.estimate(part, *term_lists, **options) for part, term_lists, options in selected)
+        ),
+    )
+
+
+def stages(mode, size, stream_threshold, topic3=0):
+    make_clauses, generate, make_estimate = workload(mode, size, topic3)
+    yield "pairs", lambda: collections.deque(make_clauses(), maxlen=0)
+    if workload_pairs(mode, size, topic3) > stream_threshold:
+        yield "stream", lambda: pairwise.write_search_string(make_clauses(), CountingSink())
+    else:
+        yield "join", generate
+        generated = generate()
+        search_parts = workload_search_parts(mode, size, topic3)
+        yield "url", lambda: launch_url(search_parts)
+        yield "preview", lambda: preview(generated.search_string)
+    yield "estimate", make_estimate
+
+
+def measure(run, repeat, memory):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = run()
+        best = min(best, time.perf_counter() - start)
+        del result
+    peak = None
+    if memory:
+        tracemalloc.start()
+        result = run()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        del result
+    return best, peak
+
+
+def run(sizes, modes, repeat, memory, stream_threshold, check_parse=False, topic3=0):
+    results = []
+    for size in sizes:
+        for mode in modes:
+            if check_parse and not check(mode, size, topic3):
+                sys.exit(f"{mode} {size}x{size}: the parsed search string does not match its term lists")
+            for stage, stage_run in stages(mode, size, stream_threshold, topic3):
+                pairs = workload_pairs(mode, size, topic3)
+                seconds, peak = measure(stage_run, repeat if pairs <= stream_threshold else 1, memory)
+                results.append(
+                    {
+                        "mode": mode,
+                        "size": size,
+                        "topic3": topic3,
+                        "stage": stage,
+                        "pairs": pairs,
+                        "seconds": seconds,
+                        "peak_bytes": peak,
+                    }
+                )
+                print(
+                    f"{mode:>18} {size:>6}x{size:<6} {stage:<9} {seconds * 1000:>11.2f} ms"
+                    + (f" {peak / 2**20:>10.1f} MB" if peak is not None else ""),
+                    flush=True,
+                )
+    return results
+
+
+# parse the streamed search string back and compare it with the term lists it came from
+def check(mode, size, topic3=0):
+    make_clauses = workload(mode, size, topic3)[0]
+    parsed = parsing.parse(pairwise.chunks(make_clauses()))
+    read = [
+        (section.mode, [section.topic1_terms, section.topic2_terms, *section.more_terms], section.complete)
+        for section in parsed.sections
+    ]
+    expected = [(part, term_lists, True) for part, term_lists, _ in workload_parts(mode, size, topic3)]
+    return read == expected
+
+
+# stages that are slower or use more memory than the baseline by more than tolerance
+def regressions(results, baseline, tolerance):
+    def key(item):
+        return item["mode"], item["size"], item.get("topic3", 0), item["stage"]
+
+    previous = {key(item): item for item in baseline["results"]}
+    found = []
+    for item in results:
+        before = previous.get(key(item))
+        if before is None:
+            continue
+        if max(item["seconds"], before["seconds"]) >= MIN_COMPARED_SECONDS and item["seconds"] > before["seconds"] * (1 + tolerance):
+            found.append((item, "time", before["seconds"], item["seconds"]))
+        if item["peak_bytes"] and before.get("peak_bytes") and item["peak_bytes"] > before["peak_bytes"] * (1 + tolerance):
+            found.append((item, "memory", before["peak_bytes"], item["peak_bytes"]))
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="terms per list")
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=MODES)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--no-memory", dest="memory", action="store_false", help="skip the tracemalloc runs")
+    parser.add_argument("--stream-threshold", type=int, default=DEFAULT_STREAM_THRESHOLD, help="pairs")
+    parser.add_argument("--output", type=Path, help="write results to this JSON file")
+    parser.add_argument("--baseline", type=Path, help="compare against results saved with --output")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--check", action="store_true", help="parse every search string back and compare")
+    parser.add_argument("--topic3", type=int, default=0, help="terms in a third list for MeSH and intersection")
+    args = parser.parse_args()
+
+    results = run(args.sizes, args.modes, args.repeat, args.memory, args.stream_threshold, args.check, args.topic3)
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "results": results,
+    }
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=1), encoding="utf-8")
+    if args.baseline:
+        found = regressions(results, json.loads(args.baseline.read_text(encoding="utf-8")), args.tolerance)
+        for item, kind, before, after in found:
+            print(
+                f"Regression: {item['mode']} {item['size']}x{item['size']} {item['stage']} {kind} "
+                f"{before:,.4g} -> {after:,.4g} ({after / before - 1:+.0%})",
+                file=sys.stderr,
+            )
+        if found:
+            sys.exit(1)
+        print(f"No regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+
+
+if __name__ == "__main__":
+    main()
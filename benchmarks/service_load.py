@@ -0,0 +1,149 @@
+"""Load-test the generation service and report requests/s and latency percentiles.
+
+Usage: python benchmarks/service_load.py [--requests 2000] [--clients 16] [--size 30]
+                                          [--distinct 50] [--url http://127.0.0.1:8080]
+
+Without --url, service.py is started on a free local port in its own process,
+so the load generator does not share its event loop. Each simulated client
+keeps one connection open and sends proximity and MeSH/intersection requests
+shaped like the app's typical term lists (--size terms per list). Requests cycle
+through --distinct different term lists, so the response cache is exercised
+after the first round; use --distinct 0 to make every request unique.
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import socket
+import subprocess
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+from urllib.parse import urlsplit
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import httpio  # noqa: E402
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def payload(number, size):
+    suffix = f"{number}"
+    if number % 2:
+        return "/search/proximity?format=json", {
+            "topic1": [f"topic one {term} {suffix}" for term in range(size // 3)],
+            "topic2": [f"topic two {term}" for term in range(size)],
+            "field": "tiab",
+            "distance": 3,
+        }
+    return "/search/mesh+intersection?format=txt", {
+        "mesh": {"topic1": [f"heading {term} {suffix}" for term in range(5)], "topic2": ["diagnosis", "epidemiology"]},
+        "intersection": {"topic1": [f"topic one {term}* {suffix}" for term in range(size // 3)], "topic2": [f"topic two {term}" for term in range(size)]},
+    }
+
+
+async def client(host, port, name, numbers, size, latencies, statuses):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for number in numbers:
+            path, body = payload(number, size)
+            data = json.dumps(body).encode("utf-8")
+            start = time.perf_counter()
+            writer.write(
+                (
+                    f"POST {path} HTTP/1.1\r\nHost: {host}\r\nX-Client-Id: {name}\r\n"
+                    f"Content-Type: application/json\r\nContent-Length: {len(data)}\r\n\r\n"
+                ).encode("latin-1")
+                + data
+            )
+            await writer.drain()
+            status, headers = await httpio.read_head(reader)
+            await httpio.read_body(reader, headers)
+            latencies.append(time.perf_counter() - start)
+            statuses[status.split(" ", 2)[1]] += 1
+    finally:
+        writer.close()
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, math.ceil(fraction * len(sorted_values)) - 1)]
+
+
+def free_port():
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+async def wait_for(host, port, timeout=10):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            _, writer = await asyncio.open_connection(host, port)
+            writer.close()
+            return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            await asyncio.sleep(0.05)
+
+
+async def run(host, port, requests, clients, size, distinct):
+    await wait_for(host, port)
+    numbers = [number % distinct if distinct else number for number in range(requests)]
+    latencies = []
+    statuses = Counter()
+    start = time.perf_counter()
+    await asyncio.gather(
+        *(
+            client(host, port, f"load-{number}", numbers[number::clients], size, latencies, statuses)
+            for number in range(clients)
+        )
+    )
+    return time.perf_counter() - start, sorted(latencies), statuses
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--clients", type=int, default=16, help="concurrent connections, one client id each")
+    parser.add_argument("--size", type=int, default=30, help="terms in the longer list of each request")
+    parser.add_argument("--distinct", type=int, default=50, help="distinct requests to cycle through (0: all distinct)")
+    parser.add_argument("--url", help="an already running service; default: start one locally")
+    args = parser.parse_args()
+
+    server = None
+    if args.url:
+        host, port = urlsplit(args.url).hostname, urlsplit(args.url).port
+    else:
+        host, port = "127.0.0.1", free_port()
+        server = subprocess.Popen(
+            [sys.executable, str(ROOT / "service.py"), "--host", host, "--port", str(port)],
+            cwd=ROOT,
+            stdout=subprocess.DEVNULL,
+        )
+    try:
+        elapsed, latencies, statuses = asyncio.run(
+            run(host, port, args.requests, args.clients, args.size, args.distinct)
+        )
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+    print(
+        f"{len(latencies)} requests from {args.clients} clients in {elapsed:.2f}s: "
+        f"{len(latencies) / elapsed:.0f} requests/s"
+    )
+    print(
+        "latency p50 {:.1f} ms, p95 {:.1f} ms, p99 {:.1f} ms, max {:.1f} ms".format(
+            *(percentile(latencies, fraction) * 1000 for fraction in (0.5, 0.95, 0.99)), latencies[-1] * 1000
+        )
+    )
+    print("status codes: " + ", ".join(f"{status} x{count}" for status, count in sorted(statuses.items())))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""Check the app's cold start and interaction latency against a time budget.
+
+Usage: python benchmarks/startup.py [--runs 5] [--budget "first run=1500"] [--output startup.json]
+
+Each run starts a fresh interpreter, as a newly deployed container would, and
+drives the page headlessly with Streamlit's AppTest:
+
+    import             importing Streamlit itself (not counted against the app)
+    first run          the first script run, including the app's own imports
+    rerun              a rerun with nothing changed
+    load placeholders  clicking Load placeholder terms with every mode selected
+    generate           generating every search string
+    regenerate         generating again, served from the cache
+    about page         the first run of the About page with its video embeds
+
+The median of the runs is compared with the budget for each step; the exit
+status is 1 if any step is over budget. Timings include AppTest's own overhead
+(it polls the script thread), so compare them on the same machine; set
+PPSG_DEBUG=1 to see how much of a run is the script itself.
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+# milliseconds; generous enough for a small cloud container
+DEFAULT_BUDGETS = {
+    "first run": 1500,
+    "rerun": 300,
+    "load placeholders": 400,
+    "generate": 1000,
+    "regenerate": 500,
+    "about page": 1000,
+}
+
+
+# one cold start, run in a fresh interpreter
+def measure():
+    timings = {}
+    start = time.perf_counter()
+
+    def lap(name):
+        nonlocal start
+        now = time.perf_counter()
+        timings[name] = (now - start) * 1000
+        start = now
+
+    from streamlit.testing.v1 import AppTest
+
+    lap("import")
+    app = AppTest.from_file(str(ROOT / "pairwise-pubmed.py"), default_timeout=60)
+    app.run()
+    lap("first run")
+    app.run()
+    lap("rerun")
+    for key in ("mesh_sh", "proximity_kw", "intersection_kw"):
+        app.checkbox(key=key).check()
+    app.run()
+    start = time.perf_counter()
+    app.button(key="load_placeholder_terms_button").click().run()
+    lap("load placeholders")
+    app.button(key="generate_search_strings_button").click().run()
+    lap("generate")
+    app.button(key="generate_search_strings_button").click().run()
+    lap("regenerate")
+    if app.exception:
+        raise RuntimeError(app.exception[0].message)
+    AppTest.from_file(str(ROOT / "pages" / "1_About.py"), default_timeout=60).run()
+    lap("about page")
+    return timings
+
+
+def parse_budget(text):
+    name, _, milliseconds = text.rpartition("=")
+    if name not in DEFAULT_BUDGETS:
+        raise argparse.ArgumentTypeError(f"unknown step {name!r}; choose from {', '.join(DEFAULT_BUDGETS)}")
+    return name, float(milliseconds)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget", type=parse_budget, action="append", default=[], help='e.g. "first run=1200"')
+    parser.add_argument("--output", type=Path, help="write the median timings to this JSON file")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        print(json.dumps(measure()))
+        return
+
+    runs = []
+    for _ in range(args.runs):
+        child = subprocess.run(
+            [sys.executable, __file__, "--child"], capture_output=True, text=True, cwd=ROOT, check=True
+        )
+        runs.append(json.loads(child.stdout.strip().splitlines()[-1]))
+    medians = {name: statistics.median(run[name] for run in runs) for name in runs[0]}
+    budgets = {**DEFAULT_BUDGETS, **dict(args.budget)}
+    over = []
+    for name, milliseconds in medians.items():
+        budget = budgets.get(name)
+        status = "" if budget is None else ("over budget" if milliseconds > budget else "ok")
+        print(f"{name:<18} {milliseconds:>9.1f} ms" + (f" / {budget:,.0f} ms {status}" if budget else ""))
+        if budget is not None and milliseconds > budget:
+            over.append(name)
+    if args.output:
+        args.output.write_text(json.dumps({"runs": args.runs, "median_ms": medians, "budgets_ms": budgets}, indent=1))
+    if over:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
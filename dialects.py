@@ -0,0 +1,157 @@
+"""Proximity and intersection searches for Ovid, Embase and Scopus alongside PubMed.
+
+Each dialect has its own clause templates, in the (prefix, middle, suffix) form
+pairwise.py uses, and its own OR. render() walks the term lists once, row by
+row, and builds every requested dialect's clauses for a row together, so one
+pass over the n * m product translates a search into all of them.
+
+PubMed's [tiab:~N] allows N words between the two terms. Ovid's adjN and
+Embase's NEAR/N count word positions instead, so they get N + 1. Scopus's W/N
+counts the words in between, as PubMed does. Fields are mapped to their nearest
+equivalents; a PubMed field with no counterpart, such as [ad] in proximity
+searches, is reported as a ValueError for that dialect.
+"""
+
+from typing import NamedTuple
+
+import pairwise
+import splitter
+
+
+class Dialect(NamedTuple):
+    label: str
+    separator: str
+    # template functions by mode, taking the same options as pairwise's
+    templates: dict
+    # the most wildcards one search may contain, where the database documents it
+    wildcard_limit: object = None
+
+
+OVID_FIELDS = {"ti": "ti", "tiab": "ti,ab", "tw": "tw", "all": "mp"}
+EMBASE_FIELDS = {"ti": "ti", "tiab": "ti,ab", "tw": "ti,ab,kw"}
+SCOPUS_FIELDS = {"ti": "TITLE", "tiab": "TITLE-ABS", "tw": "TITLE-ABS-KEY", "all": "ALL"}
+
+
+def _field(fields, label, field):
+    try:
+        return fields[field]
+    except KeyError:
+        raise ValueError(f"{label} has no equivalent of the PubMed [{field}] field") from None
+
+
+def ovid_proximity_template(field="tiab", distance=2):
+    return "(", f" adj{distance + 1} ", f").{_field(OVID_FIELDS, 'Ovid', field)}."
+
+
+def ovid_intersection_template(field="tw"):
+    return "(", " and ", f").{_field(OVID_FIELDS, 'Ovid', field)}."
+
+
+def embase_proximity_template(field="tiab", distance=2):
+    return "('", f"' NEAR/{distance + 1} '", f"'):{_field(EMBASE_FIELDS, 'Embase', field)}"
+
+
+def embase_intersection_template(field="tw"):
+    field = _field(EMBASE_FIELDS, "Embase", field)
+    return "('", f"':{field} AND '", f"':{field})"
+
+
+def scopus_proximity_template(field="tiab", distance=2):
+    return f'{_field(SCOPUS_FIELDS, "Scopus", field)}("', f'" W/{distance} "', '")'
+
+
+def scopus_intersection_template(field="tw"):
+    return f'{_field(SCOPUS_FIELDS, "Scopus", field)}("', '" AND "', '")'
+
+
+DIALECTS = {
+    "pubmed": Dialect(
+        "PubMed",
+        pairwise.SEPARATOR,
+        {"proximity": pairwise.proximity_template, "intersection": pairwise.intersection_template},
+        splitter.WILDCARD_LIMIT,
+    ),
+    "ovid": Dialect(
+        "Ovid",
+        " or ",
+        {"proximity": ovid_proximity_template, "intersection": ovid_intersection_template},
+    ),
+    "embase": Dialect(
+        "Embase",
+        " OR ",
+        {"proximity": embase_proximity_template, "intersection": embase_intersection_template},
+    ),
+    "scopus": Dialect(
+        "Scopus",
+        " OR ",
+        {"proximity": scopus_proximity_template, "intersection": scopus_intersection_template},
+    ),
+}
+OTHER_DIALECTS = ("ovid", "embase", "scopus")
+
+
+class Rendered(NamedTuple):
+    dialect: str
+    generated: pairwise.Generated
+
+    # a note for each documented limit the search is over
+    @property
+    def notes(self):
+        limit = DIALECTS[self.dialect].wildcard_limit
+        if limit is not None and self.generated.wildcards > limit:
+            return [f"over {DIALECTS[self.dialect].label}'s {limit} wildcard limit"]
+        return []
+
+
+def template(dialect, mode, **options):
+    try:
+        make_template = DIALECTS[dialect].templates[mode]
+    except KeyError:
+        raise ValueError(f"No {dialect!r} rendering of {mode!r} searches") from None
+    return make_template(**options)
+
+
+# the clauses of each dialect for every topic 1 term, one tuple of lists per row; the
+# part of a clause before the topic 2 term is built once per row and dialect
+def clause_rows(mode, topic1_terms, topic2_terms, dialects=tuple(DIALECTS), **options):
+    templates = [template(dialect, mode, **options) for dialect in dialects]
+    topic2_terms = list(topic2_terms)
+    for topic1_term in topic1_terms:
+        row = []
+        for prefix, middle, suffix in templates:
+            head = prefix + topic1_term + middle
+            row.append([f"{head}{topic2_term}{suffix}" for topic2_term in topic2_terms])
+        yield tuple(row)
+
+
+# length of a dialect's search string, without rendering it (see estimate.py)
+def estimate_length(dialect, mode, topic1_terms, topic2_terms, **options):
+    pairs = len(topic1_terms) * len(topic2_terms)
+    if not pairs:
+        return 0
+    syntax = "".join(template(dialect, mode, **options))
+    return (
+        len(topic2_terms) * sum(len(term) for term in topic1_terms)
+        + len(topic1_terms) * sum(len(term) for term in topic2_terms)
+        + pairs * len(syntax)
+        + (pairs - 1) * len(DIALECTS[dialect].separator)
+    )
+
+
+# the search in each dialect, with its metrics, from a single pass over the term lists
+def render(mode, topic1_terms, topic2_terms, dialects=tuple(DIALECTS), **options):
+    topic1_terms = list(topic1_terms)
+    topic2_terms = list(topic2_terms)
+    columns = [[] for _ in dialects]
+    for row in clause_rows(mode, topic1_terms, topic2_terms, dialects, **options):
+        for column, clauses in zip(columns, row):
+            column.extend(clauses)
+    pairs = len(topic1_terms) * len(topic2_terms)
+    typed = sum(len(term) for term in topic1_terms) + sum(len(term) for term in topic2_terms)
+    rendered = {}
+    for dialect, column in zip(dialects, columns):
+        search = DIALECTS[dialect].separator.join(column)
+        rendered[dialect] = Rendered(
+            dialect, pairwise.Generated(search, len(search), search.count("*"), pairs, typed)
+        )
+    return rendered
@@ -0,0 +1,153 @@
+"""Exact search string metrics computed from the term lists, before anything is generated.
+
+Every clause is prefix + a + middle + b + suffix, so for n topic 1 terms and
+m topic 2 terms the OR-joined string is
+
+    m * sum(len(a)) + n * sum(len(b)) + n * m * len(syntax) + (n * m - 1) * len(" OR ")
+
+characters long, and the same sum over encoded lengths and wildcard counts
+gives the launch URL length and the number of wildcards. With three or more
+lists (N-way intersection and MeSH searches), each list's terms appear once per
+combination of the other lists' terms, and its syntax piece once per clause.
+
+check_ceilings() refuses a search from its estimate, before anything is
+generated, when it has too many clauses or would be too long.
+"""
+
+from math import prod
+from typing import NamedTuple
+
+import pairwise
+
+
+class Estimate(NamedTuple):
+    pairs: int
+    length: int
+    url_length: int
+    wildcards: int
+    typed: int
+
+    @property
+    def generated(self):
+        return self.length - self.typed
+
+    # length, wildcards and URL length of the launch URL, in the order splitter.fits() takes them
+    @property
+    def limits(self):
+        return self.length, self.wildcards, self.url_length
+
+
+EMPTY = Estimate(0, 0, pairwise.url_length(""), 0, 0)
+
+
+def _totals(terms):
+    count = length = encoded = wildcards = 0
+    for term in terms:
+        count += 1
+        length += len(term)
+        encoded += pairwise.fragment_length(term)
+        wildcards += term.count("*")
+    return count, length, encoded, wildcards
+
+
+def estimate(mode, topic1_terms, topic2_terms, *more_terms, **options):
+    if more_terms:
+        return estimate_product(mode, [topic1_terms, topic2_terms, *more_terms], **options)
+    n, topic1_length, topic1_encoded, topic1_wildcards = _totals(topic1_terms)
+    m, topic2_length, topic2_encoded, topic2_wildcards = _totals(topic2_terms)
+    pairs = n * m
+    if not pairs:
+        return EMPTY._replace(typed=topic1_length + topic2_length)
+    syntax = "".join(pairwise.template(mode, **options))
+    separators = (pairs - 1) * len(pairwise.SEPARATOR)
+    separators_encoded = (pairs - 1) * pairwise.fragment_length(pairwise.SEPARATOR)
+    return Estimate(
+        pairs,
+        m * topic1_length + n * topic2_length + pairs * len(syntax) + separators,
+        pairwise.url_length("")
+        + m * topic1_encoded
+        + n * topic2_encoded
+        + pairs * pairwise.fragment_length(syntax)
+        + separators_encoded,
+        m * topic1_wildcards + n * topic2_wildcards + pairs * syntax.count("*"),
+        topic1_length + topic2_length,
+    )
+
+
+# metrics of pairwise.product_clauses() for three or more term lists
+def estimate_product(mode, term_lists, **options):
+    totals = [_totals(terms) for terms in term_lists]
+    clauses = prod(count for count, _, _, _ in totals)
+    typed = sum(length for _, length, _, _ in totals)
+    if not clauses:
+        return EMPTY._replace(typed=typed)
+    prefix, middles, suffix = pairwise.product_template(mode, len(term_lists), **options)
+    syntax = prefix + "".join(middles) + suffix
+    separators = clauses - 1
+    # each term appears in every combination of the other lists' terms
+    return Estimate(
+        clauses,
+        sum(clauses // count * length for count, length, _, _ in totals)
+        + clauses * len(syntax)
+        + separators * len(pairwise.SEPARATOR),
+        pairwise.url_length("")
+        + sum(clauses // count * encoded for count, _, encoded, _ in totals)
+        + clauses * sum(pairwise.fragment_length(piece) for piece in (prefix, *middles, suffix))
+        + separators * pairwise.fragment_length(pairwise.SEPARATOR),
+        sum(clauses // count * wildcards for count, _, _, wildcards in totals) + clauses * syntax.count("*"),
+        typed,
+    )
+
+
+# metrics of pairwise.generate_factored_intersection(); pairs still counts the n * m
+# combinations it covers
+def estimate_factored_intersection(topic1_terms, topic2_terms, *more_terms, field="tw"):
+    totals = [_totals(terms) for terms in (topic1_terms, topic2_terms, *more_terms)]
+    combinations = prod(count for count, _, _, _ in totals)
+    typed = sum(length for _, length, _, _ in totals)
+    if not combinations:
+        return EMPTY._replace(typed=typed)
+    terms = sum(count for count, _, _, _ in totals)
+    tag = f"[{field}]"
+    syntax = (
+        "((" + (len(totals) - 1) * ") AND (" + "))" + terms * tag + (terms - len(totals)) * pairwise.SEPARATOR
+    )
+    return Estimate(
+        combinations,
+        typed + len(syntax),
+        pairwise.url_length("") + sum(encoded for _, _, encoded, _ in totals) + pairwise.encoded_length(syntax),
+        sum(wildcards for _, _, _, wildcards in totals) + syntax.count("*"),
+        typed,
+    )
+
+
+# metrics of the Boolean OR of several searches, e.g. the MeSH + proximity hybrid
+def estimate_union(*estimates):
+    parts = [item for item in estimates if item.pairs]
+    if not parts:
+        return EMPTY._replace(typed=sum(item.typed for item in estimates))
+    separators = len(parts) - 1
+    return Estimate(
+        sum(item.pairs for item in parts),
+        sum(item.length for item in parts) + separators * len(pairwise.SEPARATOR),
+        pairwise.url_length("")
+        + sum(item.url_length - pairwise.url_length("") for item in parts)
+        + separators * pairwise.fragment_length(pairwise.SEPARATOR),
+        sum(item.wildcards for item in parts),
+        sum(item.typed for item in estimates),
+    )
+
+
+# a message saying which ceiling the search is over, or None when it is within both
+def check_ceilings(search_estimate, max_clauses, max_length):
+    if search_estimate.pairs > max_clauses:
+        return (
+            f"This search would have {search_estimate.pairs:,} clauses, which is over the "
+            f"{max_clauses:,} clause limit"
+        )
+    if search_estimate.length > max_length:
+        return (
+            f"This search string would be {search_estimate.length:,} characters long, which is over the "
+            f"{max_length:,} character limit"
+        )
+    return None
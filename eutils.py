@@ -0,0 +1,235 @@
+"""Run generated search strings against an ESearch-compatible endpoint.
+
+Searches go over a small pool of keep-alive HTTP connections, concurrently but
+within NCBI's request rate (3 requests/s, or 10 with an API key). When a search
+has been split into several sub-queries, the first one opens a history server
+session (WebEnv) and the rest are posted into it one after another, so the
+history numbers them #1, #2 ... in order. The results are then combined on the
+server with "#1 OR #2 ..." so no PMID lists have to be merged locally. Transport
+and protocol failures are raised as EutilsError (or OSError, for connections
+that fail or time out).
+"""
+
+import asyncio
+import json
+import os
+import ssl
+from typing import NamedTuple
+from urllib.parse import urlencode, urlsplit
+
+import httpio
+import pairwise
+
+EUTILS_URL = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/esearch.fcgi"
+TOOL = "pairwise-pubmed-search-generator"
+
+
+class EutilsError(Exception):
+    pass
+
+
+class ESearchResult(NamedTuple):
+    count: int
+    ids: list
+    webenv: str
+    query_key: str
+
+
+class CombinedResult(NamedTuple):
+    count: int
+    ids: list
+    webenv: str
+    query_key: str
+    # one result per sub-query, in order
+    parts: list
+
+
+class RateLimiter:
+    def __init__(self, rate):
+        self.interval = 1 / rate if rate else 0
+        self._next = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self):
+        if not self.interval:
+            return
+        async with self._lock:
+            loop = asyncio.get_running_loop()
+            now = loop.time()
+            if self._next > now:
+                await asyncio.sleep(self._next - now)
+                now = self._next
+            self._next = now + self.interval
+
+
+# keep-alive HTTP/1.1 connections to one host, at most `size` open at a time
+class ConnectionPool:
+    def __init__(self, url, size=3, timeout=60):
+        parts = urlsplit(url)
+        self.host = parts.hostname
+        self.secure = parts.scheme == "https"
+        self.port = parts.port or (443 if self.secure else 80)
+        self.timeout = timeout
+        self._slots = asyncio.Semaphore(size)
+        self._idle = []
+        self.opened = 0
+
+    async def _connect(self):
+        self.opened += 1
+        return await asyncio.open_connection(
+            self.host,
+            self.port,
+            ssl=ssl.create_default_context() if self.secure else None,
+            limit=1024 * 1024,
+        )
+
+    async def request(self, method, target, body=b"", headers=None):
+        async with self._slots:
+            # a reused connection may have been closed by the server; retry once on a fresh one
+            for attempt in range(2):
+                reused = bool(self._idle)
+                reader, writer = self._idle.pop() if reused else await self._connect()
+                try:
+                    result = await asyncio.wait_for(
+                        self._exchange(reader, writer, method, target, body, headers or {}),
+                        self.timeout,
+                    )
+                except (ConnectionError, asyncio.IncompleteReadError, httpio.HTTPError):
+                    writer.close()
+                    if reused and attempt == 0:
+                        continue
+                    raise
+                except BaseException:
+                    writer.close()
+                    raise
+                status, response_headers, response_body = result
+                if httpio.keep_alive(response_headers):
+                    self._idle.append((reader, writer))
+                else:
+                    writer.close()
+                return status, response_headers, response_body
+
+    async def _exchange(self, reader, writer, method, target, body, headers):
+        head = {
+            "Host": self.host,
+            "User-Agent": TOOL,
+            "Accept": "application/json",
+            "Connection": "keep-alive",
+            "Content-Length": len(body),
+            **headers,
+        }
+        lines = [f"{method} {target} HTTP/1.1"] + [f"{name}: {value}" for name, value in head.items()]
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body)
+        await writer.drain()
+        start, response_headers = await httpio.read_head(reader)
+        if start is None:
+            raise ConnectionError("Connection closed before a response was received")
+        try:
+            status = int(start.split()[1])
+        except (ValueError, IndexError):
+            raise httpio.HTTPError(f"Malformed HTTP status line: {start[:80]!r}") from None
+        response_body = await httpio.read_body(
+            reader, response_headers, until_close=not httpio.keep_alive(response_headers)
+        )
+        return status, response_headers, response_body
+
+    async def close(self):
+        while self._idle:
+            _, writer = self._idle.pop()
+            writer.close()
+
+
+class ESearchClient:
+    def __init__(self, url=EUTILS_URL, api_key=None, email=None, rate=None, connections=3):
+        self.url = url
+        self.api_key = api_key
+        self.email = email
+        self.path = urlsplit(url).path or "/"
+        self.pool = ConnectionPool(url, connections)
+        self.limiter = RateLimiter(rate if rate is not None else (10 if api_key else 3))
+        self.requests = 0
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        await self.pool.close()
+
+    # long terms are POSTed, so they are not limited by URL length
+    async def esearch(self, term, webenv=None, retmax=0, usehistory=True):
+        params = {"db": "pubmed", "term": str(term), "retmode": "json", "retmax": retmax, "tool": TOOL}
+        if usehistory:
+            params["usehistory"] = "y"
+        if webenv:
+            params["WebEnv"] = webenv
+        if self.api_key:
+            params["api_key"] = self.api_key
+        if self.email:
+            params["email"] = self.email
+        await self.limiter.wait()
+        self.requests += 1
+        try:
+            status, _, body = await self.pool.request(
+                "POST",
+                self.path,
+                urlencode(params).encode("ascii"),
+                {"Content-Type": "application/x-www-form-urlencoded"},
+            )
+        except (httpio.HTTPError, asyncio.IncompleteReadError) as error:
+            raise EutilsError(f"Unreadable ESearch response: {error}") from error
+        if status != 200:
+            raise EutilsError(f"ESearch returned HTTP {status}: {body[:200].decode('utf-8', 'replace')}")
+        try:
+            result = json.loads(body)["esearchresult"]
+        except (ValueError, KeyError) as error:
+            raise EutilsError(f"Unexpected ESearch response: {body[:200]!r}") from error
+        if "ERROR" in result:
+            raise EutilsError(f"ESearch error: {result['ERROR']}")
+        return ESearchResult(
+            int(result.get("count", 0)),
+            result.get("idlist", []),
+            result.get("webenv", webenv or ""),
+            result.get("querykey", ""),
+        )
+
+    # run sub-queries in one history session and OR them together on the server; they are
+    # posted one at a time, since the combined query refers to them by history number
+    async def search(self, queries, retmax=0):
+        queries = list(queries)
+        if not queries:
+            raise ValueError("No search strings to run")
+        first = await self.esearch(queries[0], retmax=0 if len(queries) > 1 else retmax)
+        if len(queries) == 1:
+            return CombinedResult(*first, [first])
+        parts = [first]
+        for query in queries[1:]:
+            parts.append(await self.esearch(query, first.webenv))
+        combined = await self.esearch(
+            pairwise.SEPARATOR.join(f"#{part.query_key}" for part in parts),
+            first.webenv,
+            retmax,
+        )
+        return CombinedResult(*combined, parts)
+
+
+# client options from the environment: PPSG_EUTILS_URL (e.g. a local mock server),
+# NCBI_API_KEY and NCBI_EMAIL
+def client_from_environment(**options):
+    return ESearchClient(
+        url=os.environ.get("PPSG_EUTILS_URL", EUTILS_URL),
+        api_key=os.environ.get("NCBI_API_KEY") or None,
+        email=os.environ.get("NCBI_EMAIL") or None,
+        **options,
+    )
+
+
+# blocking entry point for the Streamlit page and scripts
+def run_search(queries, retmax=0, **client_options):
+    async def run():
+        async with client_from_environment(**client_options) as client:
+            return await client.search(queries, retmax)
+
+    return asyncio.run(run())
@@ -0,0 +1,233 @@
+"""Streaming exports of generated searches as plain text, JSON and CSV.
+
+Every exporter is a generator of text chunks produced straight from the pair
+generator, so even a 10k x 10k export never holds the search string in memory.
+write() encodes the chunks to a binary file object; batch.py uses it to write
+exports to disk, and the page writes them to a temporary file for its download
+buttons.
+
+A search is a list of Parts ORed together: one for a single mode, two for the
+MeSH hybrids. JSON exports carry the metrics, the search string and, for each
+part, the pair matrix of clauses (one row per Topic 1 term). CSV exports have
+one row per pair clause. Intersection and MeSH parts may AND further term lists
+(more_terms) into every clause; their clauses have no pair matrix, and their
+CSV rows have a column per list.
+"""
+
+import csv
+import io
+import itertools
+import json
+from typing import NamedTuple
+
+import estimate
+import pairwise
+import splitter
+
+FORMATS = {
+    "txt": "text/plain",
+    "json": "application/json",
+    "csv": "text/csv",
+}
+# the (Topic 1 terms) AND (Topic 2 terms) search, which is a single clause
+FACTORED = "factored intersection"
+CSV_ROWS_PER_CHUNK = 4096
+
+
+class Part(NamedTuple):
+    mode: str
+    topic1_terms: list
+    topic2_terms: list
+    options: dict
+    # topic 3 onwards, for N-way intersection and MeSH searches
+    more_terms: tuple = ()
+
+    @property
+    def term_lists(self):
+        return [self.topic1_terms, self.topic2_terms, *self.more_terms]
+
+
+def part_clauses(part):
+    if part.mode == FACTORED:
+        return iter(["".join(pairwise.factored_intersection_pieces(*part.term_lists, **part.options))])
+    return pairwise.clauses(part.mode, *part.term_lists, **part.options)
+
+
+# the whole search's clauses, in generated order
+def clauses(parts):
+    return pairwise.union(*(part_clauses(part) for part in parts))
+
+
+def part_estimate(part):
+    if part.mode == FACTORED:
+        return estimate.estimate_factored_intersection(*part.term_lists, **part.options)
+    return estimate.estimate(part.mode, *part.term_lists, **part.options)
+
+
+def search_estimate(parts):
+    if len(parts) == 1:
+        return part_estimate(parts[0])
+    return estimate.estimate_union(*(part_estimate(part) for part in parts))
+
+
+def metrics(parts):
+    totals = search_estimate(parts)
+    return {**totals._asdict(), "generated": totals.generated}
+
+
+def part_generated(part):
+    if part.mode == FACTORED:
+        return pairwise.generate_factored_intersection(*part.term_lists, **part.options)
+    return pairwise.generate(part.mode, *part.term_lists, **part.options)
+
+
+def generate(parts):
+    if len(parts) == 1:
+        return part_generated(parts[0])
+    return pairwise.generate_union(*(part_generated(part) for part in parts))
+
+
+# the URL-encoded search string, for pairwise.url_from_encoded
+def encoded_search_string(parts):
+    return pairwise.url_fragment(pairwise.SEPARATOR).join(
+        pairwise.url_encode("".join(part_clauses(part)))
+        if part.mode == FACTORED
+        else pairwise.encoded_search_string(part.mode, *part.term_lists, **part.options)
+        for part in parts
+    )
+
+
+def text_chunks(parts, chunk_size=pairwise.DEFAULT_CHUNK_SIZE):
+    return pairwise.chunks(clauses(parts), chunk_size)
+
+
+# rows of (mode, topic 1 term, topic 2 term, ..., clause), with a term column for each of
+# the most term lists any part has; the factored search has no pair terms
+def rows(parts):
+    columns = max(len(part.term_lists) for part in parts)
+    for part in parts:
+        if part.mode == FACTORED:
+            yield (part.mode, *[""] * columns, next(part_clauses(part)))
+            continue
+        padding = [""] * (columns - len(part.term_lists))
+        for terms, clause in zip(itertools.product(*part.term_lists), part_clauses(part)):
+            yield (part.mode, *terms, *padding, clause)
+
+
+def _csv_chunks(header, row_stream):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(header)
+    for number, row in enumerate(row_stream, start=1):
+        writer.writerow(row)
+        if number % CSV_ROWS_PER_CHUNK == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def csv_chunks(parts):
+    columns = max(len(part.term_lists) for part in parts)
+    return _csv_chunks(("mode", *(f"topic{number}" for number in range(1, columns + 1)), "clause"), rows(parts))
+
+
+# a long JSON string value, written in pieces
+def _json_string_chunks(text_chunk_stream):
+    yield '"'
+    for chunk in text_chunk_stream:
+        yield json.dumps(chunk, ensure_ascii=False)[1:-1]
+    yield '"'
+
+
+def _pair_matrix_chunks(part):
+    if part.mode == FACTORED or part.more_terms:
+        yield "null"
+        return
+    clause_stream = part_clauses(part)
+    yield "["
+    for row in range(len(part.topic1_terms)):
+        yield (",\n" if row else "\n") + json.dumps(
+            [next(clause_stream) for _ in part.topic2_terms], ensure_ascii=False
+        )
+    yield "\n]"
+
+
+def json_chunks(parts, chunk_size=pairwise.DEFAULT_CHUNK_SIZE):
+    yield '{"metrics": ' + json.dumps(metrics(parts)) + ', "search_string": '
+    yield from _json_string_chunks(text_chunks(parts, chunk_size))
+    yield ', "parts": ['
+    for number, part in enumerate(parts):
+        yield (", " if number else "") + json.dumps(
+            {
+                "mode": part.mode,
+                "options": part.options,
+                "topic1_terms": part.topic1_terms,
+                "topic2_terms": part.topic2_terms,
+                **({"more_terms": list(part.more_terms)} if part.more_terms else {}),
+            },
+            ensure_ascii=False,
+        )[:-1] + ', "pair_matrix": '
+        yield from _pair_matrix_chunks(part)
+        yield "}"
+    yield "]}\n"
+
+
+def chunks(parts, export_format):
+    if export_format == "txt":
+        return text_chunks(parts)
+    if export_format == "json":
+        return json_chunks(parts)
+    if export_format == "csv":
+        return csv_chunks(parts)
+    raise ValueError(f"Unknown export format: {export_format!r}")
+
+
+# split searches: one search string per line, in the order they are run
+def split_text_chunks(sub_queries):
+    for sub_query in sub_queries:
+        yield sub_query.query + "\n"
+
+
+# each split search with its metrics, and the query that combines them
+def split_json_chunks(sub_queries):
+    yield '{"searches": ['
+    run = []
+    for sub_query in sub_queries:
+        yield (",\n" if run else "\n") + json.dumps(sub_query._asdict(), ensure_ascii=False)
+        run.append(sub_query._replace(query=""))
+    yield '\n], "history_query": ' + json.dumps(splitter.history_query(run)) + "}\n"
+
+
+# one row per clause, numbered by the split search it went into
+def split_csv_chunks(sub_queries, parts):
+    def numbered():
+        clause_stream = clauses(parts)
+        for sub_query in sub_queries:
+            for _ in range(sub_query.pairs):
+                yield sub_query.number, next(clause_stream)
+
+    return _csv_chunks(("search", "clause"), numbered())
+
+
+def split_chunks(sub_queries, parts, export_format):
+    if export_format == "txt":
+        return split_text_chunks(sub_queries)
+    if export_format == "json":
+        return split_json_chunks(sub_queries)
+    if export_format == "csv":
+        return split_csv_chunks(sub_queries, parts)
+    raise ValueError(f"Unknown export format: {export_format!r}")
+
+
+# encode chunks into a binary file object, returning the bytes written
+def write(chunk_stream, fp):
+    written = 0
+    for chunk in chunk_stream:
+        data = chunk.encode("utf-8")
+        view = memoryview(data)
+        while view:
+            count = fp.write(view)
+            written += count
+            view = view[count:]
+    return written
@@ -0,0 +1,98 @@
+"""Minimal HTTP/1.1 message reading and writing over asyncio streams."""
+
+import json
+from http import HTTPStatus
+
+MAX_HEAD_BYTES = 64 * 1024
+
+
+class HTTPError(Exception):
+    pass
+
+
+# start line and lower-cased headers, or (None, None) if the peer closed the connection
+async def read_head(reader):
+    try:
+        head = await reader.readuntil(b"\r\n\r\n")
+    except ConnectionError:
+        return None, None
+    except Exception as error:
+        if getattr(error, "partial", None) == b"":
+            return None, None
+        raise HTTPError(f"Malformed HTTP message head: {error}") from error
+    if len(head) > MAX_HEAD_BYTES:
+        raise HTTPError("HTTP message head is too large")
+    lines = head.decode("latin-1").split("\r\n")
+    headers = {}
+    for line in lines[1:]:
+        if line:
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+    return lines[0], headers
+
+
+# method and target of a request's start line
+def request_line(start):
+    parts = start.split(" ")
+    if len(parts) != 3 or not parts[2].startswith("HTTP/"):
+        raise HTTPError(f"Malformed request line: {start[:80]!r}")
+    return parts[0], parts[1]
+
+
+# the body length a message declares, 0 without a Content-Length header
+def content_length(headers):
+    try:
+        length = int(headers.get("content-length", 0))
+    except ValueError:
+        raise HTTPError(f"Malformed Content-Length: {headers['content-length'][:80]!r}") from None
+    if length < 0:
+        raise HTTPError(f"Malformed Content-Length: {length}")
+    return length
+
+
+async def read_body(reader, headers, until_close=False):
+    if headers.get("transfer-encoding", "").lower() == "chunked":
+        parts = []
+        while True:
+            line = await reader.readuntil(b"\r\n")
+            try:
+                size = int(line.split(b";")[0], 16)
+            except ValueError:
+                raise HTTPError(f"Malformed chunk size: {line[:80]!r}") from None
+            if size == 0:
+                await reader.readuntil(b"\r\n")
+                return b"".join(parts)
+            parts.append(await reader.readexactly(size))
+            await reader.readexactly(2)
+    if "content-length" in headers:
+        return await reader.readexactly(content_length(headers))
+    return await reader.read() if until_close else b""
+
+
+def keep_alive(headers):
+    return headers.get("connection", "").lower() != "close"
+
+
+def response_head(status, headers):
+    status = HTTPStatus(status)
+    lines = [f"HTTP/1.1 {status.value} {status.phrase}"]
+    lines += [f"{name}: {value}" for name, value in headers.items()]
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+
+def response(status, body, content_type="text/plain; charset=utf-8", headers=None):
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+    head = {"Content-Type": content_type, "Content-Length": len(body), **(headers or {})}
+    return response_head(status, head) + body
+
+
+def json_response(status, payload, headers=None):
+    return response(status, json.dumps(payload), "application/json", headers)
+
+
+# one piece of a Transfer-Encoding: chunked body; an empty piece ends the body
+def chunk(data):
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return f"{len(data):x}\r\n".encode("latin-1") + data + b"\r\n"
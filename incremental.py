@@ -0,0 +1,103 @@
+"""Regenerate a pairwise search after small term list edits by reusing the previous run.
+
+The search string is kept as one OR-joined segment per topic 1 term (a row). When
+topic 1 terms are added or removed, only the new rows are generated. When topic 2
+terms change, every clause's length is known from the template, so each kept row is
+spliced from slices of its old segment plus clauses for the new columns.
+"""
+
+from collections import defaultdict, deque
+
+import estimate
+import pairwise
+
+
+class IncrementalSearch:
+    def __init__(self, mode, **options):
+        self.mode = mode
+        self.options = options
+        self.prefix, self.middle, self.suffix = pairwise.template(mode, **options)
+        self.topic2_terms = []
+        self.rows = {}
+        # clauses formatted and reused by the last call to generate()
+        self.formatted = 0
+        self.reused = 0
+
+    def matches(self, mode, options):
+        return mode == self.mode and options == self.options
+
+    def _row(self, topic1_term, topic2_terms):
+        self.formatted += len(topic2_terms)
+        return pairwise.SEPARATOR.join(
+            f"{self.prefix}{topic1_term}{self.middle}{topic2_term}{self.suffix}"
+            for topic2_term in topic2_terms
+        )
+
+    # (old column, new column) runs; consecutive kept columns are copied as one slice
+    def _column_plan(self, topic2_terms):
+        old_positions = defaultdict(deque)
+        for position, term in enumerate(self.topic2_terms):
+            old_positions[term].append(position)
+        plan = []
+        for term in topic2_terms:
+            old = old_positions[term].popleft() if old_positions[term] else None
+            if old is not None and plan and plan[-1][0] == "copy" and plan[-1][2] == old:
+                plan[-1][2] = old + 1
+            elif old is not None:
+                plan.append(["copy", old, old + 1])
+            elif plan and plan[-1][0] == "new":
+                plan[-1][1].append(term)
+            else:
+                plan.append(["new", [term]])
+        return plan
+
+    def _splice(self, topic1_term, segment, plan, column_starts):
+        # clause j of the old row starts at j * (clause syntax + a + separator) + len(b_0 .. b_j-1)
+        step = len(self.prefix) + len(topic1_term) + len(self.middle) + len(self.suffix) + len(pairwise.SEPARATOR)
+        pieces = []
+        for op in plan:
+            if op[0] == "copy":
+                _, first, last = op
+                start = first * step + column_starts[first]
+                end = last * step + column_starts[last] - len(pairwise.SEPARATOR)
+                pieces.append(segment[start:end])
+                self.reused += last - first
+            else:
+                pieces.append(self._row(topic1_term, op[1]))
+        return pairwise.SEPARATOR.join(pieces)
+
+    def generate(self, topic1_terms, topic2_terms):
+        topic1_terms = list(topic1_terms)
+        topic2_terms = list(topic2_terms)
+        self.formatted = self.reused = 0
+
+        rows = {}
+        if topic2_terms != self.topic2_terms:
+            plan = self._column_plan(topic2_terms)
+            column_starts = [0]
+            for term in self.topic2_terms:
+                column_starts.append(column_starts[-1] + len(term))
+            for topic1_term in topic1_terms:
+                if topic1_term in rows:
+                    continue
+                if topic1_term in self.rows and self.topic2_terms:
+                    rows[topic1_term] = self._splice(topic1_term, self.rows[topic1_term], plan, column_starts)
+                else:
+                    rows[topic1_term] = self._row(topic1_term, topic2_terms)
+        else:
+            for topic1_term in topic1_terms:
+                if topic1_term in rows:
+                    continue
+                if topic1_term in self.rows:
+                    rows[topic1_term] = self.rows[topic1_term]
+                    self.reused += len(topic2_terms)
+                else:
+                    rows[topic1_term] = self._row(topic1_term, topic2_terms)
+
+        self.rows = rows
+        self.topic2_terms = topic2_terms
+        search = ""
+        if topic2_terms:
+            search = pairwise.SEPARATOR.join(rows[topic1_term] for topic1_term in topic1_terms)
+        metrics = estimate.estimate(self.mode, topic1_terms, topic2_terms, **self.options)
+        return pairwise.Generated(search, len(search), metrics.wildcards, metrics.pairs, metrics.typed)
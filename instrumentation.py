@@ -0,0 +1,146 @@
+"""Optional timing spans for the app's hot paths.
+
+A Trace covers one script run, or one rerun of a fragment. Each span times a phase (cleaning a section's
+term lists, generating a search string, rendering it) and carries attributes
+such as the mode, pair count and bytes produced. When enabled, every finished
+span is written as one JSON log line shaped like an OpenTelemetry span, so
+latencies can be aggregated across sessions:
+
+    python instrumentation.py spans.log
+
+prints the count and p50/p95/p99 duration of each span name in a log file.
+"""
+
+import argparse
+import json
+import logging
+import math
+import secrets
+import sys
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import NamedTuple
+
+SERVICE_NAME = "pairwise-pubmed-search-generator"
+
+logger = logging.getLogger("ppsg.spans")
+
+
+class Span(NamedTuple):
+    name: str
+    span_id: str
+    parent_id: str
+    start_ns: int
+    end_ns: int
+    attributes: dict
+
+    @property
+    def duration_ms(self):
+        return (self.end_ns - self.start_ns) / 1e6
+
+    def record(self, trace_id):
+        return {
+            "name": self.name,
+            "trace_id": trace_id,
+            "span_id": self.span_id,
+            "parent_span_id": self.parent_id,
+            "start_time_unix_nano": self.start_ns,
+            "end_time_unix_nano": self.end_ns,
+            "duration_ms": round(self.duration_ms, 3),
+            "attributes": self.attributes,
+            "resource": {"service.name": SERVICE_NAME},
+        }
+
+
+# JSON lines go to stderr, or to the file named by PPSG_SPAN_LOG
+def configure_logging(path=None):
+    if logger.handlers:
+        return
+    handler = logging.FileHandler(path, encoding="utf-8") if path else logging.StreamHandler(sys.stderr)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+
+class Trace:
+    def __init__(self, enabled=False, name="script run", **attributes):
+        self.enabled = enabled
+        self.name = name
+        self.attributes = attributes
+        self.trace_id = secrets.token_hex(16)
+        self.root_id = secrets.token_hex(8)
+        self.start_ns = time.time_ns()
+        self._start_perf = time.perf_counter_ns()
+        self.spans = []
+        self._open = []
+        self.finished = False
+
+    # times the block; the yielded dict collects attributes such as pairs and bytes
+    @contextmanager
+    def span(self, name, **attributes):
+        if not self.enabled:
+            yield attributes
+            return
+        span_id = secrets.token_hex(8)
+        parent_id = self._open[-1] if self._open else self.root_id
+        self._open.append(span_id)
+        start_ns = time.time_ns()
+        start_perf = time.perf_counter_ns()
+        try:
+            yield attributes
+        except BaseException as error:
+            attributes["error"] = type(error).__name__
+            raise
+        finally:
+            self._open.pop()
+            self._finish(Span(name, span_id, parent_id, start_ns, start_ns + time.perf_counter_ns() - start_perf, attributes))
+
+    def _finish(self, span):
+        self.spans.append(span)
+        logger.info(json.dumps(span.record(self.trace_id), default=str))
+
+    # ends the root span, which covers the whole run
+    def finish(self):
+        self.finished = True
+        if not self.enabled:
+            return None
+        root = Span(
+            self.name,
+            self.root_id,
+            "",
+            self.start_ns,
+            self.start_ns + time.perf_counter_ns() - self._start_perf,
+            self.attributes,
+        )
+        self._finish(root)
+        return root
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, math.ceil(fraction * len(sorted_values)) - 1)]
+
+
+# (name, count, p50, p95, p99) in milliseconds for the span lines of a log file
+def summarize(lines):
+    durations = defaultdict(list)
+    for line in lines:
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        if isinstance(record, dict) and "duration_ms" in record:
+            durations[record["name"]].append(record["duration_ms"])
+    for name, values in sorted(durations.items()):
+        values.sort()
+        yield name, len(values), percentile(values, 0.5), percentile(values, 0.95), percentile(values, 0.99)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Summarize span durations from JSON log lines.")
+    parser.add_argument("log", nargs="?", type=argparse.FileType("r", encoding="utf-8"), default=sys.stdin)
+    args = parser.parse_args()
+    print(f"{'span':<28} {'count':>7} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10}")
+    for name, count, p50, p95, p99 in summarize(args.log):
+        print(f"{name:<28} {count:>7} {p50:>10.2f} {p95:>10.2f} {p99:>10.2f}")
@@ -0,0 +1,207 @@
+"""Generate large search strings in worker processes, smallest job first.
+
+A 10k x 10k proximity search takes minutes of pure-Python string building, and
+while the Streamlit script thread does that it holds the GIL, so every other
+session on the server stalls. GenerationJobs runs such searches in a small
+process pool instead; the session that asked for one only polls for progress,
+which releases the GIL, and searches under the page's size threshold keep being
+generated in the script thread without ever queueing behind large ones.
+
+Jobs wait in a queue ordered by their estimated length, so when the pool is
+busy a 100k-pair search is not stuck behind a 100M-pair one, and a job that
+several sessions ask for (same cache key) is only run once. Each worker writes
+the search string to a temporary file in chunks: its size is the job's progress,
+and a cancel file next to it stops the worker at the next chunk. A shared job is
+only cancelled once every session waiting on it has cancelled, and a finished job
+nobody collects is dropped, with its file, after JOB_EXPIRY seconds.
+"""
+
+import heapq
+import itertools
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import export
+import pairwise
+
+DEFAULT_WORKERS = 2
+# workers run at a lower CPU priority than the web server's interactive work
+WORKER_NICENESS = 10
+# chunks written between checks for the cancel file
+CANCEL_CHECK_CHUNKS = 16
+# seconds a finished job's search string is kept for sessions that have not collected it
+JOB_EXPIRY = 600
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+CANCELLED = "cancelled"
+FAILED = "failed"
+
+
+class JobCancelled(Exception):
+    pass
+
+
+def _lower_priority():
+    if hasattr(os, "nice"):
+        os.nice(WORKER_NICENESS)
+
+
+# runs in a worker process
+def write_search_string(parts, path, cancel_path):
+    with open(path, "w", encoding="utf-8", newline="") as fp:
+        for number, chunk in enumerate(export.text_chunks(parts)):
+            if number % CANCEL_CHECK_CHUNKS == 0 and os.path.exists(cancel_path):
+                raise JobCancelled()
+            fp.write(chunk)
+
+
+class Job:
+    def __init__(self, key, parts, search_estimate, directory, sequence):
+        self.key = key
+        self.sequence = sequence
+        self.parts = parts
+        self.estimate = search_estimate
+        self.path = os.path.join(directory, f"{sequence}.txt")
+        self.cancel_path = os.path.join(directory, f"{sequence}.cancel")
+        self.state = QUEUED
+        self.error = None
+        self.waiters = set()
+        self.finished_at = None
+        self.done = threading.Event()
+        self._result = None
+        self._result_lock = threading.Lock()
+
+    # (pairs written, total pairs), from the bytes written so far
+    def progress(self):
+        if self.state == DONE:
+            return self.estimate.pairs, self.estimate.pairs
+        try:
+            written = os.path.getsize(self.path)
+        except OSError:
+            written = 0
+        fraction = min(1.0, written / self.estimate.length) if self.estimate.length else 0.0
+        return int(fraction * self.estimate.pairs), self.estimate.pairs
+
+    # the generated search, once done; its metrics are the exact estimate
+    def result(self):
+        with self._result_lock:
+            if self._result is not None:
+                return self._result
+            with open(self.path, encoding="utf-8", newline="") as fp:
+                search_string = fp.read()
+            self._result = pairwise.Generated(
+                search_string, len(search_string), self.estimate.wildcards, self.estimate.pairs, self.estimate.typed
+            )
+            os.remove(self.path)
+            return self._result
+
+    def wait(self, timeout=None):
+        return self.done.wait(timeout)
+
+
+class GenerationJobs:
+    def __init__(self, workers=DEFAULT_WORKERS):
+        self.workers = workers
+        # spawned workers do not inherit the web server's threads and sockets
+        self._executor = ProcessPoolExecutor(
+            workers, mp_context=multiprocessing.get_context("spawn"), initializer=_lower_priority
+        )
+        self._directory = tempfile.mkdtemp(prefix="ppsg-jobs-")
+        self._lock = threading.Lock()
+        self._sequence = itertools.count()
+        self._queue = []
+        self._running = 0
+        self._jobs = {}
+
+    # the job for this key, started or queued if it is not already; waiter names
+    # the session waiting on it, so that cancelling only stops the job for all
+    def submit(self, key, parts, search_estimate, waiter=None):
+        with self._lock:
+            self._expire()
+            job = self._jobs.get(key)
+            if job is None or job.state in (CANCELLED, FAILED):
+                sequence = next(self._sequence)
+                job = self._jobs[key] = Job(key, parts, search_estimate, self._directory, sequence)
+                heapq.heappush(self._queue, (search_estimate.length, sequence, job))
+                self._dispatch()
+            job.waiters.add(waiter)
+            return job
+
+    # queued jobs that will start before this one
+    def position(self, job):
+        with self._lock:
+            if job.state != QUEUED:
+                return 0
+            return sum(1 for item in self._queue if item[:2] < (job.estimate.length, job.sequence))
+
+    # stops waiting on the job, and cancels it once no other session waits on it
+    def cancel(self, job, waiter=None):
+        with self._lock:
+            job.waiters.discard(waiter)
+            if job.waiters:
+                return
+            if job.state == QUEUED:
+                self._queue = [item for item in self._queue if item[2] is not job]
+                heapq.heapify(self._queue)
+                self._finish(job, CANCELLED)
+            elif job.state == RUNNING:
+                open(job.cancel_path, "w").close()
+
+    # the finished job's result, dropping it from the table once read
+    def collect(self, job):
+        with self._lock:
+            if self._jobs.get(job.key) is job:
+                del self._jobs[job.key]
+        return job.result()
+
+    def shutdown(self):
+        self._executor.shutdown(cancel_futures=True)
+        shutil.rmtree(self._directory, ignore_errors=True)
+
+    # called with the lock held
+    def _dispatch(self):
+        while self._queue and self._running < self.workers:
+            _, _, job = heapq.heappop(self._queue)
+            job.state = RUNNING
+            self._running += 1
+            future = self._executor.submit(write_search_string, job.parts, job.path, job.cancel_path)
+            future.add_done_callback(lambda future, job=job: self._done(job, future))
+
+    def _done(self, job, future):
+        with self._lock:
+            self._running -= 1
+            error = future.exception()
+            if error is None:
+                self._finish(job, DONE)
+            else:
+                job.error = error
+                self._finish(job, CANCELLED if isinstance(error, JobCancelled) else FAILED)
+            self._expire()
+            self._dispatch()
+
+    # called with the lock held; finished jobs no session collected in time
+    def _expire(self):
+        now = time.monotonic()
+        for key, job in list(self._jobs.items()):
+            if job.state == DONE and now - job.finished_at > JOB_EXPIRY:
+                del self._jobs[key]
+                if os.path.exists(job.path):
+                    os.remove(job.path)
+
+    def _finish(self, job, state):
+        job.state = state
+        job.finished_at = time.monotonic()
+        if state != DONE:
+            for path in (job.path, job.cancel_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            if self._jobs.get(job.key) is job:
+                del self._jobs[job.key]
+        job.done.set()
@@ -0,0 +1,175 @@
+"""Local stand-in for ESearch, for testing and benchmarking eutils.py offline.
+
+Usage: python mock_eutils.py [--port 8765] [--latency 0.05]
+then set PPSG_EUTILS_URL=http://127.0.0.1:8765/esearch.fcgi
+
+The server speaks enough of the ESearch JSON interface for eutils.py: POST or GET
+parameters, usehistory/WebEnv/query_key, retmax/retstart, and an error for terms
+over PubMed's 256 wildcard limit. A term is split into its top-level OR clauses;
+"#n" refers to an earlier search in the same WebEnv and every other clause
+matches a fixed pseudo-random set of PMIDs derived from its text (some clauses
+match nothing), so the same search always gets the same count.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import random
+from urllib.parse import parse_qs, urlsplit
+
+import httpio
+
+WILDCARD_LIMIT = 256
+MAX_PMID = 40_000_000
+# at most this many PMIDs per clause; about one clause in five matches nothing
+MAX_CLAUSE_HITS = 60
+
+
+# top-level OR clauses, ignoring ORs inside quotes, brackets and parentheses
+def top_level_clauses(term):
+    clauses = []
+    depth = 0
+    quoted = False
+    start = 0
+    position = 0
+    while position < len(term):
+        char = term[position]
+        if char == '"':
+            quoted = not quoted
+        elif not quoted and char in "([":
+            depth += 1
+        elif not quoted and char in ")]":
+            depth -= 1
+        elif not quoted and depth == 0 and term.startswith(" OR ", position):
+            clauses.append(term[start:position])
+            position += 4
+            start = position
+            continue
+        position += 1
+    clauses.append(term[start:])
+    return [clause.strip() for clause in clauses if clause.strip()]
+
+
+def clause_pmids(clause):
+    seed = int.from_bytes(hashlib.sha256(clause.casefold().encode("utf-8")).digest()[:8], "big")
+    generator = random.Random(seed)
+    hits = max(0, generator.randint(-MAX_CLAUSE_HITS // 4, MAX_CLAUSE_HITS))
+    return {generator.randint(1, MAX_PMID) for _ in range(hits)}
+
+
+class MockESearchServer:
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.histories = {}
+        self.requests = 0
+        self.connections = 0
+        self._server = None
+        # open connections, so close() can end them and let their handlers finish
+        self._connections = {}
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}/esearch.fcgi"
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def close(self):
+        self._server.close()
+        for writer in self._connections.values():
+            writer.transport.abort()
+        await asyncio.gather(*self._connections, return_exceptions=True)
+        await self._server.wait_closed()
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def _handle(self, reader, writer):
+        self.connections += 1
+        self._connections[asyncio.current_task()] = writer
+        try:
+            while True:
+                start, headers = await httpio.read_head(reader)
+                if start is None:
+                    break
+                try:
+                    method, target = httpio.request_line(start)
+                except httpio.HTTPError as error:
+                    writer.write(httpio.response(400, str(error), headers={"Connection": "close"}))
+                    await writer.drain()
+                    break
+                body = await httpio.read_body(reader, headers)
+                self.requests += 1
+                params = parse_qs(urlsplit(target).query)
+                if method == "POST":
+                    params.update(parse_qs(body.decode("utf-8")))
+                if self.latency:
+                    await asyncio.sleep(self.latency)
+                if not urlsplit(target).path.endswith("esearch.fcgi"):
+                    writer.write(httpio.response(404, "Not found"))
+                else:
+                    writer.write(httpio.json_response(200, self.esearch({k: v[-1] for k, v in params.items()})))
+                await writer.drain()
+                if not httpio.keep_alive(headers):
+                    break
+        except (ConnectionError, httpio.HTTPError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._connections.pop(asyncio.current_task(), None)
+            writer.close()
+
+    def esearch(self, params):
+        term = params.get("term", "")
+        if term.count("*") > WILDCARD_LIMIT:
+            return {"esearchresult": {"ERROR": f"Wildcard search for '{term[:40]}...' used more than {WILDCARD_LIMIT} wildcards"}}
+        webenv = params.get("WebEnv") or f"MCID_{len(self.histories) + 1:08d}"
+        history = self.histories.setdefault(webenv, [])
+        pmids = set()
+        for clause in top_level_clauses(term):
+            if clause.startswith("#") and clause[1:].isdigit():
+                key = int(clause[1:])
+                if not 0 < key <= len(history):
+                    return {"esearchresult": {"ERROR": f"Unknown query key {key}"}}
+                pmids |= history[key - 1]
+            else:
+                pmids |= clause_pmids(clause)
+        result = {
+            "count": str(len(pmids)),
+            "retmax": params.get("retmax", "20"),
+            "retstart": params.get("retstart", "0"),
+            "idlist": [],
+            "querytranslation": term,
+        }
+        retstart = int(params.get("retstart", 0))
+        retmax = int(params.get("retmax", 20))
+        result["idlist"] = [str(pmid) for pmid in sorted(pmids, reverse=True)[retstart:retstart + retmax]]
+        if params.get("usehistory") == "y":
+            history.append(pmids)
+            result["webenv"] = webenv
+            result["querykey"] = str(len(history))
+        return {"header": {"type": "esearch", "version": "0.3"}, "esearchresult": result}
+
+
+async def serve(host, port, latency):
+    server = await MockESearchServer(host, port, latency).start()
+    print(f"Mock ESearch listening on {server.url}")
+    await asyncio.Event().wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a local mock ESearch server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds to wait before each response")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port, args.latency))
+    except KeyboardInterrupt:
+        pass
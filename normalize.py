@@ -0,0 +1,41 @@
+"""Clean up pasted term lists before they are paired."""
+
+from math import prod
+from typing import NamedTuple
+
+
+class Normalized(NamedTuple):
+    terms: list
+    blanks: int
+    duplicates: int
+
+    @property
+    def removed(self):
+        return self.blanks + self.duplicates
+
+
+# trim and collapse whitespace, drop blank lines and case-insensitive duplicates
+# (PubMed ignores case), keeping the first spelling of each term
+def normalize_terms(terms, sort=False):
+    seen = set()
+    cleaned = []
+    blanks = duplicates = 0
+    for term in terms:
+        term = " ".join(term.split())
+        if not term:
+            blanks += 1
+            continue
+        folded = term.casefold()
+        if folded in seen:
+            duplicates += 1
+            continue
+        seen.add(folded)
+        cleaned.append(term)
+    if sort:
+        cleaned.sort(key=str.casefold)
+    return Normalized(cleaned, blanks, duplicates)
+
+
+# pairs (or, with more than two lists, combinations) saved by normalizing the lists of a search
+def pairs_removed(term_lists, normalized_lists):
+    return prod(len(terms) for terms in term_lists) - prod(len(normalized.terms) for normalized in normalized_lists)
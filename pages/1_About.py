@@ -0,0 +1,49 @@
+# About page: news and video embeds, kept off the generator page so it starts quickly
+import streamlit as st
+from streamlit_player import st_player
+
+st.set_page_config(
+    page_title="About the Pairwise PubMed Search Generator",
+    page_icon="🔎",
+    menu_items={
+        "Get help": "mailto:whimar@ohsu.edu",
+        "Report a Bug": "https://github.com/marijane/pairwise-pubmed-search-generator/issues",
+        "About": "Made by Marijane White with Streamlit",
+    },
+)
+st.html("<h1>Pairwise PubMed Search Generator</h1>")
+
+st.html("<h2>About</h2>")
+st.write(
+    """
+The **Pairwise PubMed Search Generator** is a tool designed to streamline the creation of complex PubMed search strings. By using two lists of input terms, you can quickly generate search queries that can either be copied to your clipboard or launched directly in PubMed with a single click.
+This tool can save you thousands of keystrokes and help prevent errors in intricate search constructions.
+"""
+)
+st.html("<h2>Features</h2>")
+st.write(
+    """
+* **MeSH Pairing:** Combine a list of MeSH Main Headings with a list of MeSH Subheadings
+* **Proximity Search:** Generate PubMed proximity searches from two lists of terms
+* **Intersection Search**: Combine two lists of terms using the AND operator, either pair by pair or factored into a much shorter (Topic 1) AND (Topic 2) search
+* **Hybrid Search**: Merge a pairwise MeSH search with either a proximity or intersection search
+"""
+)
+st.html("<h2>PPSG News</h2>")
+st.write(
+    "The PPSG was officially announced to the world in a 15-minute how-to presentation at the [PNCMLA November 2025 Virtual Conference](https://pncmla.org/November-2025-Virtual-Conference). It gives some context for the tool and there is a demo at the end."
+)
+st_player("https://youtu.be/cWFvpcVXhbw?si=3vavQbvbLhttgIxl&t=2657")
+
+st.write(
+    "In February 2026, the PPSG was added to [TERA Tools](https://tera-tools.com/), a suite of tools aimed at accelerating evidence synthesis studies. You can find it under the *Pairwise Pubmed* button in the sidebar once you're logged into TERA."
+)
+
+st.write(
+    "In March 2026, I wrote [a blog post about the PPSG](https://uxcaucustips.blogspot.com/2026/03/tip65-search-string-theory-applying.html) for the [MLA UX Caucus Database Tips Blog](https://uxcaucustips.blogspot.com/). It covers much of the same information as in the PNCMLA presentation, but in a bit more depth."
+)
+
+st.write(
+    "In June 2026, [Carrie Price](https://carrieprice78.github.io/) re-started her excellent [Five Minute Friday](https://www.youtube.com/@carrieprice78/featured) YouTube series with a feature on the PPSG. Watch this if you'd like to see a demo with something other than the built-in placeholder terms."
+)
+st_player("https://youtu.be/32i0SO0LwPI?si=6yny1OX5SNZolMFq")
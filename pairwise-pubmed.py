@@ -1,9 +1,45 @@
+import functools
+import os
+import secrets
+import tempfile
+
 import streamlit as st
-from streamlit_player import st_player
 
-pubmed_search_url = "https://pubmed.ncbi.nlm.nih.gov/?term="
+import cache
+import dialects
+import estimate
+import eutils
+import export
+import incremental
+import instrumentation
+import jobs
+import normalize
+import pairwise
+import parsing
+import profiling
+import splitter
+import subsumption
+import vocabulary
+
 text_area_height = 250
 collapse_search_string_exp = 1000
+# longer search strings are shown a page at a time, on request
+preview_page_size = 10_000
+split_searches_per_page = 10
+pmid_preview_count = 20
+max_search_string_length = int(os.environ.get("PPSG_MAX_SEARCH_STRING_LENGTH", 50_000_000))
+# most clauses (pairs, or combinations of three or more lists) a search may have
+max_clauses = int(os.environ.get("PPSG_MAX_CLAUSES", 10_000_000))
+not_generated = pairwise.Generated("", 0, 0, 0, 0)
+# longer searches are generated in a worker process, with progress and a cancel button
+offload_length = int(os.environ.get("PPSG_OFFLOAD_LENGTH", 2_000_000))
+generation_workers = int(os.environ.get("PPSG_GENERATION_WORKERS", jobs.DEFAULT_WORKERS))
+# PubMed baseline XML sample to profile pairs against instead of PubMed itself
+profile_index_path = os.environ.get("PPSG_PROFILE_INDEX")
+# NLM MeSH descriptor XML (desc2025.xml) to check headings and subheadings against
+mesh_xml_path = os.environ.get("PPSG_MESH_XML")
+# timing spans in a debug panel and as JSON log lines, with PPSG_DEBUG=1 or ?debug=1
+debug_from_environment = os.environ.get("PPSG_DEBUG", "") not in ("", "0")
 
 
 # example term lists
@@ -84,12 +120,22 @@ tool*
 """.strip()
 
 
+# hide generated search strings until the form is submitted again
+def hide_results():
+    st.session_state["show_results"] = False
+
+
 # reset form button callback
 def reset_form():
+    st.session_state["normalize"] = True
+    st.session_state["sort_terms"] = False
     if st.session_state.get("mesh_sh", False):
         st.session_state["mesh_sh"] = False
         st.session_state["majr"] = False
         st.session_state["noexp"] = False
+        st.session_state["check_mesh"] = True
+        st.session_state["plan_mesh_tree"] = True
+        st.session_state["expand_mesh"] = []
     if st.session_state.get("proximity_kw", False):
         st.session_state["proximity_kw"] = True
         st.session_state["pd"] = 2
@@ -97,7 +143,10 @@ def reset_form():
     if st.session_state.get("intersection_kw", False):
         st.session_state["intersection_kw"] = False
         st.session_state["sf"] = "tw"
+        st.session_state["factored"] = False
+        st.session_state["prune_subsumed"] = False
     clear_terms()
+    hide_results()
 
 
 # clear text input button callback
@@ -106,12 +155,15 @@ def clear_terms():
     if st.session_state.get("mesh_sh", False):
         st.session_state["mesh"] = ""
         st.session_state["subheadings"] = ""
+        st.session_state["mesh topic 3"] = ""
     if st.session_state.get("proximity_kw", False):
         st.session_state["proximity topic 1"] = ""
         st.session_state["proximity topic 2"] = ""
     if st.session_state.get("intersection_kw", False):
         st.session_state["intersection topic 1"] = ""
         st.session_state["intersection topic 2"] = ""
+        st.session_state["intersection topic 3"] = ""
+    hide_results()
 
 
 # load examples button callback
@@ -131,6 +183,618 @@ def load_placeholders():
         st.session_state["intersection topic 1"] = intersection_topic1_example
         st.session_state["intersection topic 2"] = intersection_topic2_example
         st.session_state["sf"] = "tw"
+    hide_results()
+
+
+# fill in the form from a search string this tool generated (see parsing.py)
+def import_search():
+    try:
+        parsed = parsing.parse(st.session_state.get("imported_search", ""))
+    except parsing.ParseError as error:
+        st.session_state["import_messages"] = [("error", f"The search string could not be read: {error}")]
+        return
+    messages = [
+        (
+            "success",
+            f"Read {parsed.clauses:,} clauses ({parsed.length:,} characters, {parsed.wildcards:,} wildcards) "
+            f"into {len(parsed.sections)} section{'s' if len(parsed.sections) != 1 else ''}.",
+        )
+    ]
+    mesh_sections = [section for section in parsed.sections if section.mode == "mesh"]
+    proximity_sections = [section for section in parsed.sections if section.mode == "proximity"]
+    intersection_sections = [
+        section for section in parsed.sections if section.mode in ("intersection", export.FACTORED)
+    ]
+    st.session_state["mesh_sh"] = bool(mesh_sections)
+    st.session_state["proximity_kw"] = bool(proximity_sections)
+    st.session_state["intersection_kw"] = bool(intersection_sections)
+    # terms are filled in as generated, so keep their order
+    st.session_state["sort_terms"] = False
+    st.session_state["mesh topic 3"] = ""
+    st.session_state["intersection topic 3"] = ""
+    if mesh_sections:
+        # MeSH checking splits a search into runs with their own subheadings or noexp
+        headings = dict.fromkeys(term for section in mesh_sections for term in section.topic1_terms)
+        subheadings = dict.fromkeys(term for section in mesh_sections for term in section.topic2_terms)
+        more_headings = dict.fromkeys(
+            term for section in mesh_sections for more_terms in section.more_terms[:1] for term in more_terms
+        )
+        st.session_state["mesh"] = "\n".join(headings)
+        st.session_state["subheadings"] = "\n".join(subheadings)
+        st.session_state["mesh topic 3"] = "\n".join(more_headings)
+        if any(len(section.more_terms) > 1 for section in mesh_sections):
+            messages.append(("warning", "The MeSH search ANDs more than one further list; only the first was filled in."))
+        st.session_state["majr"] = mesh_sections[0].options["majr"]
+        # with Topic 3 headings, the setting as given is theirs; a tree plan may change the pair's
+        st.session_state["noexp"] = all(
+            section.options.get("more_noexp", section.options["noexp"]) for section in mesh_sections
+        )
+        if len(mesh_sections) > 1 or not mesh_sections[0].complete:
+            messages.append(
+                ("warning", "The MeSH search does not pair every heading with every subheading; regenerating it will.")
+            )
+    for sections, label in ((proximity_sections, "proximity"), (intersection_sections, "intersection")):
+        if not sections:
+            continue
+        section = sections[0]
+        st.session_state[f"{label} topic 1"] = "\n".join(section.topic1_terms)
+        st.session_state[f"{label} topic 2"] = "\n".join(section.topic2_terms)
+        if section.more_terms:
+            st.session_state[f"{label} topic 3"] = "\n".join(section.more_terms[0])
+            if len(section.more_terms) > 1:
+                messages.append(
+                    ("warning", f"The {label} search ANDs more than one further list; only the first was filled in.")
+                )
+        if section.options["field"] in pairwise.FIELDS[label]:
+            st.session_state["pf" if label == "proximity" else "sf"] = section.options["field"]
+        else:
+            messages.append(("warning", f"The [{section.options['field']}] field is not available for {label} searches."))
+        if label == "proximity":
+            st.session_state["pd"] = section.options["distance"]
+        else:
+            st.session_state["factored"] = section.mode == export.FACTORED
+        if len(sections) > 1:
+            messages.append(("warning", f"Only the first of {len(sections)} {label} searches was filled in."))
+        elif not section.complete:
+            messages.append(
+                ("warning", f"The {label} search does not pair every topic 1 term with every topic 2 term; regenerating it will.")
+            )
+    st.session_state["import_messages"] = messages
+    hide_results()
+
+
+# generation cache shared by all sessions, sized by PPSG_CACHE_MAX_BYTES
+@st.cache_resource
+def generation_cache():
+    return cache.LRUCache(
+        int(os.environ.get("PPSG_CACHE_MAX_BYTES", cache.DEFAULT_MAX_BYTES))
+    )
+
+
+def cached_generation(key_parts, generate):
+    generation_key = cache.cache_key(*key_parts)
+    with trace.span("generate", mode=str(key_parts[0])) as attributes:
+        attributes["cached"] = generation_key in generation_cache()
+        generated = generation_cache().get_or_create(generation_key, generate)
+        if isinstance(generated, pairwise.Generated):
+            attributes["pairs"] = generated.pairs
+            attributes["bytes"] = generated.length
+        elif isinstance(generated, list):
+            attributes["searches"] = len(generated)
+        return generated
+
+
+# worker processes shared by all sessions, which run the largest searches last
+@st.cache_resource
+def generation_jobs():
+    return jobs.GenerationJobs(generation_workers)
+
+
+# wait for a worker process to generate the search, showing its progress; waiting
+# leaves the script thread idle, so other sessions keep running meanwhile
+def offloaded_generation(generation_key, parts, search_estimate, key):
+    cancelled = st.session_state.setdefault("cancelled_generations", set())
+    if generation_key in cancelled:
+        st.info("Generation cancelled. Press **Generate search strings** to start it again.")
+        return None
+    waiter = st.session_state.setdefault("generation_waiter", secrets.token_hex(8))
+    job = generation_jobs().submit(generation_key, parts, search_estimate, waiter)
+    if st.button("Cancel generation", key=f"{key}_cancel", icon=":material/cancel:"):
+        generation_jobs().cancel(job, waiter)
+        cancelled.add(generation_key)
+        st.info("Generation cancelled. Press **Generate search strings** to start it again.")
+        return None
+    progress = st.progress(0.0)
+    while not job.wait(0.25):
+        if job.state == jobs.QUEUED:
+            ahead = generation_jobs().position(job)
+            progress.progress(0.0, text=f"Waiting for a free worker ({ahead:,} searches queued ahead)...")
+            continue
+        done, total = job.progress()
+        progress.progress(done / total if total else 0.0, text=f"Generating: {done:,} of {total:,} pairs")
+    progress.empty()
+    if job.state == jobs.CANCELLED:
+        st.info("Generation was cancelled. Press **Generate search strings** to start it again.")
+        return None
+    if job.state != jobs.DONE:
+        st.error(f"Generation failed: {job.error}")
+        return None
+    return generation_jobs().collect(job)
+
+
+# cached_generation for a section; searches over offload_length are generated off-thread
+def section_generation(key_parts, parts, search_estimate, key, generate):
+    if search_estimate.length <= offload_length:
+        return cached_generation(key_parts, generate)
+    generation_key = cache.cache_key(*key_parts)
+    generated = generation_cache().get(generation_key)
+    if generated is not None:
+        return generated
+    with trace.span("generate", mode=str(key_parts[0]), offloaded=True) as attributes:
+        generated = offloaded_generation(generation_key, parts, search_estimate, key)
+        if generated is None:
+            return not_generated
+        attributes["pairs"] = generated.pairs
+        attributes["bytes"] = generated.length
+    generation_cache().put(generation_key, generated)
+    return generated
+
+
+# trim, dedupe and optionally sort the term lists of a section, reporting what was dropped
+def clean_term_lists(term_lists, normalize_terms, sort_terms):
+    if not normalize_terms:
+        return term_lists
+    with trace.span("clean terms", terms=sum(len(terms) for terms in term_lists)):
+        normalized_lists = [normalize.normalize_terms(terms, sort=sort_terms) for terms in term_lists]
+    if any(normalized.removed for normalized in normalized_lists):
+        blanks = sum(normalized.blanks for normalized in normalized_lists)
+        duplicates = sum(normalized.duplicates for normalized in normalized_lists)
+        # an optional list left empty does not take part in the search
+        used = [index for index, normalized in enumerate(normalized_lists) if index < 2 or normalized.terms]
+        removed_pairs = normalize.pairs_removed(
+            [term_lists[index] for index in used], [normalized_lists[index] for index in used]
+        )
+        st.caption(
+            f"Cleaning up the term lists removed {blanks} blank and {duplicates} duplicate terms, "
+            f"saving {removed_pairs:,} {'pairs' if len(used) == 2 else 'combinations'}."
+        )
+    return [normalized.terms for normalized in normalized_lists]
+
+
+# drop intersection terms that a truncated term in the same list already matches
+def prune_subsumed_terms(*term_lists):
+    pruned_lists = [subsumption.prune(terms) for terms in term_lists]
+    removals = [removal for pruned in pruned_lists for removal in pruned.removals]
+    if removals:
+        with st.expander(
+            f"{len(removals)} terms removed because a truncated term already matches them"
+        ):
+            st.markdown("\n".join(f"* {removal.explanation}" for removal in removals[:200]))
+            if len(removals) > 200:
+                st.caption(f"... and {len(removals) - 200:,} more")
+    return [pruned.terms for pruned in pruned_lists]
+
+
+# compiled on the first run after the XML changes, then memory-mapped
+@st.cache_resource
+def mesh_vocabulary():
+    with st.spinner("Indexing the MeSH vocabulary..."):
+        return vocabulary.load(mesh_xml_path)
+
+
+# map entry terms to preferred headings and drop the pairs MeSH does not allow, returning
+# (headings, subheadings, noexp) groups whose pairs are all valid and the checked Topic 3
+# headings; with plan_tree, headings are first exploded or dropped over the MeSH tree for
+# the shortest equivalent search. Topic 3 headings keep the noexp setting as given.
+def check_mesh_terms(headings, subheadings, more_headings, noexp, plan_tree, expand):
+    notes = []
+    lines = []
+    omitted = ()
+    if plan_tree:
+        plan = vocabulary.plan_explosion(mesh_vocabulary(), headings, noexp, expand, subheadings)
+        headings, noexp, omitted = plan.headings, plan.noexp, plan.omitted
+        if plan.covered:
+            notes.append(f"{len(plan.covered)} headings already included by an exploded heading")
+        if plan.omitted:
+            notes.append(f"{len(plan.omitted):,} pairs already included by an exploded heading")
+        if plan.exploded:
+            notes.append(f"{len(plan.exploded)} headings exploded in place of their narrower headings")
+        if plan.expanded:
+            notes.append(f"{len(plan.expanded)} headings expanded into narrower headings")
+        lines += [f"* {heading} is included in {parent}[mh]" for heading, parent in plan.covered]
+        lines += [f"* {heading} is exploded, since every heading under it is listed" for heading in plan.exploded]
+        lines += [f"* {heading} is written out as {', '.join(narrower)}" for heading, narrower in plan.expanded]
+        lines += [
+            f"* {heading}/{subheading} is included in {parent}/{subheading}[mh]"
+            for heading, subheading, parent in plan.omitted
+        ]
+    checked = vocabulary.check_pairs(mesh_vocabulary(), headings, subheadings, noexp, omitted)
+    checked_more = vocabulary.check_headings(mesh_vocabulary(), more_headings)
+    groups = checked.groups
+    # without any of its Topic 3 headings the search would find far more than asked for
+    if more_headings and not checked_more.headings:
+        groups = []
+        notes.append("no Topic 3 heading found in MeSH, so no MeSH search is generated")
+    replaced = checked.replaced + checked_more.replaced
+    unknown = checked.unknown + checked_more.unknown
+    if replaced:
+        notes.append(f"{len(replaced)} entry terms replaced by their preferred headings")
+    if unknown:
+        notes.append(f"{len(unknown)} terms not found in MeSH")
+    if checked.skipped:
+        notes.append(f"{len(checked.skipped):,} pairs skipped because the subheading is not allowed for the heading")
+    if notes:
+        with st.expander("MeSH check: " + ", ".join(notes)):
+            lines += [f"* {entry_term} → {preferred}" for entry_term, preferred in replaced]
+            lines += [f"* {term} is not a MeSH heading or subheading" for term in unknown]
+            lines += [f"* {subheading} is not allowed for {heading}" for heading, subheading in checked.skipped]
+            st.markdown("\n".join(lines[:200]))
+            if len(lines) > 200:
+                st.caption(f"... and {len(lines) - 200:,} more")
+    return groups, checked_more.headings
+
+
+# regenerate from this session's previous run of the same section, reusing unchanged rows
+def incremental_generation(section, mode, topic1_terms, topic2_terms, **options):
+    searches = st.session_state.setdefault("incremental_searches", {})
+    search = searches.get(section)
+    if search is None or not search.matches(mode, options):
+        search = searches[section] = incremental.IncrementalSearch(mode, **options)
+    return search.generate(topic1_terms, topic2_terms)
+
+
+# metrics predicted from the term lists, shown before anything is generated
+def show_estimate(search_estimate):
+    notes = [
+        f"{search_estimate.pairs:,} pairs",
+        f"{search_estimate.length:,} characters",
+        f"{search_estimate.wildcards:,} wildcards",
+        f"{search_estimate.url_length:,} byte URL",
+    ]
+    if search_estimate.wildcards > splitter.WILDCARD_LIMIT:
+        notes.append(f"over the {splitter.WILDCARD_LIMIT} wildcard limit")
+    if search_estimate.pairs > max_clauses:
+        notes.append("too many clauses to generate")
+    elif search_estimate.length > max_search_string_length:
+        notes.append("too long to generate")
+    st.caption("Estimated search string: " + ", ".join(notes))
+
+
+# refuse runaway generations before they allocate anything
+def within_generation_budget(search_estimate):
+    over = estimate.check_ceilings(search_estimate, max_clauses, max_search_string_length)
+    if over is None:
+        return True
+    st.error(f"{over} for generating in the app. Please shorten the term lists.")
+    return False
+
+
+# search string in an expander; long ones are only sent to the browser a page at a time
+def show_search_string(label, search_string, key, expanded):
+    if len(search_string) <= preview_page_size:
+        with trace.span("render search string", key=key, bytes=len(search_string)):
+            with st.expander(label, expanded=expanded):
+                st.code(str(search_string), wrap_lines=True)
+        return
+    show_search_string_pages(label, search_string, key)
+    st.download_button(
+        label="Download search string",
+        data=lambda: str(search_string),
+        file_name=f"{key.replace('_', '-')}-search.txt",
+        mime="text/plain",
+        key=f"{key}_download",
+        on_click="ignore",
+        icon=":material/download:",
+        use_container_width=True,
+    )
+
+
+# a fragment rerun gets its own trace; the script run's trace has finished by then
+def traced_fragment(function):
+    @st.fragment
+    @functools.wraps(function)
+    def run(*args, **kwargs):
+        global trace
+        if not trace.finished:
+            return function(*args, **kwargs)
+        trace = instrumentation.Trace(trace.enabled, "fragment run", fragment=function.__name__)
+        try:
+            return function(*args, **kwargs)
+        finally:
+            trace.finish()
+
+    return run
+
+
+@traced_fragment
+def show_search_string_pages(label, search_string, key):
+    with st.expander(label, expanded=False):
+        pages = pairwise.page_count(search_string, preview_page_size)
+        if not st.toggle(f"Preview search string ({pages} pages)", key=f"{key}_preview"):
+            return
+        number = st.number_input(
+            "Page", min_value=1, max_value=pages, step=1, key=f"{key}_page"
+        )
+        st.code(pairwise.page(search_string, number, preview_page_size), wrap_lines=True)
+
+
+# a section's URL-encoded search string, assembled from the encoded terms of the same
+# parts it is generated from and cached with it, so every launch link built from a
+# section encodes the same search
+def encoded_section(key_parts, parts):
+    return cached_generation(("encoded", key_parts), lambda: export.encoded_search_string(parts))
+
+
+# launch URLs that are too long for most browsers are only built when asked for;
+# make_url builds the URL from encoded sections instead of encoding the search string
+def show_launch_button(label, search_string, search_estimate, key, primary=False, make_url=None):
+    if search_estimate.url_length <= splitter.DEFAULT_URL_BUDGET:
+        st.link_button(
+            label=label,
+            type="primary" if primary else "secondary",
+            url=make_url() if make_url else pairwise.search_url(search_string),
+            use_container_width=True,
+        )
+    else:
+        show_long_launch_button(label, search_string, search_estimate, key, make_url)
+
+
+@traced_fragment
+def show_long_launch_button(label, search_string, search_estimate, key, make_url=None):
+    if st.toggle(
+        f"Build launch link anyway ({search_estimate.url_length:,} byte URL, which is likely too long for PubMed)",
+        key=f"{key}_launch",
+    ):
+        st.link_button(
+            label=label,
+            url=make_url() if make_url else pairwise.search_url(search_string),
+            use_container_width=True,
+        )
+
+
+def split_searches(key_parts, parts):
+    return cached_generation(
+        ("split", key_parts),
+        lambda: list(splitter.split(export.clauses(parts))),
+    )
+
+
+# split searches, exports and PubMed result counts for a generated search string;
+# parts are the export.Parts the search string is the union of
+def show_search_tools(search_string, search_estimate, key_parts, parts, label, key):
+    split = splitter.needs_split(*search_estimate.limits)
+    if split:
+        show_split_search_pages(split_searches(key_parts, parts), label, key)
+    show_exports(parts, key_parts, split, key)
+    show_pubmed_count(search_string, search_estimate, key_parts, parts, key)
+
+
+# export chunks are written to a temporary file, so a download is never joined in memory
+# (Streamlit still reads the finished file to serve it)
+def export_file(chunk_stream):
+    fp = tempfile.TemporaryFile(buffering=0)
+    export.write(chunk_stream, fp)
+    fp.seek(0)
+    return fp
+
+
+# text, JSON (with the pair matrix and metrics) and CSV (one row per pair clause) downloads,
+# built from the pair generator only when clicked
+def show_exports(parts, key_parts, split, key):
+    with st.expander("Export", expanded=False):
+        columns = st.columns(len(export.FORMATS))
+        for column, (export_format, mime) in zip(columns, export.FORMATS.items()):
+            with column:
+                st.download_button(
+                    label=f"Search string ({export_format.upper()})",
+                    data=lambda export_format=export_format: export_file(export.chunks(parts, export_format)),
+                    file_name=f"{key.replace('_', '-')}-search.{export_format}",
+                    mime=mime,
+                    key=f"{key}_export_{export_format}",
+                    on_click="ignore",
+                    icon=":material/download:",
+                    use_container_width=True,
+                )
+        if not split:
+            return
+        columns = st.columns(len(export.FORMATS))
+        for column, (export_format, mime) in zip(columns, export.FORMATS.items()):
+            with column:
+                st.download_button(
+                    label=f"Split searches ({export_format.upper()})",
+                    data=lambda export_format=export_format: export_file(
+                        export.split_chunks(split_searches(key_parts, parts), parts, export_format)
+                    ),
+                    file_name=f"{key.replace('_', '-')}-split-searches.{export_format}",
+                    mime=mime,
+                    key=f"{key}_split_export_{export_format}",
+                    on_click="ignore",
+                    icon=":material/download:",
+                    use_container_width=True,
+                )
+
+
+# run the search, or its split searches combined in one search history, through ESearch
+@traced_fragment
+def show_pubmed_count(search_string, search_estimate, key_parts, parts, key):
+    if not st.button(
+        "Count results in PubMed",
+        key=f"{key}_count",
+        icon=":material/functions:",
+        use_container_width=True,
+    ):
+        return
+    queries = [search_string]
+    if splitter.needs_split(*search_estimate.limits):
+        queries = [sub_query.query for sub_query in split_searches(key_parts, parts)]
+    with st.spinner(f"Running {len(queries)} searches in PubMed..." if len(queries) > 1 else "Running search in PubMed..."):
+        try:
+            result = eutils.run_search(queries, retmax=pmid_preview_count)
+        except (eutils.EutilsError, OSError) as error:
+            st.error(f"The search could not be run in PubMed: {error}")
+            return
+    st.metric("PubMed results", value=f"{result.count:,}", border=True)
+    if len(result.parts) > 1:
+        st.caption(
+            "Split search results: "
+            + ", ".join(f"#{number} {part.count:,}" for number, part in enumerate(result.parts, start=1))
+        )
+    if result.ids:
+        st.markdown(
+            f"First {len(result.ids)} PMIDs: "
+            + ", ".join(f"[{pmid}](https://pubmed.ncbi.nlm.nih.gov/{pmid}/)" for pmid in result.ids)
+        )
+
+
+# the pairwise search written for Ovid, Embase and Scopus, all rendered in one pass
+# over the term lists when the toggle is first switched on
+@traced_fragment
+def show_translations(mode, topic1_terms, topic2_terms, key_parts, key, **options):
+    if not st.toggle("Translate for Ovid, Embase and Scopus", key=f"{key}_dialects"):
+        return
+    available = []
+    for dialect in dialects.OTHER_DIALECTS:
+        label = dialects.DIALECTS[dialect].label
+        try:
+            length = dialects.estimate_length(dialect, mode, topic1_terms, topic2_terms, **options)
+        except ValueError as error:
+            st.caption(f"{error}, so there is no {label} search.")
+            continue
+        if length > max_search_string_length:
+            st.caption(f"The {label} search would be {length:,} characters long, which is too long to generate.")
+            continue
+        available.append(dialect)
+    if not available:
+        return
+    rendered = cached_generation(
+        ("dialects", key_parts, available),
+        lambda: dialects.render(mode, topic1_terms, topic2_terms, tuple(available), **options),
+    )
+    for dialect, item in rendered.items():
+        generated = item.generated
+        notes = [f"{generated.length:,} characters", f"{generated.wildcards:,} wildcards"] + item.notes
+        show_search_string(
+            f"{dialects.DIALECTS[dialect].label} search string ({', '.join(notes)})",
+            generated.search_string,
+            f"{key}_{dialect}",
+            expanded=False,
+        )
+
+
+@st.cache_resource
+def profile_index():
+    if not profile_index_path:
+        return None
+    return profiling.LocalIndex.from_xml(profile_index_path)
+
+
+# hit counts for every pair, as a heatmap, and the search string without the zero-yield pairs
+@traced_fragment
+def show_pair_profile(mode, topic1_terms, topic2_terms, label, key, **options):
+    # altair takes a quarter of a second to import, so only profiled pages pay for it
+    import altair as alt
+
+    with st.expander("Profile hit counts for each pair", expanded=False):
+        pairs = len(topic1_terms) * len(topic2_terms)
+        if profile_index_path:
+            st.caption(f"Each pair is counted in the local index built from {os.path.basename(profile_index_path)}.")
+        else:
+            rate = 10 if os.environ.get("NCBI_API_KEY") else 3
+            st.caption(
+                f"Each of the {pairs:,} pairs is counted with its own PubMed search, "
+                f"which takes about {pairs / rate:,.0f} seconds at {rate} searches per second."
+            )
+        profile_key = (mode, topic1_terms, topic2_terms, options)
+        if st.button("Profile pairs", key=f"{key}_profile_run", icon=":material/grid_on:", use_container_width=True):
+            with st.spinner(f"Counting results for {pairs:,} pairs..."):
+                try:
+                    index = profile_index()
+                    st.session_state[f"{key}_profile"] = (
+                        profile_key,
+                        profiling.run_profile(
+                            mode,
+                            topic1_terms,
+                            topic2_terms,
+                            index=index,
+                            index_name=profile_index_path,
+                            **options,
+                        ),
+                    )
+                except (eutils.EutilsError, OSError, ValueError) as error:
+                    st.error(f"The pairs could not be profiled: {error}")
+                    return
+        profiled = st.session_state.get(f"{key}_profile")
+        # a profile of an earlier version of the term lists is not shown
+        if profiled is None or profiled[0] != profile_key:
+            return
+        pair_profile = profiled[1]
+        rows = [
+            {"Topic 1": term1, "Topic 2": term2, "Results": pair_profile.count(row, column)}
+            for row, term1 in enumerate(topic1_terms)
+            for column, term2 in enumerate(topic2_terms)
+        ]
+        st.altair_chart(
+            alt.Chart(alt.Data(values=rows))
+            .mark_rect()
+            .encode(
+                x=alt.X("Topic 2:N", sort=topic2_terms),
+                y=alt.Y("Topic 1:N", sort=topic1_terms),
+                color=alt.Color("Results:Q", scale=alt.Scale(type="symlog")),
+                tooltip=["Topic 1:N", "Topic 2:N", "Results:Q"],
+            ),
+            use_container_width=True,
+        )
+        if not pair_profile.zero_pairs:
+            st.success("Every pair finds at least one record.")
+            return
+        pruned = pairwise.SEPARATOR.join(pair_profile.productive_clauses())
+        st.warning(f"{pair_profile.zero_pairs:,} of {pairs:,} pairs find no records.")
+        if not pruned:
+            return
+        show_search_string("Search string with only productive pairs", pruned, f"{key}_pruned", False)
+        show_launch_button(
+            f"{label} (productive pairs only)",
+            pruned,
+            estimate.Estimate(
+                pairs - pair_profile.zero_pairs, len(pruned), pairwise.url_length(pruned), pruned.count("*"), 0
+            ),
+            f"{key}_pruned",
+        )
+
+
+@traced_fragment
+def show_split_search_pages(sub_queries, label, key):
+    with st.expander(
+        f"Split into {len(sub_queries)} PubMed-safe search strings",
+        expanded=False,
+    ):
+        st.write(
+            "This search string is over PubMed's wildcard limit or too long to launch. "
+            "Run each of these searches in order in a new [search history](https://pubmed.ncbi.nlm.nih.gov/advanced/), "
+            "then combine them with:"
+        )
+        st.code(splitter.history_query(sub_queries), wrap_lines=True)
+        first = 0
+        if len(sub_queries) > split_searches_per_page:
+            number = st.number_input(
+                f"Page of {split_searches_per_page} searches",
+                min_value=1,
+                max_value=-(-len(sub_queries) // split_searches_per_page),
+                step=1,
+                key=f"{key}_split_page",
+            )
+            first = (number - 1) * split_searches_per_page
+        for sub_query in sub_queries[first:first + split_searches_per_page]:
+            st.code(sub_query.query, wrap_lines=True)
+            if sub_query.oversized:
+                st.warning(
+                    f"Search #{sub_query.number} is a single pair that is still over the limits on its own."
+                )
+            st.link_button(
+                label=f"{label} #{sub_query.number} ({sub_query.pairs} pairs, {sub_query.wildcards} wildcards)",
+                url=sub_query.url,
+                use_container_width=True,
+            )
 
 
 st.set_page_config(
@@ -144,24 +808,18 @@ st.set_page_config(
 )
 st.html("<h1>Pairwise PubMed Search Generator</h1>")
 
-# info/instructions sidebar
+debug = debug_from_environment or st.query_params.get("debug", "") not in ("", "0")
+if debug:
+    instrumentation.configure_logging(os.environ.get("PPSG_SPAN_LOG"))
+trace = instrumentation.Trace(debug)
+
+# info/instructions sidebar; the About page with news and videos is only loaded when visited
 with st.expander(":material/info: Info and Tips", expanded=False):
-    st.html("<h2>About</h2>")
-    st.write(
-        """
-The **Pairwise PubMed Search Generator** is a tool designed to streamline the creation of complex PubMed search strings. By using two lists of input terms, you can quickly generate search queries that can either be copied to your clipboard or launched directly in PubMed with a single click.
-This tool can save you thousands of keystrokes and help prevent errors in intricate search constructions.
-"""
-)
-    st.html("<h2>Features</h2>")
-    st.write(
-        """
-* **MeSH Pairing:** Combine a list of MeSH Main Headings with a list of MeSH Subheadings
-* **Proximity Search:** Generate PubMed proximity searches from two lists of terms
-* **Intersection Search**: Combine two lists of terms using the AND operator
-* **Hybrid Search**: Merge a pairwise MeSH search with either a proximity or intersection search
-"""
-)
+    st.page_link(
+        "pages/1_About.py",
+        label="About the PPSG, with news and videos",
+        icon=":material/info:",
+    )
     st.html("<h2>Tips</h2>")
     st.write(
         """
@@ -169,34 +827,31 @@ This tool can save you thousands of keystrokes and help prevent errors in intric
 * Use the **Load placeholder terms** button to populate the form with example terms
 * Use the **Clear terms** button to remove all input text without altering other settings
 * Use the **Reset form** button to return the form to its initial state
+* Blank lines, extra spaces and duplicate terms (ignoring case) are removed before pairing unless you uncheck **Clean up term lists**
+* Very long search strings are previewed a page at a time; use the **Download search string** button to get the whole string
+* Use **Start from an existing search string** to fill in the form from a search string the tool generated earlier
+* Use **Export** to download a search string, or its split searches, as text, JSON with the pair matrix, or CSV with one row per pair
 """
 )
     st.html("<h2>Caveats</h2>")
     st.write("""
-* When performing MeSH Main Heading/Subheading searches, ensure that all subheadings are valid for the selected MeSH Main Headings
+* When performing MeSH Main Heading/Subheading searches, ensure that all subheadings are valid for the selected MeSH Main Headings (this is checked for you when the app has a local copy of MeSH)
 * Multi-word terms are supported — no need to add quotation marks; the tool will handle that automatically
 * Generated search URLs may be lengthy. If a URL exceeds the undocumented length limit, use the clipboard copy option instead of launching the search directly
 * PubMed limits search strings to 256 wildcard (*) characters; if an intersection search string exceeds this limit, a warning message will be displayed
+* Search strings that are over the wildcard limit or too long to launch are also split into several smaller searches that can be run in order and combined in PubMed's search history
 """)
-    st.html("<h2>PPSG News</h2>")
-    st.write(
-        "The PPSG was officially announced to the world in a 15-minute how-to presentation at the [PNCMLA November 2025 Virtual Conference](https://pncmla.org/November-2025-Virtual-Conference). It gives some context for the tool and there is a demo at the end."
-    )
-    st_player("https://youtu.be/cWFvpcVXhbw?si=3vavQbvbLhttgIxl&t=2657")
 
-    st.write(
-        "In February 2026, the PPSG was added to [TERA Tools](https://tera-tools.com/), a suite of tools aimed at accelerating evidence synthesis studies. You can find it under the *Pairwise Pubmed* button in the sidebar once you're logged into TERA."
-    )
 
-    st.write(
-        "In March 2026, I wrote [a blog post about the PPSG](https://uxcaucustips.blogspot.com/2026/03/tip65-search-string-theory-applying.html) for the [MLA UX Caucus Database Tips Blog](https://uxcaucustips.blogspot.com/). It covers much of the same information as in the PNCMLA presentation, but in a bit more depth."
+with st.expander(":material/input: Start from an existing search string", expanded=False):
+    st.text_area(
+        "Paste a search string generated by this tool to fill in the form with its term lists and options.",
+        key="imported_search",
+        height=text_area_height,
     )
-
-    st.write(
-        "In June 2026, [Carrie Price](https://carrieprice78.github.io/) re-started her excellent [Five Minute Friday](https://www.youtube.com/@carrieprice78/featured) YouTube series with a feature on the PPSG. Watch this if you'd like to see a demo with something other than the built-in placeholder terms."
-    )
-    st_player("https://youtu.be/32i0SO0LwPI?si=6yny1OX5SNZolMFq")
-
+    st.button("Fill in the form", key="import_search_button", icon=":material/input:", on_click=import_search)
+    for kind, message in st.session_state.get("import_messages", []):
+        getattr(st, kind)(message)
 
 st.html(
     """
@@ -207,17 +862,20 @@ st.html(
 mesh_sh = st.checkbox(
     label="Combine a list of [MeSH main headings](https://pubmed.ncbi.nlm.nih.gov/help/#using-mesh-database)  with a list of MeSH subheadings",
     key="mesh_sh",
+    on_change=hide_results,
     # help="Check this box to generate a pairwise MeSH Main Heading/Subheading search string.",
 )
 proximity_kw = st.checkbox(
     label="Combine two lists of search terms in a [Proximity Search](https://pubmed.ncbi.nlm.nih.gov/help/#proximity-searching)",
     key="proximity_kw",
+    on_change=hide_results,
     # help="Check this box to generate a pairwise proximity search string.",
     value=True,
 )
 intersection_kw = st.checkbox(
     label="Combine two lists of search terms with the [Boolean](https://pubmed.ncbi.nlm.nih.gov/help/#combining-with-boolean-operators) AND operator",
     key="intersection_kw",
+    on_change=hide_results,
     # help="Check this box to generate a pairwise intersection search string.",
 )
 
@@ -226,6 +884,16 @@ with st.form("enter_terms_form", enter_to_submit=False):
     if not (mesh_sh or proximity_kw or intersection_kw):
         st.error("Please select at least one type of search string to generate.")
 
+    ncol1, ncol2 = st.columns(2)
+    with ncol1:
+        normalize_terms = st.checkbox(
+            "Clean up term lists (trim spaces, drop blank lines and duplicates)",
+            key="normalize",
+            value=True,
+        )
+    with ncol2:
+        sort_terms = st.checkbox("Sort terms alphabetically", key="sort_terms")
+
     if mesh_sh:
         st.html("<h2>Pairwise MeSH Main/Subheading Search</h2>")
         mcol1, mcol2 = st.columns(2)
@@ -244,6 +912,11 @@ with st.form("enter_terms_form", enter_to_submit=False):
                 label="Enter MeSH Subheadings, one per line.",
                 placeholder=subheading_example,
             ).splitlines()
+        mesh_topic3_terms = st.text_area(
+            height=text_area_height // 2,
+            key="mesh topic 3",
+            label="Optional: MeSH headings to AND with every heading/subheading pair (e.g. a population), one per line.",
+        ).splitlines()
         moptcol1, moptcol2 = st.columns(2)
         with moptcol1:
             subcol1, subcol2 = st.columns(2)
@@ -254,6 +927,52 @@ with st.form("enter_terms_form", enter_to_submit=False):
                 )
             with subcol2:
                 noexp = st.checkbox("Do not explode", key="noexp")
+        with moptcol2:
+            check_mesh = mesh_xml_path and st.checkbox(
+                "Check against MeSH (use preferred headings, skip subheadings a heading does not allow)",
+                key="check_mesh",
+                value=True,
+            )
+            plan_mesh_tree = check_mesh and st.checkbox(
+                "Use the MeSH tree for the shortest equivalent search (drop headings an exploded heading "
+                "already includes, explode a heading when every heading under it is listed)",
+                key="plan_mesh_tree",
+                value=True,
+            )
+        mesh_terms, subheadings, mesh_topic3_terms = clean_term_lists(
+            [mesh_terms, subheadings, mesh_topic3_terms], normalize_terms, sort_terms
+        )
+        expand_mesh = []
+        if plan_mesh_tree and not noexp:
+            expand_mesh = st.multiselect(
+                "Write these headings out as their narrower headings",
+                options=mesh_terms,
+                key="expand_mesh",
+            )
+        mesh_groups = [(mesh_terms, subheadings, noexp)]
+        if check_mesh and mesh_terms and subheadings:
+            mesh_groups, mesh_topic3_terms = check_mesh_terms(
+                mesh_terms, subheadings, mesh_topic3_terms, noexp, plan_mesh_tree, expand_mesh
+            )
+            mesh_terms = [heading for headings, _, _ in mesh_groups for heading in headings]
+            subheadings = list(
+                dict.fromkeys(subheading for _, group_subheadings, _ in mesh_groups for subheading in group_subheadings)
+            )
+        mesh_more_terms = (mesh_topic3_terms,) if mesh_topic3_terms else ()
+        # a planned group's noexp is for its own headings; Topic 3 headings keep the setting
+        mesh_parts = [
+            export.Part(
+                "mesh",
+                headings,
+                group_subheadings,
+                {"majr": majr, "noexp": group_noexp}
+                | ({"more_noexp": noexp} if mesh_more_terms and group_noexp != noexp else {}),
+                mesh_more_terms,
+            )
+            for headings, group_subheadings, group_noexp in mesh_groups
+        ]
+        mesh_estimate = export.search_estimate(mesh_parts)
+        show_estimate(mesh_estimate)
 
     if proximity_kw:
         st.html("<h2>Pairwise Proximity Search</h2>")
@@ -280,7 +999,7 @@ with st.form("enter_terms_form", enter_to_submit=False):
         with poptcol1:
             proximity_field = st.selectbox(
                 label="Proximity field",
-                options=["ti", "tiab", "ad"],
+                options=pairwise.FIELDS["proximity"],
                 key="pf",
                 index=1,
             )
@@ -292,6 +1011,17 @@ with st.form("enter_terms_form", enter_to_submit=False):
                 step=1,
                 value=2,
             )
+        proximity_topic1_terms, proximity_topic2_terms = clean_term_lists(
+            [proximity_topic1_terms, proximity_topic2_terms], normalize_terms, sort_terms
+        )
+        proximity_estimate = estimate.estimate(
+            "proximity",
+            proximity_topic1_terms,
+            proximity_topic2_terms,
+            field=proximity_field,
+            distance=proximity_distance,
+        )
+        show_estimate(proximity_estimate)
 
     if intersection_kw:
         st.html("<h2>Pairwise Intersection Search (Boolean AND)</h2>")
@@ -311,13 +1041,53 @@ with st.form("enter_terms_form", enter_to_submit=False):
                 label="Enter Topic 2 terms, one per line.",
                 placeholder=intersection_topic2_example,
             ).splitlines()
+        intersection_topic3_terms = st.text_area(
+            height=text_area_height // 2,
+            key="intersection topic 3",
+            label="Optional: Topic 3 terms to AND with every pair (e.g. a population), one per line.",
+        ).splitlines()
 
         search_field = st.selectbox(
             label="Search field",
             key="sf",
-            options=["ti", "tiab", "tw", "all"],
+            options=pairwise.FIELDS["intersection"],
             index=1,
         )
+        factored = st.checkbox(
+            "Factor into (Topic 1 terms) AND (Topic 2 terms) instead of listing every pair",
+            key="factored",
+        )
+        prune_subsumed = st.checkbox(
+            "Remove terms already matched by a truncated term (e.g. frailty when frail* is listed)",
+            key="prune_subsumed",
+        )
+        intersection_topic1_terms, intersection_topic2_terms, intersection_topic3_terms = clean_term_lists(
+            [intersection_topic1_terms, intersection_topic2_terms, intersection_topic3_terms],
+            normalize_terms,
+            sort_terms,
+        )
+        if prune_subsumed:
+            intersection_topic1_terms, intersection_topic2_terms, intersection_topic3_terms = prune_subsumed_terms(
+                intersection_topic1_terms, intersection_topic2_terms, intersection_topic3_terms
+            )
+        intersection_more_terms = (intersection_topic3_terms,) if intersection_topic3_terms else ()
+        pairwise_intersection_estimate = estimate.estimate(
+            "intersection",
+            intersection_topic1_terms,
+            intersection_topic2_terms,
+            *intersection_more_terms,
+            field=search_field,
+        )
+        if factored:
+            intersection_estimate = estimate.estimate_factored_intersection(
+                intersection_topic1_terms,
+                intersection_topic2_terms,
+                *intersection_more_terms,
+                field=search_field,
+            )
+        else:
+            intersection_estimate = pairwise_intersection_estimate
+        show_estimate(intersection_estimate)
 
     st.divider()
     st.form_submit_button(
@@ -355,296 +1125,471 @@ with st.form("enter_terms_form", enter_to_submit=False):
     )
 
     if submitted:
-        if (
-            (mesh_sh and mesh_terms and subheadings)
-            or (proximity_kw and proximity_topic1_terms and proximity_topic2_terms)
-            or (
-                intersection_kw
-                and intersection_topic1_terms
-                and intersection_topic2_terms
-            )
-        ):
+        st.session_state["show_results"] = True
+        st.session_state["cancelled_generations"] = set()
 
-            st.html("<h2>Generated Search Strings</h2>")
-
-            mesh_search_string = ""
-            if mesh_sh and mesh_terms and subheadings:
-                st.html("<h3>Pairwise MeSH Main/Subheading</h3>")
-                mesh_terms_rows = len(mesh_terms)
-                subheadings_rows = len(subheadings)
-                total_mesh_sh_pairs = mesh_terms_rows * subheadings_rows
+if st.session_state.get("show_results"):
+    if (
+        (mesh_sh and mesh_terms and subheadings)
+        or (proximity_kw and proximity_topic1_terms and proximity_topic2_terms)
+        or (
+            intersection_kw
+            and intersection_topic1_terms
+            and intersection_topic2_terms
+        )
+    ):
 
-                mesh_terms_chars = sum(len(term) for term in mesh_terms)
-                subheadings_chars = sum(len(subheading) for subheading in subheadings)
-                total_mesh_sh_chars = mesh_terms_chars + subheadings_chars
+        st.html("<h2>Generated Search Strings</h2>")
 
-                if majr:
-                    field = "majr"
-                else:
-                    field = "mh"
-                if noexp:
-                    field = field + ":noexp"
-                mesh_searches = [
-                    f"{mesh_term}/{subheading}[{field}]"
-                    for mesh_term in mesh_terms
-                    for subheading in subheadings
-                ]
-                mesh_search_string = " OR ".join(mesh_searches)
-                mesh_search_string_len = len(mesh_search_string)
-                mesh_search_string_exp = (
-                    mesh_search_string_len < collapse_search_string_exp
+        mesh_search_string = ""
+        if mesh_sh and mesh_terms and subheadings:
+            st.html("<h3>Pairwise MeSH Main/Subheading</h3>")
+            mesh_terms_rows = len(mesh_terms)
+            subheadings_rows = len(subheadings)
+            mesh_key = ("mesh", mesh_groups, majr, noexp, mesh_more_terms)
+            mesh = not_generated
+            if within_generation_budget(mesh_estimate):
+                mesh = section_generation(
+                    mesh_key,
+                    mesh_parts,
+                    mesh_estimate,
+                    "mesh",
+                    lambda: incremental_generation(
+                        "mesh",
+                        "mesh",
+                        mesh_parts[0].topic1_terms,
+                        mesh_parts[0].topic2_terms,
+                        **mesh_parts[0].options,
+                    )
+                    if len(mesh_parts) == 1 and not mesh_more_terms
+                    else export.generate(mesh_parts),
+                )
+            mesh_search_string = mesh.search_string
+            mesh_search_string_len = mesh.length
+            mesh_search_string_exp = (
+                mesh_search_string_len < collapse_search_string_exp
+            )
+            if mesh_search_string:
+                show_search_string(
+                    f"Search String (length:{mesh_search_string_len} characters)",
+                    mesh_search_string,
+                    "mesh",
+                    expanded=mesh_search_string_exp,
                 )
-                if mesh_search_string:
-                    with st.expander(
-                        f"Search String (length:{mesh_search_string_len} characters)",
-                        expanded=mesh_search_string_exp,
-                    ):
-                        st.code(mesh_search_string, wrap_lines=True)
 
-                    col1, col2, col3 = st.columns(3)
-                    with col1:
-                        st.metric("MeSH main headings", value=f"{mesh_terms_rows}", border=True)
-                    with col2:
-                        st.metric("Subheadings", value=f"{subheadings_rows}", border=True)
-                    with col3:
-                        st.metric("Total pairs", value=f"{total_mesh_sh_pairs}", border=True)
-                    col4, col5 = st.columns(2)
-                    with col4:
-                        st.metric("Characters typed", value=f"{total_mesh_sh_chars}", border=True)
-                    with col5:
-                        st.metric(
-                            "Characters generated", value=f"{mesh_search_string_len - total_mesh_sh_chars}", border=True
-                        )
-                    st.link_button(
-                        label="Search PubMed with pairwise MeSH heading/subheading search string",
-                        type="primary",
-                        url=pubmed_search_url + mesh_search_string.replace(" ", "+"),
-                        use_container_width=True,
+                col1, col2, col3 = st.columns(3)
+                with col1:
+                    st.metric("MeSH main headings", value=f"{mesh_terms_rows}", border=True)
+                with col2:
+                    st.metric("Subheadings", value=f"{subheadings_rows}", border=True)
+                with col3:
+                    st.metric(
+                        "Total combinations" if mesh_more_terms else "Total pairs", value=f"{mesh.pairs}", border=True
+                    )
+                col4, col5 = st.columns(2)
+                with col4:
+                    st.metric("Characters typed", value=f"{mesh.typed}", border=True)
+                with col5:
+                    st.metric(
+                        "Characters generated", value=f"{mesh.generated}", border=True
                     )
+                show_launch_button(
+                    "Search PubMed with pairwise MeSH heading/subheading search string",
+                    mesh_search_string,
+                    mesh_estimate,
+                    "mesh",
+                    primary=True,
+                    make_url=lambda: pairwise.url_from_encoded(encoded_section(mesh_key, mesh_parts)),
+                )
+                show_search_tools(
+                    mesh_search_string,
+                    mesh_estimate,
+                    mesh_key,
+                    mesh_parts,
+                    "Search PubMed with MeSH heading/subheading search",
+                    "mesh",
+                )
+
+        if proximity_kw and proximity_topic1_terms and proximity_topic2_terms:
+            st.html("<h3>Pairwise Proximity</h3>")
+            proximity_topic1_rows = len(proximity_topic1_terms)
+            proximity_topic2_rows = len(proximity_topic2_terms)
+            proximity_key = (
+                "proximity",
+                proximity_topic1_terms,
+                proximity_topic2_terms,
+                proximity_field,
+                proximity_distance,
+            )
+            proximity_parts = [
+                export.Part(
+                    "proximity",
+                    proximity_topic1_terms,
+                    proximity_topic2_terms,
+                    {"field": proximity_field, "distance": proximity_distance},
+                )
+            ]
+            proximity = not_generated
+            if within_generation_budget(proximity_estimate):
+                proximity = section_generation(
+                    proximity_key,
+                    proximity_parts,
+                    proximity_estimate,
+                    "proximity",
+                    lambda: incremental_generation(
+                        "proximity",
+                        "proximity",
+                        proximity_topic1_terms,
+                        proximity_topic2_terms,
+                        field=proximity_field,
+                        distance=proximity_distance,
+                    ),
+                )
+            keyword_proximity_search_string = proximity.search_string
+            keyword_proximity_search_string_len = proximity.length
+            keyword_proximity_search_string_exp = (
+                keyword_proximity_search_string_len < collapse_search_string_exp
+            )
 
-            if proximity_kw and proximity_topic1_terms and proximity_topic2_terms:
-                st.html("<h3>Pairwise Proximity</h3>")
-                proximity_topic1_rows = len(proximity_topic1_terms)
-                proximity_topic2_rows = len(proximity_topic2_terms)
-                total_proximity_pairs = proximity_topic1_rows * proximity_topic2_rows
-
-                proximity_topic1_terms_chars = sum(len(term) for term in proximity_topic1_terms)
-                proximity_topic2_terms_chars = sum(len(term) for term in proximity_topic2_terms)
-                total_proximity_chars = proximity_topic1_terms_chars + proximity_topic2_terms_chars
-                keyword_proximity_searches = [
-                    f'"{ptopic1_term} {ptopic2_term}"[{proximity_field}:~{proximity_distance}]'
-                    for ptopic1_term in proximity_topic1_terms
-                    for ptopic2_term in proximity_topic2_terms
-                ]
-                keyword_proximity_search_string = " OR ".join(
-                    keyword_proximity_searches
+            if keyword_proximity_search_string:
+                show_search_string(
+                    f"Search String (length: {keyword_proximity_search_string_len} characters)",
+                    keyword_proximity_search_string,
+                    "proximity",
+                    expanded=keyword_proximity_search_string_exp,
                 )
-                keyword_proximity_search_string_len = len(
-                    keyword_proximity_search_string
+
+                col1, col2, col3 = st.columns(3)
+                with col1:
+                    st.metric("Topic 1 terms", value=f"{proximity_topic1_rows}", border=True)
+                with col2:
+                    st.metric("Topic 2 terms", value=f"{proximity_topic2_rows}", border=True)
+                with col3:
+                    st.metric("Total pairs", value=f"{proximity.pairs}", border=True)
+                col4, col5 = st.columns(2)
+                with col4:
+                    st.metric(
+                        "Characters typed",
+                        value=f"{proximity.typed}",
+                        border=True
+                    )
+                with col5:
+                    st.metric(
+                        "Characters generated",
+                        value=f"{proximity.generated}",
+                        border=True
+                    )
+                show_launch_button(
+                    "Search PubMed with pairwise keyword proximity search string",
+                    keyword_proximity_search_string,
+                    proximity_estimate,
+                    "proximity",
+                    primary=True,
+                    make_url=lambda: pairwise.url_from_encoded(encoded_section(proximity_key, proximity_parts)),
+                )
+                show_search_tools(
+                    keyword_proximity_search_string,
+                    proximity_estimate,
+                    proximity_key,
+                    proximity_parts,
+                    "Search PubMed with keyword proximity search",
+                    "proximity",
                 )
-                keyword_proximity_search_string_exp = (
-                    keyword_proximity_search_string_len < collapse_search_string_exp
+                show_pair_profile(
+                    "proximity",
+                    proximity_topic1_terms,
+                    proximity_topic2_terms,
+                    "Search PubMed with keyword proximity search",
+                    "proximity",
+                    field=proximity_field,
+                    distance=proximity_distance,
+                )
+                show_translations(
+                    "proximity",
+                    proximity_topic1_terms,
+                    proximity_topic2_terms,
+                    proximity_key,
+                    "proximity",
+                    field=proximity_field,
+                    distance=proximity_distance,
                 )
 
-                if keyword_proximity_search_string:
-                    with st.expander(
-                        f"Search String (length: {len(keyword_proximity_search_string)} characters)",
+                if mesh_search_string:
+                    st.html("<h4>MeSH + Proximity</h4>")
+                    mesh_proximity_estimate = estimate.estimate_union(
+                        mesh_estimate, proximity_estimate
+                    )
+                    mesh_proximity = cached_generation(
+                        ("union", mesh_key, proximity_key),
+                        lambda: pairwise.generate_union(mesh, proximity),
+                    )
+                    mesh_proximity_search_string = mesh_proximity.search_string
+                    mesh_proximity_search_string_len = mesh_proximity.length
+                    mesh_proximity_search_string_exp = (
+                        mesh_proximity_search_string_len
+                        < collapse_search_string_exp
+                    )
+
+                    show_search_string(
+                        f"Union (Boolean OR) with MeSH search string (length: {mesh_proximity_search_string_len} characters)",
+                        mesh_proximity_search_string,
+                        "mesh_proximity",
                         expanded=keyword_proximity_search_string_exp,
-                    ):
-                        st.code(
-                            keyword_proximity_search_string,
-                            wrap_lines=True,
-                        )
+                    )
 
                     col1, col2, col3 = st.columns(3)
                     with col1:
-                        st.metric("Topic 1 terms", value=f"{proximity_topic1_rows}", border=True)
+                        st.metric("Total pairs", value=f"{mesh_proximity.pairs}", border=True)
                     with col2:
-                        st.metric("Topic 2 terms", value=f"{proximity_topic2_rows}", border=True)
-                    with col3:
-                        st.metric("Total pairs", value=f"{total_proximity_pairs}", border=True)
-                    col4, col5 = st.columns(2)
-                    with col4:
                         st.metric(
                             "Characters typed",
-                            value=f"{total_proximity_chars}",
-                            border=True
+                            value=f"{mesh_proximity.typed}",
+                            border=True,
                         )
-                    with col5:
+                    with col3:
                         st.metric(
                             "Characters generated",
-                            value=f"{keyword_proximity_search_string_len - total_proximity_chars}",
-                            border=True
+                            value=f"{mesh_proximity.generated}",
+                            border=True,
                         )
-                    st.link_button(
-                        label="Search PubMed with pairwise keyword proximity search string",
-                        type="primary",
-                        url=pubmed_search_url
-                        + keyword_proximity_search_string.replace(" ", "+"),
-                        use_container_width=True,
+                    show_launch_button(
+                        "Search PubMed with union of pairwise MeSH/proximity search strings",
+                        mesh_proximity_search_string,
+                        mesh_proximity_estimate,
+                        "mesh_proximity",
+                        make_url=lambda: pairwise.url_from_encoded(
+                            encoded_section(mesh_key, mesh_parts),
+                            encoded_section(proximity_key, proximity_parts),
+                        ),
+                    )
+                    show_search_tools(
+                        mesh_proximity_search_string,
+                        mesh_proximity_estimate,
+                        ("union", mesh_key, proximity_key),
+                        mesh_parts + proximity_parts,
+                        "Search PubMed with MeSH/proximity union",
+                        "mesh_proximity",
                     )
 
-                    if mesh_search_string:
-                        st.html("<h4>MeSH + Proximity</h4>")
-                        mesh_proximity_search_string = " OR ".join(
-                            [mesh_search_string, keyword_proximity_search_string]
-                        )
-                        mesh_proximity_search_string_len = len(
-                            mesh_proximity_search_string
-                        )
-                        mesh_proximity_search_string_exp = (
-                            mesh_proximity_search_string_len
-                            < collapse_search_string_exp
-                        )
-
-                        with st.expander(
-                            f"Union (Boolean OR) with MeSH search string (length: {len(mesh_proximity_search_string)} characters)",
-                            expanded=keyword_proximity_search_string_exp,
-                        ):
-                            st.code(
-                                mesh_proximity_search_string,
-                                wrap_lines=True,
-                            )
-
-                        col1, col2, col3 = st.columns(3)
-                        with col1:
-                            st.metric("Total pairs", value=f"{total_mesh_sh_pairs + total_proximity_pairs}", border=True)
-                        with col2:
-                            st.metric(
-                                "Characters typed",
-                                value=f"{total_mesh_sh_chars + total_proximity_chars}",
-                                border=True,
-                            )
-                        with col3:
-                            st.metric(
-                                "Characters generated",
-                                value=f"{mesh_proximity_search_string_len - (total_mesh_sh_chars + total_proximity_chars)}",
-                                border=True,
-                            )
-                        st.link_button(
-                            label="Search PubMed with union of pairwise MeSH/proximity search strings",
-                            url=pubmed_search_url
-                            + mesh_proximity_search_string.replace(" ", "+"),
-                            use_container_width=True,
+        if (
+            intersection_kw
+            and intersection_topic1_terms
+            and intersection_topic2_terms
+        ):
+            st.html("<h3>Pairwise Intersection</h3>")
+            intersection_topic1_rows = len(intersection_topic1_terms)
+            intersection_topic2_rows = len(intersection_topic2_terms)
+            intersection_key = (
+                "factored intersection" if factored else "intersection",
+                intersection_topic1_terms,
+                intersection_topic2_terms,
+                search_field,
+                intersection_more_terms,
+            )
+            # the factored search is a single clause, so it cannot be split further
+            intersection_parts = [
+                export.Part(
+                    export.FACTORED if factored else "intersection",
+                    intersection_topic1_terms,
+                    intersection_topic2_terms,
+                    {"field": search_field},
+                    intersection_more_terms,
+                )
+            ]
+            intersection = not_generated
+            if within_generation_budget(intersection_estimate):
+                if factored:
+                    intersection = cached_generation(
+                        intersection_key,
+                        lambda: pairwise.generate_factored_intersection(
+                            intersection_topic1_terms,
+                            intersection_topic2_terms,
+                            *intersection_more_terms,
+                            field=search_field,
+                        ),
+                    )
+                else:
+                    intersection = section_generation(
+                        intersection_key,
+                        intersection_parts,
+                        intersection_estimate,
+                        "intersection",
+                        lambda: incremental_generation(
+                            "intersection",
+                            "intersection",
+                            intersection_topic1_terms,
+                            intersection_topic2_terms,
+                            field=search_field,
                         )
-
-            if (
-                intersection_kw
-                and intersection_topic1_terms
-                and intersection_topic2_terms
-            ):
-                st.html("<h3>Pairwise Intersection</h3>")
-                intersection_topic1_rows = len(intersection_topic1_terms)
-                intersection_topic2_rows = len(intersection_topic2_terms)
-                total_intersection_pairs = intersection_topic1_rows * intersection_topic2_rows
-
-                intersection_topic1_terms_chars = sum(len(term) for term in intersection_topic1_terms)
-                intersection_topic2_terms_chars = sum(len(term) for term in intersection_topic2_terms)
-                total_intersection_chars = intersection_topic1_terms_chars + intersection_topic2_terms_chars
-
-                keyword_intersection_searches = [
-                    f"({itopic1_term}[{search_field}] AND {itopic2_term}[{search_field}])"
-                    for itopic1_term in intersection_topic1_terms
-                    for itopic2_term in intersection_topic2_terms
-                ]
-                keyword_intersection_search_string = " OR ".join(
-                    keyword_intersection_searches
+                        if not intersection_more_terms
+                        else export.generate(intersection_parts),
+                    )
+            keyword_intersection_search_string = intersection.search_string
+            if intersection_estimate.wildcards > splitter.WILDCARD_LIMIT:
+                st.warning(
+                    "The generated search string contains more than 256 wildcard (*) characters, which exceeds PubMed's limit. Please edit the input term lists and try again, or use the split search strings below."
+                )
+            keyword_intersection_search_string_len = intersection.length
+            keyword_intersection_search_string_exp = (
+                keyword_intersection_search_string_len < collapse_search_string_exp
+            )
+            if keyword_intersection_search_string:
+                show_search_string(
+                    f"Search String (length: {keyword_intersection_search_string_len} characters)",
+                    keyword_intersection_search_string,
+                    "intersection",
+                    expanded=keyword_intersection_search_string_exp,
                 )
-                if keyword_intersection_search_string.count("*") > 256:
-                    st.warning(
-                        "The generated search string contains more than 256 wildcard (*) characters, which exceeds PubMed's limit. Please edit the input term lists and try again."
+
+                col1, col2, col3 = st.columns(3)
+                with col1:
+                    st.metric("Topic 1 terms", value=f"{intersection_topic1_rows}", border=True)
+                with col2:
+                    st.metric("Topic 2 terms", value=f"{intersection_topic2_rows}", border=True)
+                with col3:
+                    st.metric(
+                        "Total combinations" if intersection_more_terms else "Total pairs",
+                        value=f"{intersection.pairs}",
+                        border=True,
+                    )
+                col4, col5 = st.columns(2)
+                with col4:
+                    st.metric(
+                        "Characters typed",
+                        value=f"{intersection.typed}",
+                        border=True
+                    )
+                with col5:
+                    st.metric(
+                        "Characters generated",
+                        value=f"{intersection.generated}",
+                        border=True
+                    )
+                if factored:
+                    saved_chars = pairwise_intersection_estimate.length - intersection.length
+                    saved_wildcards = pairwise_intersection_estimate.wildcards - intersection.wildcards
+                    st.info(
+                        f"Factoring saves {saved_chars:,} characters "
+                        f"({saved_chars / pairwise_intersection_estimate.length:.0%}) and {saved_wildcards:,} wildcards "
+                        f"compared with listing all {intersection.pairs:,} "
+                        f"{'combinations' if intersection_more_terms else 'pairs'} "
+                        f"({pairwise_intersection_estimate.length:,} characters, {pairwise_intersection_estimate.wildcards:,} wildcards)."
                     )
-                keyword_intersection_search_string_len = len(
-                    keyword_intersection_search_string
+
+                show_launch_button(
+                    "Search PubMed with pairwise keyword intersection search string",
+                    keyword_intersection_search_string,
+                    intersection_estimate,
+                    "intersection",
+                    primary=True,
+                    make_url=lambda: pairwise.url_from_encoded(encoded_section(intersection_key, intersection_parts)),
                 )
-                keyword_intersection_search_string_exp = (
-                    keyword_intersection_search_string_len < collapse_search_string_exp
+                show_search_tools(
+                    keyword_intersection_search_string,
+                    intersection_estimate,
+                    intersection_key,
+                    intersection_parts,
+                    "Search PubMed with keyword intersection search",
+                    "intersection",
                 )
-                if keyword_intersection_search_string:
-                    with st.expander(
-                        f"Search String (length: {len(keyword_intersection_search_string)} characters)",
+                # the pair profile and translations work on two lists
+                if not intersection_more_terms:
+                    show_pair_profile(
+                        "intersection",
+                        intersection_topic1_terms,
+                        intersection_topic2_terms,
+                        "Search PubMed with keyword intersection search",
+                        "intersection",
+                        field=search_field,
+                    )
+                    show_translations(
+                        "intersection",
+                        intersection_topic1_terms,
+                        intersection_topic2_terms,
+                        intersection_key,
+                        "intersection",
+                        field=search_field,
+                    )
+
+                if mesh_search_string:
+                    st.html("<h4>MeSH + Intersection</h4>")
+                    mesh_intersection_estimate = estimate.estimate_union(
+                        mesh_estimate, intersection_estimate
+                    )
+                    mesh_intersection = cached_generation(
+                        ("union", mesh_key, intersection_key),
+                        lambda: pairwise.generate_union(mesh, intersection),
+                    )
+                    mesh_intersection_search_string = mesh_intersection.search_string
+                    mesh_intersection_search_string_len = mesh_intersection.length
+                    mesh_intersection_search_string_exp = (
+                        mesh_intersection_search_string_len
+                        < collapse_search_string_exp
+                    )
+                    show_search_string(
+                        f"Union (Boolean OR) with MeSH search string (length: {mesh_intersection_search_string_len} characters, wildcard count: {mesh_intersection.wildcards})",
+                        mesh_intersection_search_string,
+                        "mesh_intersection",
                         expanded=keyword_intersection_search_string_exp,
-                    ):
-                        st.code(
-                            keyword_intersection_search_string,
-                            wrap_lines=True,
-                        )
+                    )
 
                     col1, col2, col3 = st.columns(3)
                     with col1:
-                        st.metric("Topic 1 terms", value=f"{intersection_topic1_rows}", border=True)
+                        st.metric(
+                            "Total pairs",
+                            value=f"{mesh_intersection.pairs}",
+                            border=True
+                        )
                     with col2:
-                        st.metric("Topic 2 terms", value=f"{intersection_topic2_rows}", border=True)
-                    with col3:
-                        st.metric("Total pairs", value=f"{total_intersection_pairs}", border=True)
-                    col4, col5 = st.columns(2)
-                    with col4:
                         st.metric(
                             "Characters typed",
-                            value=f"{total_intersection_chars}",
+                            value=f"{mesh_intersection.typed}",
                             border=True
                         )
-                    with col5:
+                    with col3:
                         st.metric(
                             "Characters generated",
-                            value=f"{keyword_intersection_search_string_len - total_intersection_chars}",
+                            value=f"{mesh_intersection.generated}",
                             border=True
                         )
 
-                    st.link_button(
-                        label="Search PubMed with pairwise keyword intersection search string",
-                        type="primary",
-                        url=pubmed_search_url
-                        + keyword_intersection_search_string.replace(" ", "+"),
-                        use_container_width=True,
+                    show_launch_button(
+                        "Search PubMed with union of pairwise MeSH/intersection search strings",
+                        mesh_intersection_search_string,
+                        mesh_intersection_estimate,
+                        "mesh_intersection",
+                        make_url=lambda: pairwise.url_from_encoded(
+                            encoded_section(mesh_key, mesh_parts),
+                            encoded_section(intersection_key, intersection_parts),
+                        ),
+                    )
+                    show_search_tools(
+                        mesh_intersection_search_string,
+                        mesh_intersection_estimate,
+                        ("union", mesh_key, intersection_key),
+                        mesh_parts + intersection_parts,
+                        "Search PubMed with MeSH/intersection union",
+                        "mesh_intersection",
                     )
 
-                    if mesh_search_string:
-                        st.html("<h4>MeSH + Intersection</h4>")
-                        mesh_intersection_search_string = " OR ".join(
-                            [mesh_search_string, keyword_intersection_search_string]
-                        )
-                        mesh_intersection_search_string_len = len(
-                            mesh_intersection_search_string
-                        )
-                        mesh_intersection_search_string_exp = (
-                            mesh_intersection_search_string_len
-                            < collapse_search_string_exp
-                        )
-                        with st.expander(
-                            f"Union (Boolean OR) with MeSH search string (length: {len(mesh_intersection_search_string)} characters, wildcard count: {keyword_intersection_search_string.count('*')})",
-                            expanded=keyword_intersection_search_string_exp,
-                        ):
-
-                            st.code(mesh_intersection_search_string, wrap_lines=True)
-
-                        col1, col2, col3 = st.columns(3)
-                        with col1:
-                            st.metric(
-                                "Total pairs",
-                                value=f"{total_mesh_sh_pairs + total_intersection_pairs}",
-                                border=True
-                            )
-                        with col2:
-                            st.metric(
-                                "Characters typed",
-                                value=f"{total_mesh_sh_chars + total_intersection_chars}",
-                                border=True
-                            )
-                        with col3:
-                            st.metric(
-                                "Characters generated",
-                                value=f"{mesh_intersection_search_string_len - (total_mesh_sh_chars + total_intersection_chars)}",
-                                border=True
-                            )
-
-                        st.link_button(
-                            label="Search PubMed with union of pairwise MeSH/intersection search strings",
-                            url=pubmed_search_url
-                            + mesh_intersection_search_string.replace(" ", "+"),
-                            use_container_width=True,
-                        )
-        else:
-            st.error(
-                "Empty form inputs, no search strings generated.\n\n**Tip**: Use the *Load placeholder terms* button to load example terms into the form before generating search strings."
-            )
+        cache_stats = generation_cache().stats()
+        st.caption(
+            f"Generation cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses, "
+            f"{cache_stats['entries']} entries, {cache_stats['bytes'] / 1e6:.1f} of "
+            f"{cache_stats['max_bytes'] / 1e6:.0f} MB"
+        )
+    else:
+        st.error(
+            "Empty form inputs, no search strings generated.\n\n**Tip**: Use the *Load placeholder terms* button to load example terms into the form before generating search strings."
+        )
+
+if trace.enabled:
+    run_span = trace.finish()
+    with st.expander(f":material/timer: Debug: {run_span.duration_ms:,.1f} ms script run", expanded=False):
+        st.dataframe(
+            [
+                {"span": span.name, "ms": round(span.duration_ms, 2), **span.attributes}
+                for span in trace.spans
+            ],
+            use_container_width=True,
+        )
@@ -0,0 +1,418 @@
+"""Pairwise search string generation, usable without the Streamlit page."""
+
+from bisect import bisect_right
+from functools import lru_cache
+from itertools import accumulate, chain, product
+from math import prod
+from typing import NamedTuple
+from urllib.parse import quote_plus
+
+PUBMED_SEARCH_URL = "https://pubmed.ncbi.nlm.nih.gov/?term="
+SEPARATOR = " OR "
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+
+# field tag for MeSH main heading/subheading pairs
+def mesh_field(majr=False, noexp=False):
+    field = "majr" if majr else "mh"
+    if noexp:
+        field = field + ":noexp"
+    return field
+
+
+# every (topic 1, topic 2) pair, row by row
+def pairs(topic1_terms, topic2_terms):
+    topic2_terms = list(topic2_terms)
+    for topic1_term in topic1_terms:
+        for topic2_term in topic2_terms:
+            yield topic1_term, topic2_term
+
+
+# fixed syntax around each pair: clause = prefix + topic 1 term + middle + topic 2 term + suffix
+def mesh_template(majr=False, noexp=False):
+    return "", "/", f"[{mesh_field(majr, noexp)}]"
+
+
+def proximity_template(field="tiab", distance=2):
+    return '"', " ", f'"[{field}:~{distance}]'
+
+
+def intersection_template(field="tw"):
+    return "(", f"[{field}] AND ", f"[{field}])"
+
+
+def template_clauses(template, topic1_terms, topic2_terms):
+    prefix, middle, suffix = template
+    for topic1_term, topic2_term in pairs(topic1_terms, topic2_terms):
+        yield f"{prefix}{topic1_term}{middle}{topic2_term}{suffix}"
+
+
+def mesh_clauses(mesh_terms, subheadings, majr=False, noexp=False):
+    return template_clauses(mesh_template(majr, noexp), mesh_terms, subheadings)
+
+
+def proximity_clauses(topic1_terms, topic2_terms, field="tiab", distance=2):
+    return template_clauses(proximity_template(field, distance), topic1_terms, topic2_terms)
+
+
+def intersection_clauses(topic1_terms, topic2_terms, field="tw"):
+    return template_clauses(intersection_template(field), topic1_terms, topic2_terms)
+
+
+TEMPLATES = {
+    "mesh": mesh_template,
+    "proximity": proximity_template,
+    "intersection": intersection_template,
+}
+
+
+def template(mode, **options):
+    try:
+        make_template = TEMPLATES[mode]
+    except KeyError:
+        raise ValueError(f"Unknown search mode: {mode!r}") from None
+    return make_template(**options)
+
+
+# the PubMed fields each keyword mode offers, as the app's field menus list them
+FIELDS = {
+    "proximity": ("ti", "tiab", "ad"),
+    "intersection": ("ti", "tiab", "tw", "all"),
+}
+
+
+# reject options the app's widgets do not allow, since fields and distances are spliced
+# into the search string as they are
+def check_options(mode, **options):
+    template(mode, **options)
+    if "field" in options and options["field"] not in FIELDS[mode]:
+        raise ValueError(f"field must be one of {', '.join(FIELDS[mode])} for {mode} searches")
+    if options.get("distance", 0) < 0:
+        raise ValueError("distance must be 0 or more")
+
+
+# fixed syntax around a combination of terms from three or more lists: clause = prefix +
+# term 1 + middles[0] + term 2 + middles[1] + ... + suffix. Intersection clauses AND every
+# term; MeSH clauses AND the heading/subheading pair with the further lists' headings, which
+# take noexp but not majr. more_noexp sets noexp for the further headings alone, for when a
+# MeSH tree plan searches the pair's headings differently from the ones the user listed.
+def intersection_product_template(concepts, field="tw"):
+    return "(", (f"[{field}] AND ",) * (concepts - 1), f"[{field}])"
+
+
+def mesh_product_template(concepts, majr=False, noexp=False, more_noexp=None):
+    extra = f"[{mesh_field(False, noexp if more_noexp is None else more_noexp)}]"
+    return "(", ("/", f"[{mesh_field(majr, noexp)}] AND ") + (f"{extra} AND ",) * (concepts - 3), extra + ")"
+
+
+PRODUCT_TEMPLATES = {
+    "mesh": mesh_product_template,
+    "intersection": intersection_product_template,
+}
+
+
+def product_template(mode, concepts, **options):
+    if mode not in PRODUCT_TEMPLATES:
+        raise ValueError(f"{mode} searches combine exactly two lists of terms")
+    return PRODUCT_TEMPLATES[mode](concepts, **options)
+
+
+# each list's terms followed by their syntax, with the prefix on the first list's, so a
+# clause is the concatenation of one piece from each list
+def product_pieces(syntax, term_lists):
+    prefix, middles, suffix = syntax
+    pieces = [[f"{term}{after}" for term in terms] for terms, after in zip(term_lists, middles + (suffix,))]
+    pieces[0] = [prefix + piece for piece in pieces[0]]
+    return pieces
+
+
+# one clause per combination of a term from each list, last list varying fastest. The
+# combinations are joined lazily in C, so memory stays at the term lists however many
+# clauses there are.
+def product_clauses(mode, term_lists, **options):
+    return map("".join, product(*product_pieces(product_template(mode, len(term_lists), **options), term_lists)))
+
+
+# per-pair clauses for a mode in TEMPLATES, e.g. clauses("proximity", a, b, field="ti", distance=3);
+# intersection and MeSH searches take further term lists, e.g. a population
+def clauses(mode, topic1_terms, topic2_terms, *more_terms, **options):
+    if more_terms:
+        return product_clauses(mode, [topic1_terms, topic2_terms, *more_terms], **options)
+    return template_clauses(template(mode, **options), topic1_terms, topic2_terms)
+
+
+# Boolean OR of several clause streams, e.g. the MeSH + proximity hybrid
+def union(*clause_streams):
+    return chain(*clause_streams)
+
+
+# the OR-joined search string in pieces of roughly chunk_size characters
+def chunks(clause_stream, chunk_size=DEFAULT_CHUNK_SIZE):
+    buffer = []
+    buffered = 0
+    first = True
+    for clause in clause_stream:
+        if not first:
+            buffer.append(SEPARATOR)
+            buffered += len(SEPARATOR)
+        first = False
+        buffer.append(clause)
+        buffered += len(clause)
+        if buffered >= chunk_size:
+            yield "".join(buffer)
+            buffer = []
+            buffered = 0
+    if buffer:
+        yield "".join(buffer)
+
+
+def search_string(clause_stream):
+    return "".join(chunks(clause_stream))
+
+
+# stream the search string to a text file object, returning the characters written
+def write_search_string(clause_stream, fp, chunk_size=DEFAULT_CHUNK_SIZE):
+    written = 0
+    for chunk in chunks(clause_stream, chunk_size):
+        fp.write(chunk)
+        written += len(chunk)
+    return written
+
+
+# A search string held as the strings it was joined from. ORing generated searches
+# shares their (cached) strings instead of copying them into a new one; length, counts,
+# pages and the URL are computed over the pieces, and only sinks such as st.code,
+# downloads and ESearch requests join them, with str().
+class SearchRope:
+    __slots__ = ("pieces", "_starts", "_length")
+
+    def __init__(self, pieces):
+        flat = []
+        for piece in pieces:
+            if isinstance(piece, SearchRope):
+                flat.extend(piece.pieces)
+            elif piece:
+                flat.append(piece)
+        self.pieces = tuple(flat)
+        self._starts = list(accumulate((len(piece) for piece in self.pieces), initial=0))
+        self._length = self._starts.pop()
+
+    def __len__(self):
+        return self._length
+
+    def __bool__(self):
+        return self._length > 0
+
+    def __str__(self):
+        return "".join(self.pieces)
+
+    def __eq__(self, other):
+        if isinstance(other, (SearchRope, str)):
+            return len(self) == len(other) and str(self) == str(other)
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(str(self))
+
+    def __repr__(self):
+        return f"SearchRope({len(self.pieces)} pieces, {self._length} characters)"
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            key = slice(key, key + 1 if key != -1 else None)
+        start, stop, step = key.indices(self._length)
+        if step != 1:
+            return str(self)[key]
+        parts = []
+        index = max(0, bisect_right(self._starts, start) - 1)
+        while start < stop and index < len(self.pieces):
+            offset = self._starts[index]
+            piece = self.pieces[index]
+            parts.append(piece[start - offset:stop - offset])
+            start = offset + len(piece)
+            index += 1
+        return "".join(parts)
+
+    # matches may straddle pieces, so each piece is searched with the start of the next
+    def find(self, sub, start=0):
+        start = max(0, start + self._length if start < 0 else start)
+        if not sub:
+            return start if start <= self._length else -1
+        index = max(0, bisect_right(self._starts, start) - 1)
+        for index in range(index, len(self.pieces)):
+            offset = self._starts[index]
+            end = offset + len(self.pieces[index])
+            window = self.pieces[index] + self[end:end + len(sub) - 1]
+            found = window.find(sub, max(0, start - offset))
+            if found != -1:
+                return offset + found
+        return -1
+
+    def count(self, sub):
+        if not sub:
+            return self._length + 1
+        if len(sub) == 1:
+            return sum(piece.count(sub) for piece in self.pieces)
+        found = 0
+        position = self.find(sub)
+        while position != -1:
+            found += 1
+            position = self.find(sub, position + len(sub))
+        return found
+
+    def encode(self, encoding="utf-8"):
+        return str(self).encode(encoding)
+
+    def write(self, fp):
+        for piece in self.pieces:
+            fp.write(piece)
+        return self._length
+
+
+class Generated(NamedTuple):
+    search_string: str
+    length: int
+    wildcards: int
+    pairs: int
+    # characters in the input terms, shown as "Characters typed"
+    typed: int
+
+    @property
+    def generated(self):
+        return self.length - self.typed
+
+
+# the search string for a mode in TEMPLATES along with the metrics the app shows for it
+def generate(mode, topic1_terms, topic2_terms, *more_terms, **options):
+    term_lists = [list(terms) for terms in (topic1_terms, topic2_terms, *more_terms)]
+    search = search_string(clauses(mode, *term_lists, **options))
+    return Generated(
+        search,
+        len(search),
+        search.count("*"),
+        prod(len(terms) for terms in term_lists),
+        sum(len(term) for terms in term_lists for term in terms),
+    )
+
+
+# Boolean OR of already generated searches, e.g. the MeSH + proximity hybrid, as a
+# SearchRope over their search strings
+def generate_union(*generated):
+    pieces = []
+    for item in generated:
+        if item.search_string:
+            if pieces:
+                pieces.append(SEPARATOR)
+            pieces.append(item.search_string)
+    search = SearchRope(pieces)
+    return Generated(
+        search,
+        len(search),
+        sum(item.wildcards for item in generated),
+        sum(item.pairs for item in generated),
+        sum(item.typed for item in generated),
+    )
+
+
+# ((a1[f] OR a2[f] ...) AND (b1[f] OR b2[f] ...)) finds the same records as the pairwise
+# intersection search in O(n + m) characters and wildcards instead of O(n * m). The outer
+# parentheses keep it intact when it is ORed with the MeSH search.
+def factored_intersection_pieces(topic1_terms, topic2_terms, *more_terms, field="tw"):
+    yield "(("
+    for number, terms in enumerate((topic1_terms, topic2_terms, *more_terms)):
+        if number:
+            yield ") AND ("
+        yield SEPARATOR.join(f"{term}[{field}]" for term in terms)
+    yield "))"
+
+
+def generate_factored_intersection(topic1_terms, topic2_terms, *more_terms, field="tw"):
+    term_lists = [list(terms) for terms in (topic1_terms, topic2_terms, *more_terms)]
+    search = ""
+    if all(term_lists):
+        search = "".join(factored_intersection_pieces(*term_lists, field=field))
+    return Generated(
+        search,
+        len(search),
+        search.count("*"),
+        prod(len(terms) for terms in term_lists),
+        sum(len(term) for terms in term_lists for term in terms),
+    )
+
+
+def page_count(search_string, page_size):
+    return max(1, -(-len(search_string) // page_size))
+
+
+# page number (from 1) of a long search string, cut at OR separators so clauses stay whole
+def page(search_string, number, page_size):
+    def boundary(position):
+        if position <= 0:
+            return 0
+        found = search_string.find(SEPARATOR, position)
+        return len(search_string) if found == -1 else found + len(SEPARATOR)
+
+    start = boundary((number - 1) * page_size)
+    end = boundary(number * page_size)
+    return search_string[start:end].removesuffix(SEPARATOR)
+
+
+# URL encoding of a term or syntax piece such as [tiab:~2]; every term appears in many
+# pairs, so each is encoded once. Encoding is per character, so the encoding of a clause
+# is the concatenation of the encodings of its pieces.
+@lru_cache(maxsize=65536)
+def url_fragment(text):
+    return quote_plus(text)
+
+
+# whole clauses and search strings are encoded directly, so they don't crowd terms out of the cache
+def url_encode(query):
+    if isinstance(query, SearchRope):
+        return "".join([url_encode(piece) for piece in query.pieces])
+    return quote_plus(query)
+
+
+# launch URL for a search string: spaces become + and ", #, &, [, /, * etc. are percent-encoded
+def search_url(query):
+    return PUBMED_SEARCH_URL + url_encode(query)
+
+
+# the URL-encoded search string for a mode in TEMPLATES, assembled from encoded terms and
+# syntax pieces, so encoding work is O(n + m) rather than O(n * m)
+def encoded_search_string(mode, topic1_terms, topic2_terms, *more_terms, **options):
+    if more_terms:
+        prefix, middles, suffix = product_template(mode, 2 + len(more_terms), **options)
+        syntax = url_fragment(prefix), tuple(url_fragment(middle) for middle in middles), url_fragment(suffix)
+        term_lists = [[url_fragment(term) for term in terms] for terms in (topic1_terms, topic2_terms, *more_terms)]
+        return url_fragment(SEPARATOR).join(map("".join, product(*product_pieces(syntax, term_lists))))
+    return url_fragment(SEPARATOR).join(
+        template_clauses(
+            tuple(url_fragment(piece) for piece in template(mode, **options)),
+            [url_fragment(term) for term in topic1_terms],
+            [url_fragment(term) for term in topic2_terms],
+        )
+    )
+
+
+# launch URL for the OR of already encoded search strings
+def url_from_encoded(*encoded_searches):
+    return PUBMED_SEARCH_URL + url_fragment(SEPARATOR).join(search for search in encoded_searches if search)
+
+
+# bytes a piece of a search string takes up in its launch URL; a SearchRope is
+# encoded a piece at a time, without joining the encodings
+def encoded_length(text):
+    if isinstance(text, SearchRope):
+        return sum(len(quote_plus(piece)) for piece in text.pieces)
+    return len(quote_plus(text))
+
+
+# encoded_length for a term or syntax piece, through the fragment cache
+def fragment_length(text):
+    return len(url_fragment(text))
+
+
+# byte length of search_url(query); the query is still encoded to measure it, but the
+# URL is not built. estimate.py gets URL lengths without encoding any clause.
+def url_length(query):
+    return len(PUBMED_SEARCH_URL) + encoded_length(query)
@@ -0,0 +1,433 @@
+"""Read search strings this tool generated back into term lists and options.
+
+Usage: python parsing.py search.txt
+
+parse() takes a search string, or an iterable of chunks of one such as a file
+read in pieces, and recovers the sections it was generated from: the mode, both
+term lists and the options of each run of MeSH, proximity, intersection or
+factored intersection clauses, including the further term lists ANDed onto
+MeSH and intersection searches. It works in one pass and holds one clause and
+the term lists at a time, so multi-megabyte searches (and the output of
+benchmarks/generation.py, which uses it as an oracle) are parsed in linear time.
+Unbalanced quotes, brackets and parentheses are reported with their position.
+
+A proximity phrase such as "muscle weakness scale" does not say where the topic
+1 term ends. Every way of cutting the first phrase is tried: each cut fixes the
+first row's topic 2 terms, and a cut survives only while every later phrase is
+a topic 1 term followed by the topic 2 term in the same column, which is how
+the product was generated. A section whose clauses are not every pair, row by
+row (e.g. a MeSH search with disallowed pairs skipped), is still read, with its
+terms in order of appearance, but is flagged as incomplete. Sections of three
+or more lists are checked the same way, the last list varying fastest.
+"""
+
+import json
+import re
+import sys
+from math import prod
+from typing import NamedTuple
+
+import export
+import pairwise
+
+SEPARATOR = re.compile(r"\s+OR\s+")
+# characters that open or close a phrase, field tag or group
+STRUCTURE = re.compile(r'["\[\]()]')
+# a term outside a proximity phrase: no brackets or parentheses except inside a quoted
+# phrase, e.g. "muscle weakness"
+TERM = r'[^"\[\]()]*(?:"[^"]*"[^"\[\]()]*)*'
+PROXIMITY_CLAUSE = re.compile(r'"([^"]*)"\[(\w+):~(\d+)\]')
+MESH_CLAUSE = re.compile(r'([^"\[\]()]+)/([^"\[\]()/]+)\[(mh|majr)(:noexp)?\]')
+INTERSECTION_CLAUSE = re.compile(rf"\(({TERM})\[(\w+)\] AND ({TERM})\[(\w+)\]\)")
+# (term[tag] AND term[tag] ...), an intersection or a MeSH pair ANDed with more headings
+PRODUCT_CLAUSE = re.compile(rf"\(({TERM})\[([\w:]+)\]((?: AND {TERM}\[[\w:]+\])+)\)")
+PRODUCT_TERM = re.compile(rf" AND ({TERM})\[([\w:]+)\]")
+FIELD_TERM = re.compile(rf"({TERM})\[(\w+)\]")
+MESH_TAG = re.compile(r"(mh|majr)(:noexp)?")
+FACTORED_LIST_SEPARATOR = ") AND ("
+READ_CHUNK_SIZE = 1024 * 1024
+
+
+class ParseError(ValueError):
+    def __init__(self, message, position):
+        super().__init__(f"{message} at character {position + 1:,}")
+        self.position = position
+
+
+class Section(NamedTuple):
+    mode: str
+    topic1_terms: list
+    topic2_terms: list
+    options: dict
+    pairs: int
+    # the clauses are every topic 1/topic 2 pair, row by row, so regenerating the
+    # section from the term lists gives back the same clauses
+    complete: bool
+    # further term lists ANDed with every pair, as in export.Part
+    more_terms: tuple = ()
+
+
+class Parsed(NamedTuple):
+    sections: list
+    clauses: int
+    length: int
+    wildcards: int
+
+
+# raise a ParseError at the first unbalanced quote, bracket or parenthesis in text,
+# which starts at offset in the whole search string
+def check_balance(text, offset=0):
+    quote = tag = None
+    parentheses = []
+    for match in STRUCTURE.finditer(text):
+        character = match.group()
+        position = offset + match.start()
+        if quote is not None:
+            if character == '"':
+                quote = None
+        elif tag is not None:
+            if character == "]":
+                tag = None
+            elif character in '["':
+                raise ParseError(f"{character} inside the field tag opened at character {tag + 1:,}", position)
+        elif character == '"':
+            quote = position
+        elif character == "[":
+            tag = position
+        elif character == "]":
+            raise ParseError("] without a matching [", position)
+        elif character == "(":
+            parentheses.append(position)
+        elif character == ")":
+            if not parentheses:
+                raise ParseError(") without a matching (", position)
+            parentheses.pop()
+    if quote is not None:
+        raise ParseError("Unclosed quote", quote)
+    if tag is not None:
+        raise ParseError("Unclosed [", tag)
+    if parentheses:
+        raise ParseError("Unclosed (", parentheses[-1])
+
+
+# the top-level OR-ed clauses with their positions. Text between two ORs is counted
+# once, in C, and ORs inside a clause (in a phrase or a factored intersection) are
+# skipped until its quotes, brackets and parentheses balance.
+def clause_texts(chunk_stream):
+    buffer = ""
+    # position of buffer[0] in the whole search string
+    offset = 0
+    # start of the current clause in buffer, and of the text after the last OR counted into it
+    start = scan = 0
+    quotes = brackets = parentheses = 0
+    for chunk in chunk_stream:
+        buffer = buffer[start:] + chunk
+        offset += start
+        scan -= start
+        start = 0
+        for match in SEPARATOR.finditer(buffer, scan):
+            segment = buffer[scan:match.start()]
+            scan = match.end()
+            quotes += segment.count('"')
+            brackets += segment.count("[") - segment.count("]")
+            parentheses += segment.count("(") - segment.count(")")
+            if quotes % 2 == 0 and not brackets and not parentheses:
+                yield buffer[start:match.start()].strip(), offset + start
+                start = scan
+    text = buffer[start:]
+    check_balance(text, offset + start)
+    if text.strip() or offset + start:
+        yield text.strip(), offset + start
+
+
+# the term lists of a factored intersection, ((a[f] OR b[f]) AND (c[f] OR d[f]) ...),
+# and their field; None if the clause is not one
+def _factored_lists(text, position):
+    if not (text.startswith("((") and text.endswith("))")):
+        return None
+    inner = text[2:-2]
+    term_lists = [[]]
+    field = None
+    at = 0
+    while True:
+        match = FIELD_TERM.match(inner, at)
+        if not match:
+            return None
+        if field is None:
+            field = match[2]
+        elif match[2] != field:
+            raise ParseError(f"Unexpected term {match[0][:80]!r} in a factored intersection", position + 2 + at)
+        term_lists[-1].append(match[1])
+        at = match.end()
+        if at == len(inner):
+            break
+        if inner.startswith(pairwise.SEPARATOR, at):
+            at += len(pairwise.SEPARATOR)
+        elif inner.startswith(FACTORED_LIST_SEPARATOR, at):
+            term_lists.append([])
+            at += len(FACTORED_LIST_SEPARATOR)
+        else:
+            return None
+    if len(term_lists) < 2:
+        return None
+    return term_lists, field
+
+
+# (mode, terms, options) of a (term[tag] AND term[tag] ...) clause, or None
+def _product_clause(match):
+    tagged = [(match[1], match[2])] + [(term[1], term[2]) for term in PRODUCT_TERM.finditer(match[3])]
+    terms = [term for term, _ in tagged]
+    tags = [tag for _, tag in tagged]
+    first = MESH_TAG.fullmatch(tags[0])
+    if first and "/" in terms[0] and tags[1] in ("mh", "mh:noexp") and all(tag == tags[1] for tag in tags[2:]):
+        heading, _, subheading = terms[0].rpartition("/")
+        options = {"majr": first[1] == "majr", "noexp": bool(first[2])}
+        if (tags[1] == "mh:noexp") != options["noexp"]:
+            options["more_noexp"] = tags[1] == "mh:noexp"
+        return "mesh", (heading, subheading, *terms[1:]), options
+    if tags[0].isalnum() and all(tag == tags[0] for tag in tags):
+        return "intersection", tuple(terms), {"field": tags[0]}
+    return None
+
+
+# (mode, terms, options) of a clause: one term from each list, in list order, except that a
+# proximity clause's phrase is returned whole, since only the section can tell where to
+# cut it, and a factored intersection's terms are its whole term lists
+def parse_clause(text, position=0):
+    match = PROXIMITY_CLAUSE.fullmatch(text)
+    if match:
+        return "proximity", (match[1],), {"field": match[2], "distance": int(match[3])}
+    match = MESH_CLAUSE.fullmatch(text)
+    if match:
+        return "mesh", (match[1], match[2]), {"majr": match[3] == "majr", "noexp": bool(match[4])}
+    match = INTERSECTION_CLAUSE.fullmatch(text)
+    # (heading/subheading[mh] AND heading[mh]) is a MeSH pair with one more heading
+    if match and match[2] == match[4] and (match[2] != "mh" or "/" not in match[1]):
+        return "intersection", (match[1], match[3]), {"field": match[2]}
+    match = PRODUCT_CLAUSE.fullmatch(text)
+    if match:
+        clause = _product_clause(match)
+        if clause:
+            return clause
+    factored = _factored_lists(text, position)
+    if factored:
+        term_lists, field = factored
+        return export.FACTORED, tuple(term_lists), {"field": field}
+    check_balance(text, position)
+    raise ParseError(f"Not a clause this tool generates: {text[:80]!r}", position)
+
+
+# checks that clauses are every combination of one term from each list, in order, the
+# last list varying fastest: for two lists, every topic 2 term in each row
+class _Product:
+    def __init__(self, concepts):
+        self.term_lists = [[] for _ in range(concepts)]
+        # all terms in order of first appearance, for sections that are not a product
+        self.seen = [{} for _ in range(concepts)]
+        # the length of each list after the first, once the list before it has moved on
+        self.lengths = [None] * concepts
+        self.first = None
+        # the outermost list whose length is still unknown, and the clauses per term of it
+        self._axis = concepts - 1
+        self._block = 1
+        self.pairs = 0
+        self.complete = True
+
+    def add(self, terms):
+        for seen, term in zip(self.seen, terms):
+            seen.setdefault(term)
+        if self.complete:
+            self.complete = self._check(terms)
+        self.pairs += 1
+
+    def _check(self, terms):
+        if not self.pairs:
+            self.first = terms
+            for term_list, term in zip(self.term_lists, terms):
+                term_list.append(term)
+            return True
+        axis = self._axis
+        rest = self.pairs % self._block
+        if rest == 0:
+            # a clause that moves an outer list on fixes this list's length
+            while axis and terms[:axis] != self.first[:axis]:
+                self.lengths[axis] = len(self.term_lists[axis])
+                self._block *= self.lengths[axis]
+                axis -= 1
+            self._axis = axis
+            self.term_lists[axis].append(terms[axis])
+            return terms[:axis] == self.first[:axis] and terms[axis + 1:] == self.first[axis + 1:]
+        if terms[axis] != self.term_lists[axis][-1] or (axis and terms[:axis] != self.first[:axis]):
+            return False
+        for number in range(len(terms) - 1, axis, -1):
+            rest, column = divmod(rest, self.lengths[number])
+            if terms[number] != self.term_lists[number][column]:
+                return False
+        return True
+
+    def section(self, mode, options):
+        lengths = [length or len(term_list) for length, term_list in zip(self.lengths, self.term_lists)]
+        if self.complete and self.pairs % prod(lengths[1:]) == 0:
+            term_lists = self.term_lists
+        else:
+            term_lists = [list(seen) for seen in self.seen]
+        return Section(
+            mode, term_lists[0], term_lists[1], options, self.pairs, self.complete and term_lists is self.term_lists,
+            tuple(term_lists[2:]),
+        )
+
+
+# one way of cutting the first proximity phrase, and the first row it implies
+class _Cut:
+    def __init__(self, phrase, space):
+        self.head = phrase[:space + 1]
+        self.first_topic2 = phrase[space + 1:]
+        self.tail = phrase[space:]
+        # topic 2 terms of the phrases so far, while they all still start with head
+        self.row = [self.first_topic2]
+        self.open = True
+
+
+# a cut and a row length: topic 1 terms are whatever comes before each row's topic 2 terms
+class _Rows:
+    def __init__(self, cut, row_length, second_topic1):
+        self.cut = cut
+        self.row_length = row_length
+        self.topic1_terms = [cut.head[:-1], second_topic1]
+        self.head = second_topic1 + " "
+
+    def accepts(self, phrase, index):
+        column = index % self.row_length
+        if column:
+            return phrase == self.head + self.cut.row[column]
+        if not phrase.endswith(self.cut.tail) or len(phrase) == len(self.cut.tail):
+            return False
+        self.topic1_terms.append(phrase[: -len(self.cut.tail)])
+        self.head = self.topic1_terms[-1] + " "
+        return True
+
+
+# proximity phrases, cut into topic 1 and topic 2 terms by product consistency
+class _ProximityProduct:
+    def __init__(self):
+        self.cuts = []
+        self.rows = []
+        self.pairs = 0
+        self.first = None
+
+    def add(self, phrase):
+        index = self.pairs
+        self.pairs += 1
+        if index == 0:
+            self.first = phrase
+            self.cuts = [_Cut(phrase, space) for space, character in enumerate(phrase) if character == " "]
+            return
+        self.rows = [rows for rows in self.rows if rows.accepts(phrase, index)]
+        for cut in self.cuts:
+            if not cut.open:
+                continue
+            # a new row can start here if the phrase ends with the first topic 2 term
+            if phrase.endswith(cut.tail) and len(phrase) > len(cut.tail):
+                self.rows.append(_Rows(cut, index, phrase[: -len(cut.tail)]))
+            if phrase.startswith(cut.head):
+                cut.row.append(phrase[len(cut.head):])
+            else:
+                cut.open = False
+
+    # every surviving reading regenerates the same phrases; the one with the fewest
+    # characters typed is the most likely list, and ties go to the shortest topic 1 term
+    def section(self, options):
+        candidates = [
+            (rows.topic1_terms, rows.cut.row[: rows.row_length])
+            for rows in self.rows
+            if self.pairs % rows.row_length == 0
+        ]
+        candidates += [([cut.head[:-1]], cut.row) for cut in self.cuts if cut.open]
+        if candidates:
+            topic1_terms, topic2_terms = min(
+                candidates,
+                key=lambda candidate: (
+                    sum(map(len, candidate[0])) + sum(map(len, candidate[1])),
+                    len(candidate[0][0]),
+                ),
+            )
+            return Section("proximity", topic1_terms, topic2_terms, options, self.pairs, True)
+        return None
+
+
+class _SectionBuilder:
+    def __init__(self, mode, options, concepts):
+        self.mode = mode
+        self.options = options
+        self.concepts = concepts
+        self.phrases = _ProximityProduct() if mode == "proximity" else None
+        self.product = _Product(2 if self.phrases is not None else concepts)
+
+    def add(self, terms):
+        if self.phrases is not None:
+            self.phrases.add(terms[0])
+            # the fallback reading, if no cut makes the phrases a product
+            topic1_term, _, topic2_term = terms[0].partition(" ")
+            terms = (topic1_term, topic2_term)
+        self.product.add(terms)
+
+    def section(self):
+        if self.phrases is not None:
+            section = self.phrases.section(self.options)
+            if section is not None:
+                return section
+            return self.product.section(self.mode, self.options)._replace(complete=False)
+        return self.product.section(self.mode, self.options)
+
+
+# the sections of a search string, or of an iterable of chunks of one
+def parse(search):
+    chunk_stream = [search] if isinstance(search, str) else search
+    counts = {"length": 0, "wildcards": 0}
+
+    def counted(chunk_stream):
+        for chunk in chunk_stream:
+            counts["length"] += len(chunk)
+            counts["wildcards"] += chunk.count("*")
+            yield chunk
+
+    sections = []
+    builder = None
+    clauses = 0
+    for text, position in clause_texts(counted(chunk_stream)):
+        if not text:
+            raise ParseError("Empty clause", position)
+        mode, terms, options = parse_clause(text, position)
+        clauses += 1
+        if mode == export.FACTORED:
+            if builder:
+                sections.append(builder.section())
+                builder = None
+            sections.append(
+                Section(mode, terms[0], terms[1], options, prod(map(len, terms)), True, tuple(terms[2:]))
+            )
+            continue
+        if builder is None or builder.mode != mode or builder.options != options or builder.concepts != len(terms):
+            if builder:
+                sections.append(builder.section())
+            builder = _SectionBuilder(mode, options, len(terms))
+        builder.add(terms)
+    if builder:
+        sections.append(builder.section())
+    return Parsed(sections, clauses, counts["length"], counts["wildcards"])
+
+
+def read_chunks(fp, size=READ_CHUNK_SIZE):
+    while True:
+        chunk = fp.read(size)
+        if not chunk:
+            return
+        yield chunk
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        sys.exit(__doc__.splitlines()[2])
+    with open(sys.argv[1], encoding="utf-8") as fp:
+        parsed = parse(read_chunks(fp))
+    print(json.dumps({**parsed._asdict(), "sections": [section._asdict() for section in parsed.sections]}, indent=1))
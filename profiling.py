@@ -0,0 +1,277 @@
+"""Hit counts for every pair of a proximity or intersection search.
+
+Each distinct clause is counted once, concurrently, by a pluggable backend:
+EutilsCountBackend asks ESearch, and LocalIndexBackend evaluates the clause
+against an inverted index built from a PubMed baseline XML sample
+(e.g. pubmed25n0001.xml.gz). Counts are cached across runs, so re-profiling
+after a small edit only counts the new pairs.
+"""
+
+import asyncio
+import bisect
+import gzip
+import re
+import xml.etree.ElementTree as ElementTree
+from collections import defaultdict
+from typing import NamedTuple
+
+import cache
+import eutils
+import pairwise
+
+DEFAULT_CONCURRENCY = 8
+COUNT_CACHE_BYTES = 32 * 1024 * 1024
+
+# counts shared by every profile run in this process, keyed on (backend name, clause)
+counts_cache = cache.LRUCache(COUNT_CACHE_BYTES)
+
+
+class PairProfile(NamedTuple):
+    topic1_terms: list
+    topic2_terms: list
+    # row-major, like the generated search string
+    clauses: list
+    counts: list
+
+    def count(self, row, column):
+        return self.counts[row * len(self.topic2_terms) + column]
+
+    @property
+    def zero_pairs(self):
+        return sum(1 for count in self.counts if count == 0)
+
+    # clauses that find at least one record, in their generated order
+    def productive_clauses(self):
+        return (clause for clause, count in zip(self.clauses, self.counts) if count)
+
+
+class EutilsCountBackend:
+    def __init__(self, client):
+        self.client = client
+        self.name = client.url
+
+    async def count(self, clause):
+        return (await self.client.esearch(clause, usehistory=False)).count
+
+
+class LocalIndexBackend:
+    def __init__(self, index, name="local index"):
+        self.index = index
+        self.name = name
+
+    async def count(self, clause):
+        return self.index.count(clause)
+
+
+async def count_clauses(clauses, backend, concurrency=DEFAULT_CONCURRENCY):
+    counts = {}
+    pending = []
+    for clause in dict.fromkeys(clauses):
+        cached = counts_cache.get(cache.cache_key(backend.name, clause))
+        if cached is None:
+            pending.append(clause)
+        else:
+            counts[clause] = cached
+    slots = asyncio.Semaphore(concurrency)
+
+    async def count(clause):
+        async with slots:
+            counts[clause] = counts_cache.put(
+                cache.cache_key(backend.name, clause), await backend.count(clause)
+            )
+
+    await asyncio.gather(*(count(clause) for clause in pending))
+    return [counts[clause] for clause in clauses]
+
+
+async def profile_pairs(mode, topic1_terms, topic2_terms, backend, concurrency=DEFAULT_CONCURRENCY, **options):
+    topic1_terms = list(topic1_terms)
+    topic2_terms = list(topic2_terms)
+    clauses = list(pairwise.clauses(mode, topic1_terms, topic2_terms, **options))
+    counts = await count_clauses(clauses, backend, concurrency)
+    return PairProfile(topic1_terms, topic2_terms, clauses, counts)
+
+
+WORD = re.compile(r"[\w*]+")
+FIELD_GROUPS = {
+    "ti": ("ti",),
+    "ab": ("ab",),
+    "tiab": ("ti", "ab"),
+    "ad": ("ad",),
+    "tw": ("ti", "ab", "mh", "kw"),
+    "all": ("ti", "ab", "mh", "kw", "ad"),
+}
+PROXIMITY_CLAUSE = re.compile(r'^"([^"]+)"\[(\w+):~(\d+)\]$')
+INTERSECTION_CLAUSE = re.compile(r"^\(([^\[\]]+)\[(\w+)\] AND ([^\[\]]+)\[(\w+)\]\)$")
+MESH_CLAUSE = re.compile(r"^([^/\[\]]+)/([^\[\]]+)\[(mh|majr)(?::noexp)?\]$")
+
+
+def words(text):
+    return WORD.findall(text.casefold())
+
+
+# Inverted index over titles, abstracts, affiliations, keywords and MeSH terms. MeSH
+# headings are matched as written, without explosion, since the sample has no tree.
+class LocalIndex:
+    def __init__(self):
+        self.postings = {field: defaultdict(dict) for field in ("ti", "ab", "ad", "mh", "kw")}
+        self.headings = defaultdict(set)
+        self.major_headings = defaultdict(set)
+        self.documents = 0
+        self._vocabulary = {}
+
+    @classmethod
+    def from_xml(cls, path, limit=None):
+        index = cls()
+        opener = gzip.open if str(path).endswith(".gz") else open
+        with opener(path, "rb") as fp:
+            for _, element in ElementTree.iterparse(fp):
+                if element.tag != "PubmedArticle":
+                    continue
+                index.add_article(element)
+                element.clear()
+                if limit and index.documents >= limit:
+                    break
+        return index
+
+    def add_article(self, article):
+        pmid = article.findtext(".//MedlineCitation/PMID")
+        texts = {
+            "ti": _text(article, ".//ArticleTitle"),
+            "ab": _text(article, ".//Abstract/AbstractText"),
+            "ad": _text(article, ".//AffiliationInfo/Affiliation"),
+            "kw": _text(article, ".//KeywordList/Keyword"),
+        }
+        mesh_words = []
+        for heading in article.iterfind(".//MeshHeadingList/MeshHeading"):
+            descriptor = heading.find("DescriptorName")
+            name = (descriptor.text or "").casefold()
+            mesh_words.append(name)
+            qualifiers = heading.findall("QualifierName")
+            self.headings[(name, "")].add(pmid)
+            if descriptor.get("MajorTopicYN") == "Y":
+                self.major_headings[(name, "")].add(pmid)
+            for qualifier in qualifiers:
+                key = (name, (qualifier.text or "").casefold())
+                self.headings[key].add(pmid)
+                if qualifier.get("MajorTopicYN") == "Y" or descriptor.get("MajorTopicYN") == "Y":
+                    self.major_headings[key].add(pmid)
+        texts["mh"] = " ; ".join(mesh_words)
+        self.add(pmid, texts)
+
+    def add(self, pmid, texts):
+        self.documents += 1
+        self._vocabulary.clear()
+        for field, text in texts.items():
+            postings = self.postings[field]
+            for position, word in enumerate(words(text)):
+                postings[word].setdefault(pmid, []).append(position)
+
+    def _tokens(self, field, word):
+        if not word.endswith("*"):
+            return [word] if word in self.postings[field] else []
+        vocabulary = self._vocabulary.get(field)
+        if vocabulary is None:
+            vocabulary = self._vocabulary[field] = sorted(self.postings[field])
+        prefix = word.rstrip("*")
+        start = bisect.bisect_left(vocabulary, prefix)
+        end = bisect.bisect_left(vocabulary, prefix + "\U0010ffff")
+        return vocabulary[start:end]
+
+    # pmid -> sorted positions of any token matching word (which may be truncated)
+    def _positions(self, field, word):
+        positions = defaultdict(list)
+        for token in self._tokens(field, word):
+            for pmid, token_positions in self.postings[field][token].items():
+                positions[pmid].extend(token_positions)
+        for pmid_positions in positions.values():
+            pmid_positions.sort()
+        return positions
+
+    def _phrase(self, fields, text):
+        phrase = words(text)
+        found = set()
+        for field in fields:
+            postings = [self._positions(field, word) for word in phrase]
+            if not postings:
+                continue
+            candidates = set(postings[0]).intersection(*postings[1:])
+            for pmid in candidates:
+                later = [set(word_positions[pmid]) for word_positions in postings[1:]]
+                if any(
+                    all(start + offset in positions for offset, positions in enumerate(later, start=1))
+                    for start in postings[0][pmid]
+                ):
+                    found.add(pmid)
+        return found
+
+    # all words within `distance` extra words of each other, in any order
+    def _near(self, fields, text, distance):
+        phrase = words(text)
+        found = set()
+        for field in fields:
+            postings = [self._positions(field, word) for word in phrase]
+            if not postings:
+                continue
+            for pmid in set(postings[0]).intersection(*postings[1:]):
+                entries = sorted(
+                    (position, word) for word, positions in enumerate(postings) for position in positions[pmid]
+                )
+                if _window(entries, len(postings)) <= len(postings) - 1 + distance:
+                    found.add(pmid)
+        return found
+
+    def _mesh(self, heading, qualifier, major):
+        headings = self.major_headings if major else self.headings
+        return headings.get((heading.strip().casefold(), qualifier.strip().casefold()), set())
+
+    def count(self, clause):
+        match = PROXIMITY_CLAUSE.match(clause)
+        if match:
+            phrase, field, distance = match.groups()
+            return len(self._near(FIELD_GROUPS[field], phrase, int(distance)))
+        match = INTERSECTION_CLAUSE.match(clause)
+        if match:
+            term1, field1, term2, field2 = match.groups()
+            return len(self._phrase(FIELD_GROUPS[field1], term1) & self._phrase(FIELD_GROUPS[field2], term2))
+        match = MESH_CLAUSE.match(clause)
+        if match:
+            heading, qualifier, field = match.groups()
+            return len(self._mesh(heading, qualifier, field == "majr"))
+        raise ValueError(f"Cannot evaluate this clause against the local index: {clause}")
+
+
+# text of every matching element, including markup such as <i> inside titles
+def _text(article, path):
+    return " ".join("".join(element.itertext()) for element in article.iterfind(path))
+
+
+# narrowest span of positions containing every one of `kinds` words; entries are (position, word)
+def _window(entries, kinds):
+    best = float("inf")
+    seen = defaultdict(int)
+    covered = 0
+    start = 0
+    for position, word in entries:
+        if seen[word] == 0:
+            covered += 1
+        seen[word] += 1
+        while covered == kinds:
+            first_position, first_word = entries[start]
+            best = min(best, position - first_position)
+            seen[first_word] -= 1
+            if seen[first_word] == 0:
+                covered -= 1
+            start += 1
+    return best
+
+
+# blocking entry point for the Streamlit page: count in `index` if given, otherwise in PubMed
+def run_profile(mode, topic1_terms, topic2_terms, index=None, index_name="local index", **options):
+    async def run():
+        if index is not None:
+            return await profile_pairs(mode, topic1_terms, topic2_terms, LocalIndexBackend(index, index_name), **options)
+        async with eutils.client_from_environment() as client:
+            return await profile_pairs(mode, topic1_terms, topic2_terms, EutilsCountBackend(client), **options)
+
+    return asyncio.run(run())
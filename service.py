@@ -0,0 +1,311 @@
+"""JSON HTTP API for generating pairwise search strings without the Streamlit UI.
+
+Usage: python service.py [--host 127.0.0.1] [--port 8080] [--client-concurrency 4]
+
+Front ends POST a JSON section to one endpoint per mode, and a section per
+mode for the MeSH hybrid unions:
+
+    POST /search/proximity?format=json
+        {"topic1": ["frailty", "sarcopenia"], "topic2": ["scale", "index"],
+         "field": "tiab", "distance": 3}
+    POST /search/mesh+intersection?format=csv
+        {"mesh": {"topic1": [...], "topic2": [...], "majr": true},
+         "intersection": {"topic1": [...], "topic2": [...], "field": "tw", "factored": false}}
+
+MeSH and intersection sections may add a "topic3" list, ANDed with every
+pair. Term lists may also be newline-separated strings, as pasted into the app, and
+are cleaned up as in the app unless "normalize" is false; each must keep at least
+one term. Options are checked as the app's widgets check them: field must be one
+the mode offers (pairwise.FIELDS) and distance 0 or more. format is txt, json
+(metrics, search string and pair matrix) or csv (one row per pair), as in
+export.py; add split=1 for the PubMed-safe split searches instead. POST
+/estimate/<mode> returns the predicted metrics without generating anything,
+and GET /health reports the cache and client counts. Searches predicted to be
+over PPSG_MAX_CLAUSES clauses or PPSG_MAX_SEARCH_STRING_LENGTH characters are
+refused with 413 before anything is generated.
+
+Small responses are cached on the normalized request and sent whole; larger
+ones are streamed with Transfer-Encoding: chunked straight from the pair
+generator. Each client (the X-Client-Id header, or the peer address) may have
+--client-concurrency requests in flight; more get 429 Too Many Requests.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+from urllib.parse import parse_qs, urlsplit
+
+import cache
+import estimate
+import export
+import httpio
+import normalize
+import pairwise
+import splitter
+
+ENDPOINT_MODES = ("mesh", "proximity", "intersection", "mesh+proximity", "mesh+intersection")
+# section option names and their types
+OPTIONS = {
+    "mesh": {"majr": bool, "noexp": bool},
+    "proximity": {"field": str, "distance": int},
+    "intersection": {"field": str, "factored": bool},
+}
+TYPE_NAMES = {bool: "true or false", int: "an integer", str: "a string"}
+DEFAULT_CLIENT_CONCURRENCY = 4
+DEFAULT_CACHE_BYTES = 64 * 1024 * 1024
+# responses predicted to be larger than this are streamed instead of cached
+DEFAULT_CACHEABLE_BYTES = 1024 * 1024
+MAX_REQUEST_BYTES = 16 * 1024 * 1024
+MAX_SEARCH_STRING_LENGTH = int(os.environ.get("PPSG_MAX_SEARCH_STRING_LENGTH", 50_000_000))
+MAX_CLAUSES = int(os.environ.get("PPSG_MAX_CLAUSES", 10_000_000))
+
+
+class RequestError(ValueError):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _terms(section, name, normalize_terms):
+    terms = section.get(name)
+    if isinstance(terms, str):
+        terms = terms.splitlines()
+    if not isinstance(terms, list) or not all(isinstance(term, str) for term in terms):
+        raise RequestError(400, f"{name} must be a list of terms or a newline-separated string")
+    terms = normalize.normalize_terms(terms).terms if normalize_terms else terms
+    if not terms:
+        raise RequestError(400, f"{name} must have at least one term")
+    return terms
+
+
+def section_part(mode, section, normalize_terms=True):
+    if not isinstance(section, dict):
+        raise RequestError(400, f"The {mode} section must be a JSON object")
+    options = {}
+    for name, kind in OPTIONS[mode].items():
+        if name in section:
+            # JSON true is an int to Python, but not a distance
+            if not isinstance(section[name], kind) or (kind is int and isinstance(section[name], bool)):
+                raise RequestError(400, f"{name} must be {TYPE_NAMES[kind]}")
+            options[name] = section[name]
+    factored = options.pop("factored", False)
+    try:
+        pairwise.check_options(mode, **options)
+    except (TypeError, ValueError) as error:
+        raise RequestError(400, str(error)) from error
+    more_terms = ()
+    if section.get("topic3"):
+        if mode == "proximity":
+            raise RequestError(400, "Proximity searches combine exactly two lists of terms")
+        more_terms = (_terms(section, "topic3", normalize_terms),)
+    return export.Part(
+        export.FACTORED if factored else mode,
+        _terms(section, "topic1", normalize_terms),
+        _terms(section, "topic2", normalize_terms),
+        options,
+        more_terms,
+    )
+
+
+# the export.Parts for an endpoint mode, e.g. mesh+proximity
+def request_parts(mode, payload):
+    if mode not in ENDPOINT_MODES:
+        raise RequestError(404, f"Unknown search mode: {mode!r}; use one of {', '.join(ENDPOINT_MODES)}")
+    if not isinstance(payload, dict):
+        raise RequestError(400, "The request body must be a JSON object")
+    normalize_terms = payload.get("normalize", True) is not False
+    sections = mode.split("+")
+    if len(sections) == 1:
+        return [section_part(mode, payload, normalize_terms)]
+    missing = [section for section in sections if section not in payload]
+    if missing:
+        raise RequestError(400, f"Missing section(s): {', '.join(missing)}")
+    return [section_part(section, payload[section], normalize_terms) for section in sections]
+
+
+class GenerationService:
+    def __init__(
+        self,
+        host="127.0.0.1",
+        port=0,
+        client_concurrency=DEFAULT_CLIENT_CONCURRENCY,
+        cache_bytes=DEFAULT_CACHE_BYTES,
+        cacheable_bytes=DEFAULT_CACHEABLE_BYTES,
+    ):
+        self.host = host
+        self.port = port
+        self.client_concurrency = client_concurrency
+        self.cacheable_bytes = cacheable_bytes
+        self.responses = cache.LRUCache(cache_bytes)
+        self.requests = 0
+        self.rejected = 0
+        # requests in flight per client
+        self.active = {}
+        self._server = None
+        self._connections = {}
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}"
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def close(self):
+        self._server.close()
+        for writer in self._connections.values():
+            writer.transport.abort()
+        await asyncio.gather(*self._connections, return_exceptions=True)
+        await self._server.wait_closed()
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def _handle(self, reader, writer):
+        self._connections[asyncio.current_task()] = writer
+        peer = writer.get_extra_info("peername")
+        try:
+            while True:
+                start, headers = await httpio.read_head(reader)
+                if start is None:
+                    break
+                try:
+                    method, target = httpio.request_line(start)
+                    length = httpio.content_length(headers)
+                except httpio.HTTPError as error:
+                    writer.write(httpio.json_response(400, {"error": str(error)}, {"Connection": "close"}))
+                    await writer.drain()
+                    break
+                if length > MAX_REQUEST_BYTES:
+                    writer.write(httpio.json_response(413, {"error": "Request body is too large"}, {"Connection": "close"}))
+                    await writer.drain()
+                    break
+                body = await httpio.read_body(reader, headers)
+                self.requests += 1
+                client = headers.get("x-client-id") or (peer[0] if peer else "unknown")
+                if self.active.get(client, 0) >= self.client_concurrency:
+                    self.rejected += 1
+                    writer.write(
+                        httpio.json_response(
+                            429, {"error": "Too many requests in flight for this client"}, {"Retry-After": "1"}
+                        )
+                    )
+                else:
+                    self.active[client] = self.active.get(client, 0) + 1
+                    try:
+                        await self._respond(writer, method, target, body)
+                    except (ConnectionError, asyncio.IncompleteReadError):
+                        raise
+                    except Exception as error:
+                        # a reply already being streamed can only be cut off, which _search does
+                        if not writer.is_closing():
+                            writer.write(
+                                httpio.json_response(
+                                    500, {"error": f"Internal error: {type(error).__name__}"}, {"Connection": "close"}
+                                )
+                            )
+                            await writer.drain()
+                        break
+                    finally:
+                        self.active[client] -= 1
+                        if not self.active[client]:
+                            del self.active[client]
+                await writer.drain()
+                if not httpio.keep_alive(headers):
+                    break
+        except (ConnectionError, httpio.HTTPError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._connections.pop(asyncio.current_task(), None)
+            writer.close()
+
+    async def _respond(self, writer, method, target, body):
+        url = urlsplit(target)
+        query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        try:
+            if url.path == "/health" and method == "GET":
+                writer.write(httpio.json_response(200, self.health()))
+                return
+            endpoint, _, mode = url.path.strip("/").partition("/")
+            if endpoint not in ("search", "estimate"):
+                raise RequestError(404, "Not found")
+            if method != "POST":
+                raise RequestError(405, "Use POST")
+            try:
+                payload = json.loads(body or b"{}")
+            except ValueError as error:
+                raise RequestError(400, f"The request body is not valid JSON: {error}") from error
+            parts = request_parts(mode, payload)
+            if endpoint == "estimate":
+                writer.write(httpio.json_response(200, export.metrics(parts)))
+                return
+            await self._search(writer, mode, parts, query.get("format", "json"), query.get("split", "0") not in ("", "0"))
+        except RequestError as error:
+            writer.write(httpio.json_response(error.status, {"error": str(error)}))
+
+    async def _search(self, writer, mode, parts, export_format, split):
+        if export_format not in export.FORMATS:
+            raise RequestError(400, f"Unknown format: {export_format!r}; use one of {', '.join(export.FORMATS)}")
+        search_estimate = export.search_estimate(parts)
+        over = estimate.check_ceilings(search_estimate, MAX_CLAUSES, MAX_SEARCH_STRING_LENGTH)
+        if over is not None:
+            raise RequestError(413, over)
+        if split:
+            chunk_stream = export.split_chunks(splitter.split(export.clauses(parts)), parts, export_format)
+        else:
+            chunk_stream = export.chunks(parts, export_format)
+        content_type = export.FORMATS[export_format] + "; charset=utf-8"
+        # JSON and CSV exports repeat each clause about twice
+        if search_estimate.length * 3 <= self.cacheable_bytes:
+            key = cache.cache_key("search", mode, export_format, split, parts)
+            body = self.responses.get_or_create(key, lambda: "".join(chunk_stream).encode("utf-8"))
+            writer.write(httpio.response(200, body, content_type))
+            return
+        writer.write(httpio.response_head(200, {"Content-Type": content_type, "Transfer-Encoding": "chunked"}))
+        try:
+            for text in chunk_stream:
+                writer.write(httpio.chunk(text))
+                # lets other clients' requests run between chunks
+                await writer.drain()
+        except Exception:
+            # the 200 is already sent, so the client can only see the reply end early
+            writer.transport.abort()
+            raise
+        writer.write(httpio.chunk(b""))
+
+    def health(self):
+        return {
+            "requests": self.requests,
+            "rejected": self.rejected,
+            "clients": len(self.active),
+            "cache": {"entries": len(self.responses), "bytes": self.responses.size, "hits": self.responses.hits},
+        }
+
+
+async def serve(host, port, client_concurrency):
+    server = await GenerationService(host, port, client_concurrency).start()
+    print(f"Generation service listening on {server.url}", flush=True)
+    await asyncio.Event().wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve pairwise search string generation as a JSON HTTP API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument(
+        "--client-concurrency",
+        type=int,
+        default=DEFAULT_CLIENT_CONCURRENCY,
+        help="requests each client may have in flight",
+    )
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port, args.client_concurrency))
+    except KeyboardInterrupt:
+        pass
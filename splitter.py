@@ -0,0 +1,95 @@
+"""Pack a stream of pair clauses into as few PubMed-safe search strings as possible."""
+
+from typing import NamedTuple
+
+import pairwise
+
+WILDCARD_LIMIT = 256
+# PubMed does not document a URL limit; 8 KB is what most browsers and proxies accept
+DEFAULT_URL_BUDGET = 8000
+DEFAULT_QUERY_BUDGET = 4000
+
+
+class SubQuery(NamedTuple):
+    number: int
+    query: str
+    pairs: int
+    wildcards: int
+    url_length: int
+    # a single clause that is over budget on its own is still emitted, but flagged
+    oversized: bool
+
+    @property
+    def url(self):
+        return pairwise.search_url(self.query)
+
+
+def fits(length, wildcards, url_length, wildcard_limit, url_budget, query_budget):
+    return (
+        wildcards <= wildcard_limit
+        and url_length <= url_budget
+        and length <= query_budget
+    )
+
+
+# Greedily fill each sub-query before starting the next one. For additive limits this gives
+# the fewest sub-queries possible while keeping the clauses in their generated order.
+def split(
+    clause_stream,
+    wildcard_limit=WILDCARD_LIMIT,
+    url_budget=DEFAULT_URL_BUDGET,
+    query_budget=DEFAULT_QUERY_BUDGET,
+):
+    limits = (wildcard_limit, url_budget, query_budget)
+    separator_length = len(pairwise.SEPARATOR)
+    separator_bytes = pairwise.fragment_length(pairwise.SEPARATOR)
+    base_url_length = pairwise.url_length("")
+    number = 0
+    clauses = []
+    length = wildcards = url_length = 0
+
+    def sub_query():
+        return SubQuery(
+            number,
+            pairwise.SEPARATOR.join(clauses),
+            len(clauses),
+            wildcards,
+            url_length,
+            not fits(length, wildcards, url_length, *limits),
+        )
+
+    for clause in clause_stream:
+        clause_wildcards = clause.count("*")
+        clause_bytes = pairwise.encoded_length(clause)
+        if clauses:
+            candidate = (
+                length + separator_length + len(clause),
+                wildcards + clause_wildcards,
+                url_length + separator_bytes + clause_bytes,
+            )
+            if fits(*candidate, *limits):
+                clauses.append(clause)
+                length, wildcards, url_length = candidate
+                continue
+            yield sub_query()
+        number += 1
+        clauses = [clause]
+        length, wildcards, url_length = len(clause), clause_wildcards, base_url_length + clause_bytes
+    if clauses:
+        yield sub_query()
+
+
+# combine sub-queries run in order in a fresh PubMed search history
+def history_query(sub_queries):
+    return pairwise.SEPARATOR.join(f"#{sub_query.number}" for sub_query in sub_queries)
+
+
+def needs_split(
+    length,
+    wildcards,
+    url_length,
+    wildcard_limit=WILDCARD_LIMIT,
+    url_budget=DEFAULT_URL_BUDGET,
+    query_budget=DEFAULT_QUERY_BUDGET,
+):
+    return not fits(length, wildcards, url_length, wildcard_limit, url_budget, query_budget)
@@ -0,0 +1,108 @@
+"""Find intersection terms that a truncated term in the same list already covers.
+
+frail* matches every record that frailty matches, and musc* weak* covers muscle
+weakness, so pairing both with the other topic only adds redundant clauses and
+wildcards. Truncated terms go into a character trie; every other term is walked
+through it word by word, branching wherever a trie word ends in *, so each term
+costs O(words * characters) no matter how long the list is.
+"""
+
+from typing import NamedTuple
+
+TRUNCATION = "*"
+WORD_BREAK = " "
+
+
+class Removal(NamedTuple):
+    term: str
+    covered_by: str
+
+    @property
+    def explanation(self):
+        return f"{self.term} is already matched by {self.covered_by}"
+
+
+class Pruned(NamedTuple):
+    terms: list
+    removals: list
+
+
+class _Node:
+    __slots__ = ("children", "term")
+
+    def __init__(self):
+        self.children = {}
+        # (position, term) of a truncated term that ends here
+        self.term = None
+
+
+# PubMed ignores case and repeated spaces
+def _key(term):
+    return WORD_BREAK.join(term.split()).casefold()
+
+
+def _build_trie(terms):
+    root = _Node()
+    for position, term in enumerate(terms):
+        if TRUNCATION not in term:
+            continue
+        node = root
+        for char in _key(term):
+            node = node.children.setdefault(char, _Node())
+        if node.term is None:
+            node.term = (position, term)
+    return root
+
+
+# a truncated term covering some run of consecutive words in words, or None
+def _covering_term(root, words, position):
+    for first in range(len(words)):
+        states = [(root, first)]
+        while states:
+            node, word = states.pop()
+            if word > first:
+                if node.term is not None and node.term[0] != position:
+                    return node.term[1]
+                if word == len(words):
+                    continue
+                node = node.children.get(WORD_BREAK)
+                if node is None:
+                    continue
+            for offset, char in enumerate(words[word]):
+                truncated = node.children.get(TRUNCATION) if offset else None
+                if truncated is not None:
+                    # the trie word is a truncated prefix of this word
+                    states.append((truncated, word + 1))
+                node = node.children.get(char)
+                if node is None:
+                    break
+            else:
+                truncated = node.children.get(TRUNCATION)
+                if truncated is not None:
+                    states.append((truncated, word + 1))
+                states.append((node, word + 1))
+    return None
+
+
+def prune(terms):
+    terms = list(terms)
+    root = _build_trie(terms)
+    kept = []
+    removals = []
+    covering = {}
+    for position, term in enumerate(terms):
+        covered_by = _covering_term(root, _key(term).split(WORD_BREAK), position)
+        if covered_by is None:
+            kept.append(term)
+        else:
+            covering[term] = covered_by
+            removals.append(term)
+    # explain each removal with a term that is kept, e.g. frailty by frail* rather than frailt*
+    for position, term in enumerate(removals):
+        covered_by = covering[term]
+        seen = {term}
+        while covered_by in covering and covered_by not in seen:
+            seen.add(covered_by)
+            covered_by = covering[covered_by]
+        removals[position] = Removal(term, covered_by)
+    return Pruned(kept, removals)
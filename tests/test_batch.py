@@ -0,0 +1,68 @@
+import json
+
+import pytest
+
+import batch
+
+
+def write_job(tmp_path, job, topic1, topic2):
+    (tmp_path / "topic1.txt").write_text(topic1, encoding="utf-8")
+    (tmp_path / "topic2.txt").write_text(topic2, encoding="utf-8")
+    manifest = tmp_path / "manifest.json"
+    manifest.write_text(json.dumps([{"topic1": "topic1.txt", "topic2": "topic2.txt", **job}]), encoding="utf-8")
+    return manifest
+
+
+# blank and space-padded lines used to be paired as they were, as " scale"[tiab:~4]
+@pytest.mark.parametrize(
+    "job, expected",
+    [
+        ({"mode": "proximity", "pd": 4}, '"frail scale"[tiab:~4] OR "frail index"[tiab:~4]'),
+        ({"mode": "intersection"}, "(frail[tw] AND scale[tw]) OR (frail[tw] AND index[tw])"),
+    ],
+)
+def test_terms_are_normalized_by_default(tmp_path, job, expected):
+    manifest = write_job(tmp_path, {**job, "output": "out.txt"}, "frail \n\n", " scale\nindex\n\nscale\n")
+    (loaded,) = batch.load_manifest(manifest, tmp_path)
+    batch.run_job(loaded)
+    assert (tmp_path / "out.txt").read_text(encoding="utf-8") == expected
+
+
+def test_no_normalize_keeps_the_lines_as_they_are(tmp_path):
+    manifest = write_job(tmp_path, {"mode": "intersection", "output": "out.txt"}, "frail", "scale \n")
+    (loaded,) = batch.load_manifest(manifest, tmp_path, normalize_terms=False)
+    batch.run_job(loaded)
+    assert (tmp_path / "out.txt").read_text(encoding="utf-8") == "(frail[tw] AND scale [tw])"
+
+
+def test_a_list_without_terms_fails_the_job(tmp_path):
+    manifest = write_job(tmp_path, {"mode": "intersection"}, "frail", " \n\n")
+    (loaded,) = batch.load_manifest(manifest, tmp_path)
+    with pytest.raises(ValueError, match="topic2 has no terms"):
+        batch.run_job(loaded)
+
+
+# "false" used to be read as true, running the job with the opposite option
+@pytest.mark.parametrize(
+    "job, message",
+    [
+        ({"mode": "mesh", "majr": "false"}, 'majr must be true or false, not "false"'),
+        ({"mode": "mesh", "noexp": 0}, "noexp must be true or false, not 0"),
+        ({"mode": "intersection", "factored": "no"}, 'factored must be true or false, not "no"'),
+        ({"mode": "proximity", "pd": "4"}, 'pd must be an integer, not "4"'),
+        ({"mode": "proximity", "pd": True}, "pd must be an integer, not true"),
+        ({"mode": "proximity", "pf": "tw"}, "field must be one of ti, tiab, ad"),
+    ],
+)
+def test_options_of_the_wrong_type_are_rejected(tmp_path, job, message):
+    manifest = write_job(tmp_path, job, "frail", "scale")
+    with pytest.raises(ValueError) as error:
+        batch.load_manifest(manifest, tmp_path)
+    assert str(error.value).startswith("job 1: ")
+    assert message in str(error.value)
+
+
+def test_json_booleans_are_accepted(tmp_path):
+    manifest = write_job(tmp_path, {"mode": "mesh", "majr": True, "noexp": False}, "Aged", "epidemiology")
+    (loaded,) = batch.load_manifest(manifest, tmp_path)
+    assert loaded["options"] == {"majr": True, "noexp": False}
@@ -0,0 +1,70 @@
+import sys
+
+import cache
+
+
+def test_least_recently_used_entries_are_evicted_first():
+    lru = cache.LRUCache(max_bytes=30)
+    for key in "abc":
+        lru.put(key, key.upper(), size=10)
+    assert lru.get("a") == "A"  # b is now the least recently used
+    lru.put("d", "D", size=10)
+    assert "b" not in lru
+    assert [key for key in "acd" if key in lru] == ["a", "c", "d"]
+    assert (lru.size, lru.evictions) == (30, 1)
+
+
+def test_a_large_entry_evicts_as_many_entries_as_it_needs():
+    lru = cache.LRUCache(max_bytes=30)
+    for key in "abc":
+        lru.put(key, key, size=10)
+    lru.put("big", "x", size=25)
+    assert list(key for key in ("a", "b", "c", "big") if key in lru) == ["big"]
+    assert (lru.size, lru.evictions, len(lru)) == (25, 3, 1)
+
+
+def test_a_value_larger_than_the_cache_is_returned_but_not_stored():
+    lru = cache.LRUCache(max_bytes=30)
+    lru.put("a", "A", size=10)
+    assert lru.put("huge", "H", size=31) == "H"
+    assert "huge" not in lru and "a" in lru
+    assert (lru.size, lru.evictions) == (10, 0)
+
+
+def test_replacing_a_key_replaces_its_size():
+    lru = cache.LRUCache(max_bytes=30)
+    lru.put("a", "A", size=10)
+    lru.put("a", "AA", size=20)
+    assert (lru.get("a"), lru.size, len(lru)) == ("AA", 20, 1)
+
+
+def test_hits_misses_and_evictions_are_counted():
+    lru = cache.LRUCache(max_bytes=1000)
+    created = []
+
+    def create(value):
+        return lambda: created.append(value) or value
+
+    assert lru.get_or_create("a", create("A")) == "A"  # miss
+    assert lru.get_or_create("a", create("not called")) == "A"  # hit
+    assert lru.get("missing") is None  # miss
+    lru.put("b", "B", size=500)
+    lru.put("c", "C", size=500)  # evicts a
+    assert created == ["A"]
+    assert lru.stats() == {
+        "hits": 1, "misses": 2, "evictions": 1, "entries": 2, "bytes": 1000, "max_bytes": 1000,
+    }
+    lru.clear()
+    assert (len(lru), lru.size, lru.hits) == (0, 0, 1)
+
+
+def test_entry_size_counts_the_strings_inside_containers():
+    text = "x" * 1000
+    assert cache.entry_size(text) == sys.getsizeof(text)
+    assert cache.entry_size((text, [text])) > 2 * sys.getsizeof(text)
+    assert cache.entry_size({"key": text}) > sys.getsizeof(text)
+
+
+def test_cache_key_is_stable_across_tuples_and_lists():
+    assert cache.cache_key("mesh", ("a", "b"), {"noexp": True}) == cache.cache_key("mesh", ["a", "b"], {"noexp": True})
+    assert cache.cache_key("mesh", ["a", "b"]) != cache.cache_key("mesh", ["b", "a"])
@@ -0,0 +1,68 @@
+import pytest
+
+import dialects
+import pairwise
+
+TOPIC1 = ["frail", "muscle weakness"]
+TOPIC2 = ["scale", "index*"]
+
+
+@pytest.mark.parametrize(
+    "dialect, field, distance, clause",
+    [
+        ("pubmed", "tiab", 2, '"frail scale"[tiab:~2]'),
+        ("pubmed", "ti", 0, '"frail scale"[ti:~0]'),
+        # Ovid and Embase count word positions, so N words between is adjN+1 and NEAR/N+1
+        ("ovid", "tiab", 2, "(frail adj3 scale).ti,ab."),
+        ("ovid", "ti", 0, "(frail adj1 scale).ti."),
+        ("embase", "tiab", 2, "('frail' NEAR/3 'scale'):ti,ab"),
+        ("embase", "ti", 0, "('frail' NEAR/1 'scale'):ti"),
+        # Scopus counts the words in between, as PubMed does
+        ("scopus", "tiab", 2, 'TITLE-ABS("frail" W/2 "scale")'),
+        ("scopus", "ti", 5, 'TITLE("frail" W/5 "scale")'),
+    ],
+)
+def test_proximity_distance_in_each_dialect(dialect, field, distance, clause):
+    rendered = dialects.render("proximity", ["frail"], ["scale"], (dialect,), field=field, distance=distance)
+    assert rendered[dialect].generated.search_string == clause
+
+
+@pytest.mark.parametrize(
+    "dialect, search",
+    [
+        ("pubmed", "(frail[tw] AND scale[tw]) OR (frail[tw] AND index*[tw])"),
+        ("ovid", "(frail and scale).tw. or (frail and index*).tw."),
+        ("embase", "('frail':ti,ab,kw AND 'scale':ti,ab,kw) OR ('frail':ti,ab,kw AND 'index*':ti,ab,kw)"),
+        ("scopus", 'TITLE-ABS-KEY("frail" AND "scale") OR TITLE-ABS-KEY("frail" AND "index*")'),
+    ],
+)
+def test_intersection_in_each_dialect(dialect, search):
+    rendered = dialects.render("intersection", ["frail"], TOPIC2, (dialect,), field="tw")
+    assert rendered[dialect].generated.search_string == search
+
+
+@pytest.mark.parametrize("mode, options", [("proximity", {"field": "tiab", "distance": 3}), ("intersection", {"field": "ti"})])
+def test_one_pass_renders_every_dialect(mode, options):
+    rendered = dialects.render(mode, TOPIC1, TOPIC2, **options)
+    assert set(rendered) == set(dialects.DIALECTS)
+    assert rendered["pubmed"].generated == pairwise.generate(mode, TOPIC1, TOPIC2, **options)
+    for dialect, result in rendered.items():
+        generated = result.generated
+        assert generated.pairs == 4
+        assert generated.wildcards == generated.search_string.count("*") == 2
+        assert generated.length == dialects.estimate_length(dialect, mode, TOPIC1, TOPIC2, **options)
+        assert generated.search_string.count(dialects.DIALECTS[dialect].separator) == 3
+
+
+def test_fields_without_an_equivalent_are_rejected():
+    with pytest.raises(ValueError, match=r"Ovid has no equivalent of the PubMed \[ad\] field"):
+        dialects.render("proximity", TOPIC1, TOPIC2, ("ovid",), field="ad", distance=2)
+    with pytest.raises(ValueError, match="No 'ovid' rendering of 'mesh' searches"):
+        dialects.template("ovid", "mesh")
+
+
+def test_wildcard_limit_notes():
+    topic1 = [f"frail{number}*" for number in range(300)]
+    rendered = dialects.render("intersection", topic1, ["scale"], ("pubmed", "ovid"), field="tw")
+    assert rendered["pubmed"].notes == ["over PubMed's 256 wildcard limit"]
+    assert rendered["ovid"].notes == []
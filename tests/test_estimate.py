@@ -0,0 +1,64 @@
+import pytest
+
+import estimate
+import pairwise
+
+TOPIC1 = ["frail*", "activities of daily living", "épuisé", "sarco?enia/loss"]
+TOPIC2 = ["scale", "index*", "timed up & go"]
+TOPIC3 = ["aged", "elderly*"]
+HEADINGS = ["Frailty", "Activities of Daily Living"]
+SUBHEADINGS = ["diagnosis", "epidemiology", "blood"]
+
+SEARCHES = [
+    ("mesh", [HEADINGS, SUBHEADINGS], {}),
+    ("mesh", [HEADINGS, SUBHEADINGS], {"majr": True, "noexp": True}),
+    ("mesh", [HEADINGS, SUBHEADINGS, ["Aged", "Humans"]], {"noexp": True}),
+    ("mesh", [HEADINGS, SUBHEADINGS, ["Aged"]], {"majr": True, "more_noexp": True}),
+    ("proximity", [TOPIC1, TOPIC2], {"field": "tiab", "distance": 2}),
+    ("proximity", [TOPIC1, TOPIC2], {"field": "ad", "distance": 0}),
+    ("intersection", [TOPIC1, TOPIC2], {"field": "tw"}),
+    ("intersection", [TOPIC1, TOPIC2, TOPIC3], {"field": "all"}),
+    ("intersection", [TOPIC1, TOPIC2, TOPIC3, ["human*"]], {"field": "ti"}),
+    ("intersection", [TOPIC1, []], {"field": "tw"}),
+]
+
+
+def assert_exact(predicted, generated):
+    search_string = generated.search_string
+    assert predicted.pairs == generated.pairs
+    assert predicted.length == len(search_string) == generated.length
+    assert predicted.wildcards == search_string.count("*") == generated.wildcards
+    assert predicted.url_length == pairwise.url_length(search_string) == len(pairwise.search_url(search_string))
+    assert predicted.typed == generated.typed
+
+
+@pytest.mark.parametrize("mode, term_lists, options", SEARCHES)
+def test_estimate_matches_generate(mode, term_lists, options):
+    assert_exact(estimate.estimate(mode, *term_lists, **options), pairwise.generate(mode, *term_lists, **options))
+
+
+@pytest.mark.parametrize("more_terms", [(), (TOPIC3,)])
+def test_factored_estimate_matches_generate(more_terms):
+    assert_exact(
+        estimate.estimate_factored_intersection(TOPIC1, TOPIC2, *more_terms, field="tiab"),
+        pairwise.generate_factored_intersection(TOPIC1, TOPIC2, *more_terms, field="tiab"),
+    )
+
+
+@pytest.mark.parametrize(
+    "searches",
+    [
+        [SEARCHES[0], SEARCHES[4]],
+        [SEARCHES[2], SEARCHES[7]],
+        [SEARCHES[3], SEARCHES[9], SEARCHES[6]],
+        [SEARCHES[9], SEARCHES[9]],
+    ],
+)
+def test_union_estimate_matches_generate_union(searches):
+    predicted = estimate.estimate_union(
+        *(estimate.estimate(mode, *term_lists, **options) for mode, term_lists, options in searches)
+    )
+    generated = pairwise.generate_union(
+        *(pairwise.generate(mode, *term_lists, **options) for mode, term_lists, options in searches)
+    )
+    assert_exact(predicted, generated)
@@ -0,0 +1,62 @@
+import asyncio
+import itertools
+
+import pytest
+
+import eutils
+import mock_eutils
+
+
+# later requests are answered sooner, so sub-queries posted concurrently would be
+# numbered out of order
+class SlowerFirstServer(mock_eutils.MockESearchServer):
+    def __init__(self):
+        super().__init__()
+        self._latencies = itertools.count(10)
+
+    @property
+    def latency(self):
+        return max(0, 20 - next(self._latencies)) / 200
+
+    @latency.setter
+    def latency(self, value):
+        pass
+
+
+def test_split_searches_are_numbered_in_order():
+    queries = [f"query {number}[tiab]" for number in range(6)]
+
+    async def run():
+        async with SlowerFirstServer() as server:
+            async with eutils.ESearchClient(server.url, rate=0, connections=6) as client:
+                return await client.search(queries)
+
+    result = asyncio.run(run())
+    assert [part.query_key for part in result.parts] == [str(number) for number in range(1, 7)]
+    expected = set().union(*(mock_eutils.clause_pmids(query) for query in queries))
+    assert result.count == len(expected)
+
+
+@pytest.mark.parametrize(
+    "response",
+    [b"garbage\r\n\r\n", b"HTTP/1.1 OK\r\n\r\n", b"HTTP/1.1 200 OK\r\nContent-Length: ten\r\n\r\n"],
+)
+def test_malformed_responses_are_eutils_errors(response):
+    async def respond(reader, writer):
+        await reader.readuntil(b"\r\n\r\n")
+        writer.write(response)
+        await writer.drain()
+        writer.close()
+
+    async def run():
+        server = await asyncio.start_server(respond, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        try:
+            async with eutils.ESearchClient(f"http://127.0.0.1:{port}/esearch.fcgi", rate=0) as client:
+                await client.esearch("frailty")
+        finally:
+            server.close()
+            await server.wait_closed()
+
+    with pytest.raises(eutils.EutilsError):
+        asyncio.run(run())
@@ -0,0 +1,141 @@
+import csv
+import io
+import json
+
+import pytest
+
+import export
+import pairwise
+import parsing
+import splitter
+
+PROXIMITY = export.Part("proximity", ["frail elderly", "weak, thin"], ["scale", "índice*"], {"field": "tiab", "distance": 2})
+INTERSECTION = export.Part("intersection", ["frail*", "weak"], ["scale", "index"], {"field": "tw"}, (["aged", "elder*"],))
+MESH = export.Part("mesh", ["Frailty", "Aged"], ["diagnosis"], {"majr": False, "noexp": True})
+
+SEARCHES = [[PROXIMITY], [INTERSECTION], [MESH, PROXIMITY], [MESH, INTERSECTION]]
+
+
+def clause_list(part):
+    return list(export.part_clauses(part))
+
+
+@pytest.mark.parametrize("parts", SEARCHES)
+@pytest.mark.parametrize("chunk_size", [1, 7, pairwise.DEFAULT_CHUNK_SIZE])
+def test_text_export_is_the_search_string(parts, chunk_size):
+    assert "".join(export.text_chunks(parts, chunk_size)) == str(export.generate(parts).search_string)
+
+
+@pytest.mark.parametrize("parts", SEARCHES)
+@pytest.mark.parametrize("chunk_size", [1, 7, pairwise.DEFAULT_CHUNK_SIZE])
+def test_json_export_round_trips(parts, chunk_size):
+    exported = json.loads("".join(export.json_chunks(parts, chunk_size)))
+    assert exported["search_string"] == str(export.generate(parts).search_string)
+    assert exported["metrics"] == json.loads(json.dumps(export.metrics(parts)))
+    assert len(exported["parts"]) == len(parts)
+    for read, part in zip(exported["parts"], parts):
+        assert (read["mode"], read["options"]) == (part.mode, part.options)
+        assert (read["topic1_terms"], read["topic2_terms"]) == (part.topic1_terms, part.topic2_terms)
+        assert read.get("more_terms", []) == list(part.more_terms)
+        if part.more_terms:
+            assert read["pair_matrix"] is None
+        else:
+            clauses = iter(clause_list(part))
+            assert read["pair_matrix"] == [[next(clauses) for _ in part.topic2_terms] for _ in part.topic1_terms]
+
+
+@pytest.mark.parametrize("parts", SEARCHES)
+def test_csv_export_round_trips(parts):
+    rows = list(csv.reader(io.StringIO("".join(export.csv_chunks(parts)))))
+    columns = max(len(part.term_lists) for part in parts)
+    assert rows[0] == ["mode", *(f"topic{number}" for number in range(1, columns + 1)), "clause"]
+    expected = []
+    for part in parts:
+        combinations = [
+            (topic1, topic2, *more) for topic1 in part.topic1_terms for topic2 in part.topic2_terms
+            for more in ([()] if not part.more_terms else [(term,) for term in part.more_terms[0]])
+        ]
+        for terms, clause in zip(combinations, clause_list(part)):
+            expected.append([part.mode, *terms, *[""] * (columns - len(terms)), clause])
+    assert rows[1:] == expected
+
+
+def test_csv_export_is_streamed_in_chunks(monkeypatch):
+    monkeypatch.setattr(export, "CSV_ROWS_PER_CHUNK", 3)
+    part = export.Part("intersection", [f"a{number}" for number in range(5)], ["b", "c"], {"field": "tw"})
+    chunks = list(export.csv_chunks([part]))
+    assert len(chunks) == 4
+    assert len(list(csv.reader(io.StringIO("".join(chunks))))) == 11
+
+
+def test_write_returns_the_bytes_written():
+    buffer = io.BytesIO()
+    written = export.write(export.chunks([PROXIMITY], "txt"), buffer)
+    assert written == len(buffer.getvalue()) == len(str(export.generate([PROXIMITY]).search_string).encode("utf-8"))
+
+
+def test_unknown_format_is_rejected():
+    with pytest.raises(ValueError, match="Unknown export format"):
+        export.chunks([PROXIMITY], "xml")
+
+
+def split_searches(parts):
+    return list(splitter.split(export.clauses(parts), wildcard_limit=1))
+
+
+@pytest.mark.parametrize("parts", [[INTERSECTION], [MESH, PROXIMITY]])
+def test_split_exports(parts):
+    sub_queries = split_searches(parts)
+    assert len(sub_queries) > 1
+
+    lines = "".join(export.split_chunks(sub_queries, parts, "txt")).splitlines()
+    assert lines == [sub_query.query for sub_query in sub_queries]
+
+    exported = json.loads("".join(export.split_chunks(sub_queries, parts, "json")))
+    assert [search["query"] for search in exported["searches"]] == lines
+    assert [search["number"] for search in exported["searches"]] == list(range(1, len(sub_queries) + 1))
+    assert exported["history_query"] == splitter.history_query(sub_queries)
+
+    rows = list(csv.reader(io.StringIO("".join(export.split_chunks(sub_queries, parts, "csv")))))
+    assert rows[0] == ["search", "clause"]
+    assert [clause for _, clause in rows[1:]] == list(export.clauses(parts))
+    for sub_query in sub_queries:
+        numbered = [clause for number, clause in rows[1:] if number == str(sub_query.number)]
+        assert pairwise.SEPARATOR.join(numbered) == sub_query.query
+
+
+FACTORED = export.Part(export.FACTORED, ["frail*", "weak"], ["scale", "index"], {"field": "tiab"})
+
+
+def test_factored_search_ands_the_or_of_each_list():
+    assert "".join(export.text_chunks([FACTORED])) == "((frail*[tiab] OR weak[tiab]) AND (scale[tiab] OR index[tiab]))"
+    more = FACTORED._replace(more_terms=(["aged"],))
+    assert str(export.generate([more]).search_string) == (
+        "((frail*[tiab] OR weak[tiab]) AND (scale[tiab] OR index[tiab]) AND (aged[tiab]))"
+    )
+
+
+def test_factored_search_covers_every_pair():
+    generated = export.generate([FACTORED])
+    assert generated.pairs == 4
+    assert export.metrics([FACTORED])["length"] == generated.length
+    assert pairwise.url_from_encoded(export.encoded_search_string([FACTORED])) == pairwise.search_url(
+        generated.search_string
+    )
+
+
+def test_factored_exports():
+    exported = json.loads("".join(export.json_chunks([MESH, FACTORED])))
+    assert exported["search_string"].endswith(" OR " + "".join(export.part_clauses(FACTORED)))
+    assert exported["parts"][1]["mode"] == export.FACTORED
+    assert exported["parts"][1]["pair_matrix"] is None
+    rows = list(csv.reader(io.StringIO("".join(export.csv_chunks([FACTORED])))))
+    assert rows[1:] == [[export.FACTORED, "", "", "((frail*[tiab] OR weak[tiab]) AND (scale[tiab] OR index[tiab]))"]]
+
+
+# the factored search is read back into its term lists
+def test_factored_search_parses_back():
+    (section,) = parsing.parse("".join(export.text_chunks([FACTORED]))).sections
+    assert (section.mode, section.topic1_terms, section.topic2_terms) == (
+        export.FACTORED, ["frail*", "weak"], ["scale", "index"]
+    )
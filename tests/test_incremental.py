@@ -0,0 +1,69 @@
+import random
+
+import pytest
+
+import incremental
+import pairwise
+
+OPTIONS = [
+    ("proximity", {"field": "tiab", "distance": 3}),
+    ("intersection", {"field": "tw"}),
+    ("mesh", {"majr": True, "noexp": False}),
+]
+
+# (topic 1, topic 2) after each edit
+EDITS = [
+    (["frail", "weak*"], ["scale", "index"]),
+    (["frail", "weak*", "sarcopenia"], ["scale", "index"]),  # topic 1 added
+    (["weak*", "sarcopenia"], ["scale", "index"]),  # topic 1 removed
+    (["sarcopenia", "weak*"], ["scale", "index"]),  # topic 1 reordered
+    (["sarcopenia", "weak*"], ["scale", "index", "tool"]),  # topic 2 appended
+    (["sarcopenia", "weak*"], ["measure", "scale", "index", "tool"]),  # topic 2 prepended
+    (["sarcopenia", "weak*"], ["measure", "index", "tool"]),  # topic 2 removed from the middle
+    (["sarcopenia", "weak*"], ["tool", "index", "measure"]),  # topic 2 reordered
+    (["frailty", "sarcopenia"], ["tool", "questionnaire", "measure"]),  # both changed
+    (["frailty", "sarcopenia"], ["tool", "tool", "measure"]),  # topic 2 repeated
+    (["frailty", "frailty"], ["tool", "measure"]),  # topic 1 repeated
+    (["frailty"], []),
+    (["frailty", "weak*"], ["scale"]),
+]
+
+
+@pytest.mark.parametrize("mode, options", OPTIONS)
+def test_each_edit_matches_a_fresh_generation(mode, options):
+    search = incremental.IncrementalSearch(mode, **options)
+    for topic1_terms, topic2_terms in EDITS:
+        assert search.generate(topic1_terms, topic2_terms) == pairwise.generate(
+            mode, topic1_terms, topic2_terms, **options
+        )
+
+
+def test_unchanged_clauses_are_reused():
+    search = incremental.IncrementalSearch("proximity", field="tiab", distance=3)
+    search.generate(["frail", "weak"], ["scale", "index"])
+    search.generate(["frail", "weak", "sarcopenia"], ["scale", "index"])
+    assert (search.formatted, search.reused) == (2, 4)
+    search.generate(["frail", "weak", "sarcopenia"], ["index", "tool"])
+    assert (search.formatted, search.reused) == (3, 3)
+
+
+# random add, remove and reorder edits on both lists
+@pytest.mark.parametrize("seed", range(20))
+def test_random_edits_match_a_fresh_generation(seed):
+    rng = random.Random(seed)
+    vocabulary = [f"term{number}" for number in range(12)] + ["a b", "c*", "épuisé"]
+    topic1_terms = rng.sample(vocabulary, 4)
+    topic2_terms = rng.sample(vocabulary, 4)
+    search = incremental.IncrementalSearch("intersection", field="tiab")
+    for _ in range(15):
+        terms = rng.choice([topic1_terms, topic2_terms])
+        edit = rng.choice(["add", "remove", "shuffle"])
+        if edit == "add":
+            terms.insert(rng.randrange(len(terms) + 1), rng.choice(vocabulary))
+        elif edit == "remove" and terms:
+            terms.pop(rng.randrange(len(terms)))
+        else:
+            rng.shuffle(terms)
+        assert search.generate(topic1_terms, topic2_terms) == pairwise.generate(
+            "intersection", topic1_terms, topic2_terms, field="tiab"
+        )
@@ -0,0 +1,35 @@
+import instrumentation
+
+
+def test_finish_marks_the_trace_finished():
+    trace = instrumentation.Trace(True)
+    with trace.span("generate", mode="proximity"):
+        pass
+    assert not trace.finished
+    root = trace.finish()
+    assert trace.finished
+    assert root.name == "script run"
+    assert [span.parent_id for span in trace.spans] == [trace.root_id, ""]
+
+
+# a fragment rerun starts its own trace rather than adding to the finished run's
+def test_fragment_trace_is_separate_from_the_run():
+    run = instrumentation.Trace(True)
+    run.finish()
+    fragment = instrumentation.Trace(run.enabled, "fragment run", fragment="show_translations")
+    with fragment.span("generate"):
+        pass
+    root = fragment.finish()
+    assert fragment.trace_id != run.trace_id
+    assert len(run.spans) == 1
+    assert root.attributes == {"fragment": "show_translations"}
+    assert fragment.spans[0].parent_id == fragment.root_id
+
+
+def test_disabled_trace_records_nothing():
+    trace = instrumentation.Trace()
+    with trace.span("generate") as attributes:
+        attributes["pairs"] = 4
+    assert trace.finish() is None
+    assert trace.finished
+    assert trace.spans == []
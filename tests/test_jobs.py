@@ -0,0 +1,53 @@
+import os
+
+import pytest
+
+import export
+import jobs
+
+PARTS = [export.Part("proximity", ["frail*", "weak"], ["scale", "index"], {"field": "tiab", "distance": 2})]
+
+
+@pytest.fixture
+def generation_jobs():
+    generation_jobs = jobs.GenerationJobs(1)
+    yield generation_jobs
+    generation_jobs.shutdown()
+
+
+# no workers, so submitted jobs stay queued
+@pytest.fixture
+def idle_jobs(generation_jobs):
+    generation_jobs.workers = 0
+    return generation_jobs
+
+
+def test_cancel_leaves_a_job_other_sessions_wait_on(idle_jobs):
+    job = idle_jobs.submit("key", PARTS, export.search_estimate(PARTS), "first")
+    assert idle_jobs.submit("key", PARTS, export.search_estimate(PARTS), "second") is job
+    idle_jobs.cancel(job, "first")
+    assert job.state == jobs.QUEUED
+    # a rerun of the same session does not count as another waiter
+    idle_jobs.submit("key", PARTS, export.search_estimate(PARTS), "second")
+    idle_jobs.cancel(job, "second")
+    assert job.state == jobs.CANCELLED
+    assert idle_jobs.submit("key", PARTS, export.search_estimate(PARTS), "first") is not job
+
+
+def test_uncollected_jobs_expire(generation_jobs, monkeypatch):
+    job = generation_jobs.submit("key", PARTS, export.search_estimate(PARTS), "first")
+    assert job.wait(60)
+    assert job.state == jobs.DONE
+    assert os.path.exists(job.path)
+    monkeypatch.setattr(jobs, "JOB_EXPIRY", -1)
+    generation_jobs.workers = 0
+    generation_jobs.submit("other", PARTS, export.search_estimate(PARTS), "first")
+    assert not os.path.exists(job.path)
+    assert generation_jobs.submit("key", PARTS, export.search_estimate(PARTS), "first") is not job
+
+
+def test_collected_result_matches_generation(generation_jobs):
+    job = generation_jobs.submit("key", PARTS, export.search_estimate(PARTS), "first")
+    assert job.wait(60)
+    assert generation_jobs.collect(job).search_string == export.generate(PARTS).search_string
+    assert not os.path.exists(job.path)
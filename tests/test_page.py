@@ -0,0 +1,106 @@
+from pathlib import Path
+
+import pytest
+
+import export
+import pairwise
+
+AppTest = pytest.importorskip("streamlit.testing.v1").AppTest
+
+PAGE = str(Path(__file__).resolve().parent.parent / "pairwise-pubmed.py")
+
+
+def link_urls(at):
+    return {button.proto.label: button.proto.url for button in at.get("link_button")}
+
+
+# the union's launch link used to be encoded without Topic 3, and was cached under the
+# intersection's key, so the intersection's own link lost it too
+def test_union_and_intersection_launch_links_keep_topic_3():
+    at = AppTest.from_file(PAGE, default_timeout=120).run()
+    for key in ("mesh_sh", "intersection_kw"):
+        at.checkbox(key=key).check()
+    at.run()
+    topic1_terms = [f"frailty term {n}" for n in range(20)]
+    topic2_terms = [f"scale {n}" for n in range(10)]
+    at.text_area(key="intersection topic 1").input("\n".join(topic1_terms))
+    at.text_area(key="intersection topic 2").input("\n".join(topic2_terms))
+    at.text_area(key="intersection topic 3").input("aged")
+    at.text_area(key="mesh").input("Frailty")
+    at.text_area(key="subheadings").input("diagnosis")
+    at.button(key="generate_search_strings_button").click().run()
+    # the union's link is built first, so it fills the shared encoding cache
+    at.toggle(key="mesh_intersection_launch").set_value(True).run()
+    at.toggle(key="intersection_launch").set_value(True).run()
+    assert not at.exception
+
+    urls = link_urls(at)
+    intersection_url = urls["Search PubMed with pairwise keyword intersection search string"]
+    union_url = urls["Search PubMed with union of pairwise MeSH/intersection search strings"]
+    field = at.selectbox(key="sf").value
+    intersection_search = export.generate(
+        [export.Part("intersection", topic1_terms, topic2_terms, {"field": field}, (["aged"],))]
+    ).search_string
+    assert intersection_url == pairwise.search_url(intersection_search)
+    assert union_url.endswith(pairwise.url_encode(pairwise.SEPARATOR + intersection_search))
+
+
+def test_importing_a_three_list_search_fills_topic_3():
+    search = pairwise.generate_union(
+        pairwise.generate("mesh", ["Frailty"], ["diagnosis"], ["Aged"]),
+        pairwise.generate("intersection", ["frail*"], ["scale", "index"], ["aged", "elderly"], field="tiab"),
+    ).search_string
+    at = AppTest.from_file(PAGE, default_timeout=120).run()
+    at.text_area(key="imported_search").input(str(search))
+    at.button(key="import_search_button").click().run()
+    assert not at.exception
+    assert at.session_state["mesh topic 3"] == "Aged"
+    assert at.session_state["intersection topic 1"] == "frail*"
+    assert at.session_state["intersection topic 3"] == "aged\nelderly"
+    assert at.session_state["sf"] == "tiab"
+
+
+# fragments called during a traced script run add their spans to that run's trace
+def test_debug_run_traces_fragments():
+    at = AppTest.from_file(PAGE, default_timeout=120)
+    at.query_params["debug"] = "1"
+    at.run()
+    at.checkbox(key="intersection_kw").check().run()
+    at.text_area(key="intersection topic 1").input("\n".join(f"frailty term {n}" for n in range(200)))
+    at.text_area(key="intersection topic 2").input("\n".join(f"scale {n}" for n in range(50)))
+    at.button(key="generate_search_strings_button").click().run()
+    assert not at.exception
+    assert any("script run" in expander.label for expander in at.expander)
+
+
+# Topic 3 headings are checked against MeSH like the pair's headings, and keep the noexp
+# setting when the tree plan explodes the heading they are paired with
+def test_mesh_topic_3_is_checked_against_the_vocabulary(tmp_path, monkeypatch):
+    from test_vocabulary import descriptor_xml
+
+    xml_path = tmp_path / "desc.xml"
+    xml_path.write_text(
+        "<DescriptorRecordSet>"
+        + descriptor_xml("D005221", "Fatigue", ["C23.888.369"], ["epidemiology"])
+        + descriptor_xml("D000073496", "Frailty", ["C23.888.369.500"], ["epidemiology"])
+        + descriptor_xml("D000368", "Aged", ["M01.060.116.100"], ["epidemiology"], ["Elderly"])
+        + "</DescriptorRecordSet>",
+        encoding="utf-8",
+    )
+    monkeypatch.setenv("PPSG_MESH_XML", str(xml_path))
+    at = AppTest.from_file(PAGE, default_timeout=120).run()
+    at.checkbox(key="mesh_sh").check().run()
+    at.text_area(key="mesh").input("Fatigue\nFrailty")
+    at.text_area(key="subheadings").input("epidemiology")
+    at.text_area(key="mesh topic 3").input("Elderly\nNonsense")
+    at.checkbox(key="noexp").check()
+    at.button(key="generate_search_strings_button").click().run()
+    assert not at.exception
+
+    expected = export.generate(
+        [export.Part("mesh", ["Fatigue"], ["epidemiology"], {"noexp": False, "more_noexp": True}, (["Aged"],))]
+    ).search_string
+    assert expected == "(Fatigue/epidemiology[mh] AND Aged[mh:noexp])"
+    assert expected in [code.value for code in at.code]
+    check = next(expander for expander in at.expander if expander.label.startswith("MeSH check"))
+    assert "1 entry terms replaced" in check.label and "1 terms not found" in check.label
@@ -0,0 +1,29 @@
+import pytest
+
+import pairwise
+
+ROPE_TEXTS = [["frail* AND scale", " OR ", "weak AND index"], ["ab", "c"], []]
+
+
+@pytest.mark.parametrize("pieces", ROPE_TEXTS)
+@pytest.mark.parametrize("sub", ["", "a", " OR ", "e AND i", "missing"])
+@pytest.mark.parametrize("start", [0, 3, -2, 40])
+def test_search_rope_find_matches_str(pieces, sub, start):
+    rope = pairwise.SearchRope(pieces)
+    assert rope.find(sub, start) == str(rope).find(sub, start)
+
+
+@pytest.mark.parametrize("pieces", ROPE_TEXTS)
+@pytest.mark.parametrize("sub", ["", "a", " OR "])
+def test_search_rope_count_matches_str(pieces, sub):
+    rope = pairwise.SearchRope(pieces)
+    assert rope.count(sub) == str(rope).count(sub)
+
+
+def test_url_length_matches_search_url():
+    generated = pairwise.generate_union(
+        pairwise.generate("proximity", ["frail*", "épuisé"], ["scale"], field="tiab", distance=2),
+        pairwise.generate("intersection", ['"activities of daily living"'], ["index/score"], field="tw"),
+    )
+    for query in (generated.search_string, str(generated.search_string), ""):
+        assert pairwise.url_length(query) == len(pairwise.search_url(query))
@@ -0,0 +1,85 @@
+import pytest
+
+import export
+import pairwise
+import parsing
+
+
+def read_back(search):
+    return [
+        (section.mode, [section.topic1_terms, section.topic2_terms, *section.more_terms], section.options, section.complete)
+        for section in parsing.parse(search).sections
+    ]
+
+
+@pytest.mark.parametrize(
+    "term_lists",
+    [
+        [["a*", "b"], ["c", "d", "e"]],
+        [["a*", "b"], ["c", "d", "e"], ["aged", "elderly"]],
+        [["a"], ["b", "c"], ["d"], ["e", "f", "g"]],
+    ],
+)
+def test_intersection_round_trip(term_lists):
+    search = pairwise.generate("intersection", *term_lists, field="tw").search_string
+    assert read_back(search) == [("intersection", term_lists, {"field": "tw"}, True)]
+
+
+def test_mesh_with_more_headings_round_trip():
+    term_lists = [["Aged", "Frailty"], ["epidemiology", "diagnosis"], ["Humans", "Mice"]]
+    search = pairwise.generate("mesh", *term_lists, majr=True, noexp=True).search_string
+    assert read_back(search) == [("mesh", term_lists, {"majr": True, "noexp": True}, True)]
+
+
+
+@pytest.mark.parametrize("noexp", [True, False])
+def test_mesh_with_more_headings_searched_differently_round_trip(noexp):
+    term_lists = [["Fatigue"], ["epidemiology"], ["Aged"]]
+    options = {"majr": False, "noexp": noexp, "more_noexp": not noexp}
+    search = pairwise.generate("mesh", *term_lists, **options).search_string
+    assert search.count("[mh:noexp]") == 1
+    assert read_back(search) == [("mesh", term_lists, options, True)]
+
+# used to be read as an intersection searched in [mh] with the term "Aged/epidemiology"
+def test_mesh_pair_with_one_more_heading_is_not_an_intersection():
+    assert read_back("(Aged/epidemiology[mh] AND Humans[mh])") == [
+        ("mesh", [["Aged"], ["epidemiology"], ["Humans"]], {"majr": False, "noexp": False}, True)
+    ]
+
+
+# quoted phrases used to be rejected at their opening quote
+def test_quoted_terms_and_wildcards_round_trip():
+    term_lists = [['"muscle weakness"', "frail*"], ['"grip strength"*', "scale"]]
+    search = pairwise.generate("intersection", *term_lists, field="tiab").search_string
+    parsed = parsing.parse(search)
+    assert read_back(search) == [("intersection", term_lists, {"field": "tiab"}, True)]
+    assert parsed.wildcards == search.count("*") == 4
+
+
+def test_factored_round_trip_with_quoted_terms_and_more_lists():
+    term_lists = [['"muscle weakness"', "frail*"], ["scale"], ["aged", '"older adult"*']]
+    search = pairwise.generate_factored_intersection(*term_lists, field="tw").search_string
+    assert read_back(search) == [(export.FACTORED, term_lists, {"field": "tw"}, True)]
+
+
+def test_two_and_three_list_sections_are_read_separately():
+    two = pairwise.generate("intersection", ["a"], ["b", "c"], field="tw").search_string
+    three = pairwise.generate("intersection", ["a"], ["b"], ["d", "e"], field="tw").search_string
+    assert read_back(two + pairwise.SEPARATOR + three) == [
+        ("intersection", [["a"], ["b", "c"]], {"field": "tw"}, True),
+        ("intersection", [["a"], ["b"], ["d", "e"]], {"field": "tw"}, True),
+    ]
+
+
+def test_a_three_list_section_with_a_missing_clause_is_incomplete():
+    clauses = list(pairwise.clauses("intersection", ["a", "b"], ["c", "d"], ["e", "f"], field="tw"))
+    del clauses[5]
+    (section,) = parsing.parse(pairwise.SEPARATOR.join(clauses)).sections
+    assert not section.complete
+    assert [section.topic1_terms, section.topic2_terms, *section.more_terms] == [["a", "b"], ["c", "d"], ["e", "f"]]
+
+
+def test_unbalanced_quote_is_reported_with_its_position():
+    with pytest.raises(parsing.ParseError) as error:
+        parsing.parse('("muscle weakness[tw] AND scale[tw])')
+    assert error.value.position == 1
@@ -0,0 +1,98 @@
+import gzip
+
+import pytest
+
+import profiling
+
+ARTICLES = [
+    # (pmid, title, abstract, affiliation, MeSH headings as (descriptor, qualifier, major))
+    ("1", "Frailty scale in older adults", "A new frailty index was validated.", "", [("Frailty", "diagnosis", "Y")]),
+    ("2", "Muscle weakness and <i>gait</i>", "Weakness of grip measured by a simple scale.", "Dept of Geriatrics, Oslo", []),
+    ("3", "Frail elderly outcomes", "We used the frailty scale.", "", [("Aged", "", "N")]),
+    ("4", "Cardiology registry", "Outcomes of a national registry.", "", []),
+]
+
+
+def article_xml(pmid, title, abstract, affiliation, headings):
+    mesh = "".join(
+        f'<MeshHeading><DescriptorName MajorTopicYN="N">{descriptor}</DescriptorName>'
+        + (f'<QualifierName MajorTopicYN="{major}">{qualifier}</QualifierName>' if qualifier else "")
+        + "</MeshHeading>"
+        for descriptor, qualifier, major in headings
+    )
+    return (
+        f"<PubmedArticle><MedlineCitation><PMID>{pmid}</PMID><Article><ArticleTitle>{title}</ArticleTitle>"
+        f"<Abstract><AbstractText>{abstract}</AbstractText></Abstract>"
+        f"<AuthorList><Author><AffiliationInfo><Affiliation>{affiliation}</Affiliation></AffiliationInfo></Author></AuthorList>"
+        f"</Article><MeshHeadingList>{mesh}</MeshHeadingList></MedlineCitation></PubmedArticle>"
+    )
+
+
+# a gzipped baseline sample, as PubMed ships them
+@pytest.fixture
+def index(tmp_path):
+    path = tmp_path / "pubmed-sample.xml.gz"
+    with gzip.open(path, "wt", encoding="utf-8") as fp:
+        fp.write("<PubmedArticleSet>" + "".join(article_xml(*article) for article in ARTICLES) + "</PubmedArticleSet>")
+    return profiling.LocalIndex.from_xml(path)
+
+
+# counts are cached per backend name, so each test counts against its own
+def profile(index, request, mode, topic1_terms, topic2_terms, **options):
+    return profiling.run_profile(mode, topic1_terms, topic2_terms, index, request.node.name, **options)
+
+
+def test_the_sample_is_indexed(index):
+    assert index.documents == 4
+
+
+def test_proximity_counts_per_pair(index, request):
+    result = profile(index, request, "proximity", ["frailty", "weakness"], ["scale", "index"], field="tiab", distance=0)
+    assert result.counts == [2, 1, 0, 0]
+    assert result.count(0, 1) == 1
+    assert result.zero_pairs == 2
+    assert list(result.productive_clauses()) == ['"frailty scale"[tiab:~0]', '"frailty index"[tiab:~0]']
+
+
+# six words come between weakness and scale in the abstract of article 2
+@pytest.mark.parametrize("distance, expected", [(5, 0), (6, 1), (9, 1)])
+def test_proximity_distance_counts_the_words_between(index, distance, expected):
+    assert index.count(f'"weakness scale"[tiab:~{distance}]') == expected
+    assert index.count(f'"scale weakness"[tiab:~{distance}]') == expected
+
+
+def test_intersection_counts_per_pair_and_drops_zero_yield_pairs(index, request):
+    result = profile(index, request, "intersection", ["frail*", "weakness"], ["scale", "gait"], field="tiab")
+    assert result.counts == [2, 0, 1, 1]
+    assert list(result.productive_clauses()) == [
+        "(frail*[tiab] AND scale[tiab])",
+        "(weakness[tiab] AND scale[tiab])",
+        "(weakness[tiab] AND gait[tiab])",
+    ]
+
+
+def test_fields_restrict_where_words_are_matched(index):
+    assert index.count("(frail*[ti] AND scale[ti])") == 1
+    # [tw] includes MeSH headings
+    assert index.count("(frail*[tw] AND aged[tw])") == 1
+    assert index.count("(frail*[tiab] AND aged[tiab])") == 0
+    assert index.count("(weakness[ad] AND oslo[ad])") == 0
+    assert index.count('"geriatrics oslo"[ad:~0]') == 1
+
+
+def test_phrases_must_be_consecutive(index):
+    assert index.count('(frailty scale[tiab] AND outcomes[tiab])') == 1
+    assert index.count('(scale frailty[tiab] AND outcomes[tiab])') == 0
+    assert index.count('(frail elderly[tiab] AND outcomes[tiab])') == 1
+    assert index.count('(elderly frail[tiab] AND outcomes[tiab])') == 0
+
+
+def test_mesh_counts(index):
+    assert index.count("Frailty/diagnosis[mh]") == 1
+    assert index.count("Frailty/diagnosis[majr]") == 1
+    assert index.count("Frailty/epidemiology[mh]") == 0
+
+
+def test_unknown_clause_is_rejected(index):
+    with pytest.raises(ValueError, match="Cannot evaluate"):
+        index.count("frailty[tiab]")
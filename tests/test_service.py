@@ -0,0 +1,86 @@
+import asyncio
+import json
+
+import pytest
+
+import mock_eutils
+import service
+
+
+@pytest.mark.parametrize(
+    "mode, section, message",
+    [
+        ("proximity", {"topic1": ["a b"], "topic2": ["c"], "distance": -1}, "distance must be 0 or more"),
+        ("proximity", {"topic1": ["a"], "topic2": ["c"], "field": "tw"}, "field must be one of ti, tiab, ad"),
+        ("intersection", {"topic1": ["a"], "topic2": ["c"], "field": "tw] OR x[tw"}, "field must be one of"),
+        ("intersection", {"topic1": ["a"], "topic2": ["c"], "field": "ad"}, "field must be one of"),
+        ("intersection", {"topic1": [], "topic2": ["c"]}, "topic1 must have at least one term"),
+        ("mesh", {"topic1": ["Aged"], "topic2": ["", "  "]}, "topic2 must have at least one term"),
+        ("proximity", {"topic1": ["a"], "topic2": ["c"], "topic3": ["d"]}, "exactly two lists"),
+        ("proximity", {"topic1": ["a"], "topic2": ["c"], "distance": True}, "distance must be an integer"),
+    ],
+)
+def test_section_options_the_app_does_not_allow_are_rejected(mode, section, message):
+    with pytest.raises(service.RequestError) as error:
+        service.request_parts(mode, section)
+    assert error.value.status == 400
+    assert message in str(error.value)
+
+
+def test_valid_sections_are_accepted():
+    (part,) = service.request_parts("proximity", {"topic1": "a\nb", "topic2": ["c"], "field": "ad", "distance": 0})
+    assert (part.mode, part.topic1_terms, part.options) == ("proximity", ["a", "b"], {"field": "ad", "distance": 0})
+    (part,) = service.request_parts("intersection", {"topic1": ["a"], "topic2": ["c"], "topic3": ["d"], "field": "all"})
+    assert part.more_terms == (["d"],)
+
+
+def exchange(server_class, request):
+    async def run():
+        async with server_class() as server:
+            reader, writer = await asyncio.open_connection(server.host, server.port)
+            writer.write(request)
+            await writer.drain()
+            reply = await reader.read()
+            writer.close()
+            return reply
+
+    return asyncio.run(run())
+
+
+def status(reply):
+    return int(reply.split(b" ", 2)[1]) if reply else None
+
+
+BAD_REQUESTS = [
+    b"GARBAGE\r\n\r\n",
+    b"POST /estimate/proximity\r\n\r\n",
+    b"POST /estimate/proximity HTTP/1.1\r\nContent-Length: abc\r\n\r\n",
+    b"POST /estimate/proximity HTTP/1.1\r\nContent-Length: -5\r\n\r\n",
+]
+
+
+# these used to end the connection handler with an unhandled exception and no reply
+@pytest.mark.parametrize("request_bytes", BAD_REQUESTS)
+def test_malformed_requests_get_400(request_bytes):
+    reply = exchange(service.GenerationService, request_bytes)
+    assert status(reply) == 400
+    assert b"Malformed" in reply
+
+
+@pytest.mark.parametrize("request_bytes", BAD_REQUESTS[:2])
+def test_mock_eutils_answers_malformed_requests_with_400(request_bytes):
+    assert status(exchange(mock_eutils.MockESearchServer, request_bytes)) == 400
+
+
+def test_unexpected_errors_get_500(monkeypatch):
+    def fail(parts):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(service.export, "metrics", fail)
+    body = json.dumps({"topic1": ["a"], "topic2": ["b"]}).encode()
+    reply = exchange(
+        service.GenerationService,
+        b"POST /estimate/proximity HTTP/1.1\r\nContent-Length: %d\r\n\r\n%s" % (len(body), body),
+    )
+    assert status(reply) == 500
+    assert json.loads(reply.partition(b"\r\n\r\n")[2]) == {"error": "Internal error: RuntimeError"}
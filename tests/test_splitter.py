@@ -0,0 +1,65 @@
+import pytest
+
+import pairwise
+import splitter
+
+
+def clauses(size=60, truncate_every=2):
+    topic1 = [f"frail{number}*" if number % truncate_every == 0 else f"frail {number}" for number in range(size)]
+    topic2 = [f"scale{number}*" if number % 3 == 0 else f"índice {number}" for number in range(size)]
+    return list(pairwise.clauses("intersection", topic1, topic2, field="tw"))
+
+
+LIMITS = [
+    {},
+    {"wildcard_limit": 20},
+    {"url_budget": 1500},
+    {"query_budget": 700},
+    {"wildcard_limit": 30, "url_budget": 2000, "query_budget": 900},
+]
+
+
+@pytest.mark.parametrize("limits", LIMITS)
+def test_every_sub_query_is_within_the_limits(limits):
+    sub_queries = list(splitter.split(clauses(), **limits))
+    wildcard_limit = limits.get("wildcard_limit", splitter.WILDCARD_LIMIT)
+    url_budget = limits.get("url_budget", splitter.DEFAULT_URL_BUDGET)
+    query_budget = limits.get("query_budget", splitter.DEFAULT_QUERY_BUDGET)
+    assert len(sub_queries) > 1
+    for sub_query in sub_queries:
+        assert not sub_query.oversized
+        assert sub_query.query.count("*") == sub_query.wildcards <= wildcard_limit
+        assert len(sub_query.url) == sub_query.url_length <= url_budget
+        assert len(sub_query.query) <= query_budget
+
+
+# the first clause of each sub-query would not have fitted in the one before
+@pytest.mark.parametrize("limits", LIMITS)
+def test_sub_queries_are_filled_greedily(limits):
+    sub_queries = list(splitter.split(clauses(), **limits))
+    for before, after in zip(sub_queries, sub_queries[1:]):
+        grown = before.query + pairwise.SEPARATOR + after.query.split(pairwise.SEPARATOR)[0]
+        assert splitter.needs_split(len(grown), grown.count("*"), pairwise.url_length(grown), **limits)
+
+
+@pytest.mark.parametrize("limits", LIMITS)
+def test_sub_queries_give_back_the_clauses_in_order(limits):
+    generated = clauses()
+    sub_queries = list(splitter.split(iter(generated), **limits))
+    assert [sub_query.number for sub_query in sub_queries] == list(range(1, len(sub_queries) + 1))
+    assert sum(sub_query.pairs for sub_query in sub_queries) == len(generated)
+    rejoined = [clause for sub_query in sub_queries for clause in sub_query.query.split(pairwise.SEPARATOR)]
+    assert rejoined == generated
+
+
+def test_a_clause_over_budget_on_its_own_is_flagged():
+    (sub_query,) = splitter.split(iter(["(a*[tw] AND b*[tw])"]), wildcard_limit=1)
+    assert sub_query.oversized
+    assert sub_query.pairs == 1
+
+
+def test_history_query_ors_the_sub_query_numbers():
+    sub_queries = list(splitter.split(clauses(), wildcard_limit=20))
+    expected = " OR ".join(f"#{number}" for number in range(1, len(sub_queries) + 1))
+    assert splitter.history_query(sub_queries) == expected
+    assert splitter.history_query(sub_queries[:2]) == "#1 OR #2"
@@ -0,0 +1,61 @@
+import pytest
+
+import subsumption
+
+
+def removed(terms):
+    pruned = subsumption.prune(terms)
+    return pruned.terms, {removal.term: removal.covered_by for removal in pruned.removals}
+
+
+@pytest.mark.parametrize(
+    "terms, kept, covered",
+    [
+        # truncation
+        (["cardio*", "cardiology", "cardio"], ["cardio*"], {"cardiology": "cardio*", "cardio": "cardio*"}),
+        (["cardiology", "cardio*"], ["cardio*"], {"cardiology": "cardio*"}),
+        # case and repeated spaces do not matter to PubMed
+        (["Cardio*", "CARDIOLOGY", "frail  elderly", "frail*"], ["Cardio*", "frail*"],
+         {"CARDIOLOGY": "Cardio*", "frail  elderly": "frail*"}),
+        # phrases: a truncated word covers a phrase containing it, and truncated phrases
+        # cover phrases word by word
+        (["elder*", "frail elderly"], ["elder*"], {"frail elderly": "elder*"}),
+        (["musc* weak*", "muscle weakness", "hand muscle weakness"], ["musc* weak*"],
+         {"muscle weakness": "musc* weak*", "hand muscle weakness": "musc* weak*"}),
+        (["activities*", "activities of daily living"], ["activities*"],
+         {"activities of daily living": "activities*"}),
+        # removals are explained by a term that is kept
+        (["frail*", "frailt*", "frailty"], ["frail*"], {"frailt*": "frail*", "frailty": "frail*"}),
+        (["cardio*", "cardio*"], ["cardio*"], {"cardio*": "cardio*"}),
+    ],
+)
+def test_covered_terms_are_dropped(terms, kept, covered):
+    assert removed(terms) == (kept, covered)
+
+
+@pytest.mark.parametrize(
+    "terms",
+    [
+        # the truncated term is longer than, or differs from, the other term
+        ["cardio*", "cardiac", "card"],
+        # truncated words must match words in order, consecutively
+        ["musc* weak*", "muscle strength", "weakness of muscle", "muscle and weakness"],
+        # a truncated word must start the word, not sit inside it
+        ["elder*", "nonelderly", "the eldest"],
+        # untruncated terms never cover each other
+        ["frailty", "frailty index", "frail"],
+        # a wildcard inside a word is not truncation
+        ["elde*rly", "elderly"],
+        # a bare * is not a truncated prefix of anything
+        ["*", "a"],
+    ],
+)
+def test_terms_that_are_not_covered_are_kept(terms):
+    pruned = subsumption.prune(terms)
+    assert pruned.terms == terms
+    assert pruned.removals == []
+
+
+def test_removal_explanation():
+    (removal,) = subsumption.prune(["cardio*", "cardiology"]).removals
+    assert removal.explanation == "cardiology is already matched by cardio*"
@@ -0,0 +1,90 @@
+import pytest
+
+import vocabulary
+
+QUALIFIERS = {"diagnosis": ("Q000175", "DI"), "epidemiology": ("Q000453", "EP"), "blood": ("Q000097", "BL")}
+
+
+def descriptor_xml(ui, name, tree_numbers, subheadings, entry_terms=()):
+    allowed = "".join(
+        f"<AllowableQualifier><QualifierReferredTo><QualifierUI>{QUALIFIERS[subheading][0]}</QualifierUI>"
+        f"<QualifierName><String>{subheading}</String></QualifierName></QualifierReferredTo>"
+        f"<Abbreviation>{QUALIFIERS[subheading][1]}</Abbreviation></AllowableQualifier>"
+        for subheading in subheadings
+    )
+    trees = "".join(f"<TreeNumber>{tree_number}</TreeNumber>" for tree_number in tree_numbers)
+    terms = "".join(f"<Term><String>{term}</String></Term>" for term in (name, *entry_terms))
+    return (
+        f"<DescriptorRecord><DescriptorUI>{ui}</DescriptorUI><DescriptorName><String>{name}</String></DescriptorName>"
+        f"<AllowableQualifiersList>{allowed}</AllowableQualifiersList><TreeNumberList>{trees}</TreeNumberList>"
+        f"<ConceptList><Concept><TermList>{terms}</TermList></Concept></ConceptList></DescriptorRecord>"
+    )
+
+
+@pytest.fixture
+def index(tmp_path):
+    xml_path = tmp_path / "desc.xml"
+    xml_path.write_text(
+        "<DescriptorRecordSet>"
+        + descriptor_xml("D005221", "Fatigue", ["C23.888.369"], ["diagnosis", "epidemiology"])
+        + descriptor_xml("D000073496", "Frailty", ["C23.888.369.500"], ["epidemiology", "blood"], ["Frailties"])
+        + descriptor_xml("D000368", "Aged", ["M01.060.116.100"], ["epidemiology"], ["Elderly"])
+        + "</DescriptorRecordSet>",
+        encoding="utf-8",
+    )
+    mesh = vocabulary.load(str(xml_path))
+    yield mesh
+    mesh.close()
+
+
+def pairs(checked):
+    return {
+        (heading, subheading) for headings, subheadings, _ in checked.groups
+        for heading in headings for subheading in subheadings
+    }
+
+
+# Fatigue[mh] explodes to Frailty, but Fatigue/blood is not allowed, so Frailty/blood must
+# still be searched; the plan used to drop Frailty as covered and lose it
+def test_plan_keeps_pairs_the_exploded_heading_does_not_allow(index):
+    headings = ["Fatigue", "Frailty"]
+    subheadings = ["diagnosis", "blood", "epidemiology"]
+    unplanned = pairs(vocabulary.check_pairs(index, headings, subheadings))
+    plan = vocabulary.plan_explosion(index, headings, subheadings=subheadings)
+    checked = vocabulary.check_pairs(index, plan.headings, subheadings, plan.noexp, plan.omitted)
+    planned = pairs(checked)
+
+    assert ("Frailty", "blood") in unplanned
+    assert planned == {("Fatigue", "diagnosis"), ("Fatigue", "epidemiology"), ("Frailty", "blood")}
+    assert checked.pairs == len(planned)
+    assert plan.covered == []
+    assert plan.omitted == [("Frailty", "epidemiology", "Fatigue")]
+
+
+def test_plan_drops_a_heading_whose_subheadings_are_all_covered(index):
+    plan = vocabulary.plan_explosion(index, ["Fatigue", "Frailty"], subheadings=["epidemiology"])
+    assert plan.headings == ["Fatigue"]
+    assert plan.covered == [("Frailty", "Fatigue")]
+    assert plan.omitted == []
+
+
+def test_plan_without_subheadings_drops_narrower_headings(index):
+    plan = vocabulary.plan_explosion(index, ["Fatigue", "Frailty"])
+    assert plan.headings == ["Fatigue"]
+    assert plan.covered == [("Frailty", "Fatigue")]
+
+
+def test_check_headings_replaces_entry_terms_and_reports_unknown_ones(index):
+    checked = vocabulary.check_headings(index, ["Elderly", "aged", "Frailty", "Nonsense"])
+    assert checked.headings == ["Aged", "Frailty"]
+    assert checked.replaced == [("Elderly", "Aged")]
+    assert checked.unknown == ["Nonsense"]
+
+
+# "/diagnosis" used to be written as Fatigue//diagnosis[mh], and DI beside diagnosis
+# repeated every pair
+def test_check_pairs_writes_each_subheading_once_by_its_name(index):
+    checked = vocabulary.check_pairs(index, ["Fatigue"], ["/diagnosis", "DI", "epidemiology"])
+    assert checked.groups == [(["Fatigue"], ["diagnosis", "epidemiology"], False)]
+    assert checked.replaced == [("/diagnosis", "diagnosis"), ("DI", "diagnosis")]
+    assert checked.pairs == 2
@@ -0,0 +1,575 @@
+"""Local MeSH vocabulary index for checking heading/subheading pairs.
+
+compile_index() reads NLM's descriptor XML (desc2025.xml, optionally gzipped,
+from https://www.nlm.nih.gov/databases/download/mesh.html) once and writes a
+compact binary index next to it; load() memory-maps that index on later runs
+and only rebuilds it when the XML changes. The index holds every descriptor's
+preferred name, tree numbers and allowable qualifiers, and an open-addressing
+hash table of preferred names and entry terms, so looking up a heading and
+checking one of its subheadings are both O(1) without loading the vocabulary
+into Python objects. Build the index ahead of time (e.g. in a container image)
+with:
+
+    python vocabulary.py desc2025.xml
+
+Index layout (little-endian): a header, the qualifier table, the descriptor
+table, each descriptor's tree number indexes, the tree numbers sorted as
+strings with their descriptor, the hash slots, then the UTF-8 string pool that
+every table points into. Because the tree numbers are sorted, everything under
+C23.888 is the run of entries between C23.888 and C23.888/ ("/" sorts right
+after "."), found by binary search; plan_explosion() uses this to pick between
+exploded and unexploded headings.
+"""
+
+import argparse
+import bisect
+import gzip
+import mmap
+import os
+import struct
+import time
+import xml.etree.ElementTree as ElementTree
+import zlib
+from typing import NamedTuple
+
+MAGIC = b"PPSGMESH"
+VERSION = 1
+# magic, version, source size, source mtime, qualifiers, descriptors, descriptor trees, trees, slots
+HEADER = struct.Struct("<8sIQQIIIII")
+# name offset and length, ui offset and length, abbreviation
+QUALIFIER = struct.Struct("<IHIH2s")
+# name offset and length, ui offset and length, allowable qualifier bitmask, first tree, tree count
+DESCRIPTOR = struct.Struct("<IHIH16sIH")
+DESCRIPTOR_TREE = struct.Struct("<I")
+# tree number offset and length, descriptor
+TREE = struct.Struct("<IHI")
+# key offset and length, descriptor + 1 (0 for an empty slot)
+SLOT = struct.Struct("<IHI")
+MAX_QUALIFIERS = 128
+
+
+# the sorted tree number table as a sequence of strings, for bisect
+class _TreeNumbers:
+    def __init__(self, index):
+        self.index = index
+
+    def __len__(self):
+        return self.index.tree_count
+
+    def __getitem__(self, position):
+        return self.index.tree(position)[0]
+
+
+class Descriptor(NamedTuple):
+    ui: str
+    name: str
+    tree_numbers: tuple
+    qualifiers: tuple
+
+
+# PubMed ignores case and repeated spaces in MeSH terms
+def term_key(term):
+    return " ".join(term.split()).casefold()
+
+
+def _open_xml(path):
+    return gzip.open(path, "rb") if str(path).endswith(".gz") else open(path, "rb")
+
+
+def _text(element, path):
+    found = element.find(path)
+    return found.text.strip() if found is not None and found.text else ""
+
+
+# (ui, name, tree numbers, [(qualifier ui, name, abbreviation)], entry terms) per descriptor
+def read_descriptors(xml_path):
+    with _open_xml(xml_path) as source:
+        for _, element in ElementTree.iterparse(source, events=("end",)):
+            if element.tag != "DescriptorRecord":
+                continue
+            qualifiers = [
+                (
+                    _text(allowed, "QualifierReferredTo/QualifierUI"),
+                    _text(allowed, "QualifierReferredTo/QualifierName/String"),
+                    _text(allowed, "Abbreviation"),
+                )
+                for allowed in element.iterfind("AllowableQualifiersList/AllowableQualifier")
+            ]
+            yield (
+                _text(element, "DescriptorUI"),
+                _text(element, "DescriptorName/String"),
+                [tree.text.strip() for tree in element.iterfind("TreeNumberList/TreeNumber") if tree.text],
+                qualifiers,
+                [term.text.strip() for term in element.iterfind("ConceptList/Concept/TermList/Term/String") if term.text],
+            )
+            element.clear()
+
+
+def _slot(key_bytes, slot_count):
+    return zlib.crc32(key_bytes) & (slot_count - 1)
+
+
+# write the binary index for a descriptor XML file, returning the number of descriptors
+def compile_index(xml_path, index_path):
+    strings = bytearray()
+    offsets = {}
+
+    def intern(text):
+        data = text.encode("utf-8")
+        if data not in offsets:
+            if len(data) > 0xFFFF:
+                raise ValueError(f"MeSH string too long for the index: {text[:40]!r}...")
+            offsets[data] = len(strings)
+            strings.extend(data)
+        return offsets[data], len(data)
+
+    qualifier_numbers = {}
+    qualifiers = []
+    descriptors = []
+    descriptor_trees = []
+    trees = []
+    keys = {}
+    for ui, name, tree_numbers, allowed, entry_terms in read_descriptors(xml_path):
+        number = len(descriptors)
+        mask = 0
+        for qualifier_ui, qualifier_name, abbreviation in allowed:
+            if qualifier_ui not in qualifier_numbers:
+                if len(qualifiers) == MAX_QUALIFIERS:
+                    raise ValueError(f"More than {MAX_QUALIFIERS} MeSH qualifiers")
+                qualifier_numbers[qualifier_ui] = len(qualifiers)
+                qualifiers.append(
+                    QUALIFIER.pack(*intern(qualifier_name), *intern(qualifier_ui), abbreviation.encode("ascii")[:2])
+                )
+            mask |= 1 << qualifier_numbers[qualifier_ui]
+        descriptors.append(
+            (*intern(name), *intern(ui), mask.to_bytes(16, "little"), len(descriptor_trees), len(tree_numbers))
+        )
+        for tree_number in tree_numbers:
+            descriptor_trees.append(len(trees))
+            trees.append((tree_number, number))
+        # preferred names win over another descriptor's entry term
+        keys[term_key(name).encode("utf-8")] = number
+        for term in entry_terms:
+            keys.setdefault(term_key(term).encode("utf-8"), number)
+
+    # descriptor_trees point into the sorted tree table
+    order = sorted(range(len(trees)), key=lambda position: trees[position][0])
+    sorted_position = [0] * len(trees)
+    for position, original in enumerate(order):
+        sorted_position[original] = position
+
+    slot_count = 1
+    while slot_count < len(keys) * 2:
+        slot_count *= 2
+    slots = [None] * slot_count
+    for key_bytes, number in keys.items():
+        slot = _slot(key_bytes, slot_count)
+        while slots[slot] is not None:
+            slot = (slot + 1) & (slot_count - 1)
+        slots[slot] = (*intern(key_bytes.decode("utf-8")), number + 1)
+
+    source = os.stat(xml_path)
+    temporary = f"{index_path}.tmp"
+    with open(temporary, "wb") as fp:
+        fp.write(
+            HEADER.pack(
+                MAGIC,
+                VERSION,
+                source.st_size,
+                source.st_mtime_ns,
+                len(qualifiers),
+                len(descriptors),
+                len(descriptor_trees),
+                len(trees),
+                slot_count,
+            )
+        )
+        fp.writelines(qualifiers)
+        fp.writelines(DESCRIPTOR.pack(*descriptor) for descriptor in descriptors)
+        fp.writelines(DESCRIPTOR_TREE.pack(sorted_position[tree]) for tree in descriptor_trees)
+        fp.writelines(TREE.pack(*intern(trees[original][0]), trees[original][1]) for original in order)
+        fp.writelines(SLOT.pack(*(slot or (0, 0, 0))) for slot in slots)
+        fp.write(strings)
+    os.replace(temporary, index_path)
+    return len(descriptors)
+
+
+class MeshIndex:
+    def __init__(self, path):
+        with open(path, "rb") as fp:
+            self._map = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        (
+            magic,
+            version,
+            self.source_size,
+            self.source_mtime,
+            qualifier_count,
+            self.descriptor_count,
+            descriptor_tree_count,
+            self.tree_count,
+            self.slot_count,
+        ) = HEADER.unpack_from(self._map)
+        if magic != MAGIC or version != VERSION:
+            self._map.close()
+            raise ValueError(f"{path} is not a version {VERSION} MeSH index")
+        self._qualifiers_at = HEADER.size
+        self._descriptors_at = self._qualifiers_at + qualifier_count * QUALIFIER.size
+        self._descriptor_trees_at = self._descriptors_at + self.descriptor_count * DESCRIPTOR.size
+        self._trees_at = self._descriptor_trees_at + descriptor_tree_count * DESCRIPTOR_TREE.size
+        self._slots_at = self._trees_at + self.tree_count * TREE.size
+        self._strings_at = self._slots_at + self.slot_count * SLOT.size
+        self._tree_numbers = _TreeNumbers(self)
+        # narrower and children results, per descriptor
+        self._narrower = {}
+        self._children = {}
+        # the few qualifiers are looked up by name and abbreviation in a dict
+        self.qualifiers = []
+        self._qualifier_numbers = {}
+        for number in range(qualifier_count):
+            name_at, name_length, ui_at, ui_length, abbreviation = QUALIFIER.unpack_from(
+                self._map, self._qualifiers_at + number * QUALIFIER.size
+            )
+            name = self._string(name_at, name_length)
+            self.qualifiers.append(name)
+            self._qualifier_numbers[term_key(name)] = number
+            if abbreviation.strip(b"\0"):
+                self._qualifier_numbers[abbreviation.decode("ascii").casefold()] = number
+
+    def __len__(self):
+        return self.descriptor_count
+
+    def close(self):
+        self._map.close()
+
+    def _string(self, offset, length):
+        start = self._strings_at + offset
+        return self._map[start:start + length].decode("utf-8")
+
+    def _descriptor_record(self, number):
+        return DESCRIPTOR.unpack_from(self._map, self._descriptors_at + number * DESCRIPTOR.size)
+
+    # the descriptor number for a preferred name or entry term, or None
+    def lookup(self, term):
+        key_bytes = term_key(term).encode("utf-8")
+        slot = _slot(key_bytes, self.slot_count)
+        while True:
+            key_at, key_length, number = SLOT.unpack_from(self._map, self._slots_at + slot * SLOT.size)
+            if not number:
+                return None
+            if key_length == len(key_bytes):
+                start = self._strings_at + key_at
+                if self._map[start:start + key_length] == key_bytes:
+                    return number - 1
+            slot = (slot + 1) & (self.slot_count - 1)
+
+    def name(self, number):
+        name_at, name_length, *_ = self._descriptor_record(number)
+        return self._string(name_at, name_length)
+
+    # qualifier number for a subheading name (e.g. diagnosis) or abbreviation (DI), or None
+    def qualifier(self, subheading):
+        return self._qualifier_numbers.get(term_key(subheading.lstrip("/")))
+
+    def allows(self, number, qualifier):
+        mask = self._descriptor_record(number)[4]
+        return bool(mask[qualifier // 8] >> (qualifier % 8) & 1)
+
+    def tree(self, position):
+        tree_at, tree_length, number = TREE.unpack_from(self._map, self._trees_at + position * TREE.size)
+        return self._string(tree_at, tree_length), number
+
+    # positions in the sorted tree number table of a descriptor's tree numbers
+    def tree_positions(self, number):
+        first, count = self._descriptor_record(number)[5:7]
+        return [
+            DESCRIPTOR_TREE.unpack_from(self._map, self._descriptor_trees_at + (first + item) * DESCRIPTOR_TREE.size)[0]
+            for item in range(count)
+        ]
+
+    # positions in the sorted tree number table below one of the descriptor's tree numbers
+    def _subtree_positions(self, number):
+        for position in self.tree_positions(number):
+            tree_number = self.tree(position)[0]
+            end = bisect.bisect_left(self._tree_numbers, tree_number + "/", position + 1)
+            yield tree_number, range(position + 1, end)
+
+    # every descriptor an exploded search for this one includes, itself excluded
+    def narrower(self, number):
+        found = self._narrower.get(number)
+        if found is None:
+            found = set()
+            for _, positions in self._subtree_positions(number):
+                found.update(self.tree(position)[1] for position in positions)
+            found.discard(number)
+            found = self._narrower[number] = frozenset(found)
+        return found
+
+    # descriptors one level down, in tree order
+    def children(self, number):
+        found = self._children.get(number)
+        if found is None:
+            found = []
+            for tree_number, positions in self._subtree_positions(number):
+                depth = tree_number.count(".") + 1
+                for position in positions:
+                    child_tree_number, child = self.tree(position)
+                    if child_tree_number.count(".") == depth and child not in found and child != number:
+                        found.append(child)
+            found = self._children[number] = tuple(found)
+        return found
+
+    def descriptor(self, number):
+        name_at, name_length, ui_at, ui_length, mask, _, _ = self._descriptor_record(number)
+        return Descriptor(
+            self._string(ui_at, ui_length),
+            self._string(name_at, name_length),
+            tuple(self.tree(position)[0] for position in self.tree_positions(number)),
+            tuple(
+                name
+                for qualifier, name in enumerate(self.qualifiers)
+                if mask[qualifier // 8] >> (qualifier % 8) & 1
+            ),
+        )
+
+
+# the index for a descriptor XML file, compiled on first use or when the XML has changed
+def load(xml_path, index_path=None):
+    index_path = index_path or f"{xml_path}.idx"
+    source = os.stat(xml_path)
+    if os.path.exists(index_path):
+        try:
+            index = MeshIndex(index_path)
+        except (ValueError, struct.error):
+            index = None
+        if index is not None:
+            if (index.source_size, index.source_mtime) == (source.st_size, source.st_mtime_ns):
+                return index
+            index.close()
+    compile_index(xml_path, index_path)
+    return MeshIndex(index_path)
+
+
+class Plan(NamedTuple):
+    headings: list
+    # whether each heading is searched unexploded
+    noexp: list
+    # (heading, exploded heading that already includes it with every subheading)
+    covered: list
+    # headings exploded because every heading under them is listed
+    exploded: list
+    # (heading, narrower headings it was written out as)
+    expanded: list
+    # (heading, subheading, exploded heading) for pairs of a kept heading that the exploded
+    # heading already finds with the same subheading; check_pairs leaves them out
+    omitted: list
+
+
+# the shortest list of exploded and unexploded headings that finds the same descriptors:
+# a heading under an exploded listed heading is dropped, and with noexp a heading whose
+# narrower headings are all listed is exploded in their place. Headings in expand are
+# written out as themselves unexploded plus each of their children exploded, which finds
+# the same records with the narrower headings spelled out. Unknown terms are kept for
+# check_pairs to report.
+#
+# With subheadings, an exploded heading only includes the narrower heading's pairs for
+# the subheadings it allows itself, so a narrower heading is dropped only when every
+# subheading it allows is covered; otherwise it is kept, and its covered pairs are listed
+# in Plan.omitted.
+def plan_explosion(index, headings, noexp=False, expand=(), subheadings=None):
+    numbers = [index.lookup(heading) for heading in headings]
+    listed = {number for number in numbers if number is not None}
+    if noexp:
+        exploding = {number for number in listed if index.narrower(number) and index.narrower(number) <= listed}
+    else:
+        exploding = listed
+    expand = {term_key(heading) for heading in expand}
+    expanding = {
+        number for heading, number in zip(headings, numbers)
+        if number in exploding and term_key(heading) in expand and index.children(number)
+    }
+    # the headings searched exploded: an expanded heading is searched through its children
+    searched = (exploding - expanding) | {child for number in expanding for child in index.children(number)}
+    covering = {}
+    for number in sorted(searched):
+        for narrower in index.narrower(number) & listed:
+            covering.setdefault(narrower, []).append(number)
+    if subheadings is None:
+        qualifiers = [(None, None)]
+    else:
+        qualifiers = [(subheading, index.qualifier(subheading)) for subheading in subheadings]
+        qualifiers = [(subheading, qualifier) for subheading, qualifier in qualifiers if qualifier is not None]
+
+    def allows(number, qualifier):
+        return qualifier is None or index.allows(number, qualifier)
+
+    found = {}
+
+    # the exploded heading that finds a listed heading's pairs with this subheading, if any
+    def found_by(number, qualifier):
+        if (number, qualifier) not in found:
+            found[number, qualifier] = None
+            for parent in covering.get(number, ()):
+                if allows(parent, qualifier) and (parent not in listed or found_by(parent, qualifier) is None):
+                    found[number, qualifier] = parent
+                    break
+        return found[number, qualifier]
+
+    planned = []
+    planned_noexp = []
+    covered = []
+    exploded = []
+    expanded = []
+    omitted = []
+    # where each descriptor is in the plan, so a listed heading that an expansion also
+    # writes out is only searched once, exploded
+    placed = {}
+    for heading, number in zip(headings, numbers):
+        if number in placed:
+            planned_noexp[placed[number]] = planned_noexp[placed[number]] and number not in searched
+            continue
+        if number in covering:
+            pairs = [
+                (subheading, found_by(number, qualifier))
+                for subheading, qualifier in qualifiers
+                if allows(number, qualifier)
+            ]
+            if all(parent is not None for _, parent in pairs):
+                parent = next((parent for _, parent in pairs), covering[number][0])
+                covered.append((heading, index.name(parent)))
+                continue
+            omitted.extend(
+                (heading, subheading, index.name(parent)) for subheading, parent in pairs if parent is not None
+            )
+        if number is not None:
+            placed[number] = len(planned)
+        if number is None or number not in exploding:
+            planned.append(heading)
+            planned_noexp.append(noexp)
+            continue
+        if noexp:
+            exploded.append(heading)
+        children = index.children(number) if number in expanding else ()
+        planned.append(heading)
+        planned_noexp.append(bool(children))
+        if children:
+            expanded.append((heading, [index.name(child) for child in children]))
+            for child in children:
+                if child in placed:
+                    planned_noexp[placed[child]] = False
+                    continue
+                placed[child] = len(planned)
+                planned.append(index.name(child))
+                planned_noexp.append(False)
+    return Plan(planned, planned_noexp, covered, exploded, expanded, omitted)
+
+
+class Checked(NamedTuple):
+    # runs of consecutive headings with the subheadings allowed for all of them, and
+    # whether they are searched unexploded
+    groups: list
+    # (entry term, preferred heading) for headings given as entry terms, and (abbreviation,
+    # name) for subheadings not given by their name
+    replaced: list
+    # headings and subheadings that are not in MeSH
+    unknown: list
+    # (heading, subheading) pairs whose subheading is not allowed for the heading
+    skipped: list
+
+    @property
+    def pairs(self):
+        return sum(len(headings) * len(subheadings) for headings, subheadings, _ in self.groups)
+
+
+# map entry terms to their preferred headings and subheadings such as DI or /diagnosis to
+# their names, each subheading once, and leave out pairs MeSH does not allow;
+# consecutive headings that allow the same subheadings stay in one group, so the
+# generated clauses keep their order and the usual case is a single group. noexp is
+# one setting for every heading or, from a Plan, one per heading; omitted is a Plan's
+# (heading, subheading, exploded heading) pairs, which are left out without a report.
+def check_pairs(index, headings, subheadings, noexp=False, omitted=()):
+    noexp = [noexp] * len(headings) if isinstance(noexp, bool) else list(noexp)
+    omitted = {(index.lookup(heading), index.qualifier(subheading)) for heading, subheading, _ in omitted}
+    qualifiers = {}
+    unknown = []
+    replaced = []
+    for subheading in subheadings:
+        qualifier = index.qualifier(subheading)
+        if qualifier is None:
+            unknown.append(subheading)
+            continue
+        name = index.qualifiers[qualifier]
+        if term_key(name) != term_key(subheading):
+            replaced.append((subheading, name))
+        qualifiers.setdefault(qualifier, name)
+    qualifiers = [(name, qualifier) for qualifier, name in qualifiers.items()]
+    groups = []
+    skipped = []
+    seen = set()
+    for heading, heading_noexp in zip(headings, noexp):
+        number = index.lookup(heading)
+        if number is None:
+            unknown.append(heading)
+            continue
+        if number in seen:
+            continue
+        seen.add(number)
+        preferred = index.name(number)
+        if term_key(preferred) != term_key(heading):
+            replaced.append((heading, preferred))
+            heading = preferred
+        allowed = []
+        for subheading, qualifier in qualifiers:
+            if (number, qualifier) in omitted:
+                continue
+            if index.allows(number, qualifier):
+                allowed.append(subheading)
+            else:
+                skipped.append((heading, subheading))
+        if not allowed:
+            continue
+        if groups and groups[-1][1:] == (allowed, heading_noexp):
+            groups[-1][0].append(heading)
+        else:
+            groups.append(([heading], allowed, heading_noexp))
+    return Checked(groups, replaced, unknown, skipped)
+
+
+class CheckedHeadings(NamedTuple):
+    headings: list
+    # (entry term, preferred heading) for headings given as entry terms
+    replaced: list
+    # terms that are not MeSH headings
+    unknown: list
+
+
+# map entry terms to their preferred headings and drop terms that are not in MeSH, for
+# headings searched without subheadings, such as the further headings ANDed with a pair
+def check_headings(index, headings):
+    checked = []
+    replaced = []
+    unknown = []
+    seen = set()
+    for heading in headings:
+        number = index.lookup(heading)
+        if number is None:
+            unknown.append(heading)
+            continue
+        if number in seen:
+            continue
+        seen.add(number)
+        preferred = index.name(number)
+        if term_key(preferred) != term_key(heading):
+            replaced.append((heading, preferred))
+            heading = preferred
+        checked.append(heading)
+    return CheckedHeadings(checked, replaced, unknown)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compile NLM's MeSH descriptor XML into the app's MeSH index.")
+    parser.add_argument("xml", help="desc2025.xml or desc2025.xml.gz")
+    parser.add_argument("--index", help="index file to write (default: the XML path with .idx appended)")
+    args = parser.parse_args()
+    start = time.perf_counter()
+    count = compile_index(args.xml, args.index or f"{args.xml}.idx")
+    print(f"{count:,} descriptors indexed in {time.perf_counter() - start:.1f}s")